@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'user.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -79,22 +81,182 @@ WSGI_APPLICATION = 'tdback.wsgi.application'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'user.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'user.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
-# Database
-# https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Point this at a shared backend (Redis/Memcached) when running several workers
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Transfer authorization grants: one password check unlocks a short-lived,
+# limited-use grant sent back in the X-Transfer-Authorization header
+TRANSFER_GRANT_TTL = 300  # seconds
+TRANSFER_GRANT_MAX_USES = 10
+
+# Token authentication cache: a per-process LRU in front of the shared cache.
+# Local hits are checked against a per-user generation in the shared cache,
+# which logout and user saves bump, so every process drops stale entries.
+TOKEN_AUTH_CACHE_ALIAS = 'default'
+TOKEN_AUTH_CACHE_TTL = 300  # seconds
+TOKEN_AUTH_LOCAL_TTL = 30  # seconds
+TOKEN_AUTH_LOCAL_MAX_ENTRIES = 10000
+
+# Threads used by the async views to run password hashing off the event loop
+PASSWORD_HASH_WORKERS = 4
+
+# Account numbers reserved per worker process in one round trip
+ACCOUNT_NUMBER_BLOCK_SIZE = 100
+
+# Idempotency-Key replay window for transfer endpoints
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # seconds
+IDEMPOTENCY_WAIT_SECONDS = 5  # how long a duplicate waits for the in-flight request
+
+# First statement page cached per user and statement version; transfers bump the version
+STATEMENT_CACHE_TTL = 10 * 60  # seconds
+
+# Interbank and wire settlement (see `manage.py settle_transfers`)
+SETTLEMENT_GATEWAY = 'user.settlement.LocalGateway'
+SETTLEMENT_GATEWAY_OPTIONS = {}
+SETTLEMENT_BATCH_SIZE = 100
+SETTLEMENT_MAX_ATTEMPTS = 5
+SETTLEMENT_RETRY_BASE_SECONDS = 30
+SETTLEMENT_RETRY_MAX_SECONDS = 60 * 60
+SETTLEMENT_LEASE_SECONDS = 120  # a claimed batch is retried if its worker dies
+
+# Hot receiving accounts (see `manage.py balance_shards`)
+BALANCE_SHARDS_DEFAULT = 16  # credit rows per hot account
+BALANCE_SHARD_COMPACT_INTERVAL = 5  # seconds between compactions with --loop
+
+# Balance reconciliation (see `manage.py reconcile_balances`)
+RECONCILE_CHUNK_SIZE = 1000  # accounts per aggregate query
+RECONCILE_CHECKPOINT_FILE = BASE_DIR / 'reconcile.checkpoint.json'
+RECONCILE_INTERVAL = 60 * 60  # seconds between passes with --loop
+
+# Completed and failed transfers older than this move to ArchivedTransfer
+# (see `manage.py archive_transfers`). Only ever shorten it: the statement
+# assumes everything archived is older than the current horizon.
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 5000
+
+# Rate limiting and load shedding for endpoints that hash passwords (see
+# user/ratelimit.py); both are checked before any hashing. Buckets are
+# (burst, seconds to refill a full burst) per key: "ip", "username", "token".
+RATE_LIMIT_BACKEND = 'local'  # 'local' (per process) or 'cache' (shared via RATE_LIMIT_CACHE_ALIAS)
+RATE_LIMIT_CACHE_ALIAS = 'default'
+RATE_LIMIT_IP_HEADER = os.environ.get('RATE_LIMIT_IP_HEADER')  # e.g. HTTP_X_FORWARDED_FOR behind a proxy
+RATE_LIMIT_HASH_WINDOW = 5  # seconds; older hash timings do not count towards max_hash_seconds
+RATE_LIMITS = {
+    'login': {
+        'buckets': {'ip': (30, 60), 'username': (5, 60)},
+        'max_in_flight': 32,
+        'max_hash_seconds': 1.0,
+    },
+    'transfer': {
+        'buckets': {'ip': (120, 60), 'token': (30, 60)},
+        'max_in_flight': 64,
+        'max_hash_seconds': 1.0,
+    },
+}
+# Servers started for the loadtest command set DISABLE_RATE_LIMITS=1, so it
+# measures the views rather than 429s. Never set it in production.
+if os.environ.get('DISABLE_RATE_LIMITS') == '1':
+    RATE_LIMITS = {}
+
+# Database
+# https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+
+# DB_ENGINE=postgresql selects the production profile; anything else runs on
+# SQLite in WAL mode, which suits a single node only.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    def _postgres(host, port):
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'tdback'),
+            'USER': os.environ.get('DB_USER', 'tdback'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': host,
+            'PORT': port,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+        if os.environ.get('DB_POOL_MAX_SIZE'):
+            # psycopg 3 pool; Django requires CONN_MAX_AGE = 0 with a pool
+            database['CONN_MAX_AGE'] = 0
+            database['OPTIONS']['pool'] = {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            }
+        else:
+            database['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+        return database
+
+    DB_PORT = os.environ.get('DB_PORT', '5432')
+    DATABASES = {'default': _postgres(os.environ.get('DB_HOST', 'localhost'), DB_PORT)}
+    # DB_REPLICA_HOSTS=replica1,replica2 adds read-only aliases replica_0, replica_1, ...
+    for index, host in enumerate(h.strip() for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+        DATABASES[f'replica_{index}'] = {**_postgres(host, DB_PORT), 'TEST': {'MIRROR': 'default'}}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Take the write lock at BEGIN so concurrent transfers queue on
+                # busy_timeout instead of failing to upgrade a read lock
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                    'PRAGMA cache_size=-65536;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['user.routers.PrimaryReplicaRouter']
+# Users read from the primary for this long after their own transfer commits
+REPLICA_STICKY_SECONDS = 5
+
+
+# Request metrics served at /metrics (Prometheus text format)
+METRICS_SLOW_QUERY_MS = 200  # log queries slower than this
+METRICS_N_PLUS_ONE_THRESHOLD = 10  # log SQL repeated this many times in one request
+METRICS_RESPONSE_HEADERS = DEBUG  # add a Server-Timing header to every response
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # if set, scrapes need "Authorization: Bearer <token>"
+
+# Login by username or case-insensitive email in one query (see user.backends)
+AUTHENTICATION_BACKENDS = ['user.backends.EmailOrUsernameBackend']
+
+# Same PBKDF2 hashes as Django's default, timed for the metrics above. It
+# replaces PBKDF2PasswordHasher: hashers are looked up by algorithm name
+PASSWORD_HASHERS = [
+    'user.metrics.InstrumentedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path,include
+from user.metrics import metrics_view
 from user.views import create_account
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("user/", include("user.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CustomUser, UserAccount, DomesticTransfer, InterBankTransfer, WireTransfer
+from .models import CustomUser, UserAccount, DomesticTransfer, InterBankTransfer, WireTransfer, LedgerEntry, BalanceSnapshot, TransferBatch, IdempotencyKey, DailyAggregate, BalanceShard, ArchivedTransfer, CounterBaseline
 # Register your models here.
 
 
@@ -7,4 +7,12 @@ admin.site.register(CustomUser)
 admin.site.register(UserAccount)
 admin.site.register(DomesticTransfer)
 admin.site.register(InterBankTransfer)
-admin.site.register(WireTransfer)
\ No newline at end of file
+admin.site.register(WireTransfer)
+admin.site.register(LedgerEntry)
+admin.site.register(BalanceSnapshot)
+admin.site.register(TransferBatch)
+admin.site.register(IdempotencyKey)
+admin.site.register(DailyAggregate)
+admin.site.register(BalanceShard)
+admin.site.register(ArchivedTransfer)
+admin.site.register(CounterBaseline)
\ No newline at end of file
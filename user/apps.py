@@ -6,4 +6,5 @@ class UserConfig(AppConfig):
     name = 'user'
 
     def ready(self):
+        import user.metrics  # connects the query instrumentation
         import user.signals
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Move cold transfer history out of the transfer tables.
+
+Completed and failed transfers older than ``ARCHIVE_AFTER_DAYS`` are copied
+into ArchivedTransfer and deleted from their source table in one transaction
+per batch. Pending transfers stay put for the settlement worker. Ledger
+entries and daily rollups keep their (type, id) references, because an
+archived transfer keeps its id as ``source_id``.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from user.models import ArchivedTransfer, ExternalTransfer
+from user.statement import ARCHIVE_FIELDS, TRANSFER_SOURCES, archive_horizon
+
+ARCHIVED_STATUSES = ["completed", "failed"]
+# Settlement audit trail of interbank and wire transfers, kept as is
+SETTLEMENT_FIELDS = ["attempts", "settled_at", "failure_reason", "gateway_reference"]
+
+
+def _archived(tx_type, mapping, transfer):
+    values = {ARCHIVE_FIELDS[column]: getattr(transfer, field) for column, field in mapping.items()}
+    if isinstance(transfer, ExternalTransfer):
+        values.update({field: getattr(transfer, field) for field in SETTLEMENT_FIELDS})
+    return ArchivedTransfer(
+        source_type=tx_type, user_id=transfer.user_id, account_id=transfer.account_id, **values
+    )
+
+
+def archivable(model, before):
+    return model.objects.filter(date__lt=before, status__in=ARCHIVED_STATUSES)
+
+
+def archive_batch(tx_type, before, batch_size):
+    """Archive up to ``batch_size`` of the oldest due transfers of one type.
+
+    Returns the number archived; 0 means the type is done.
+    """
+    model, mapping = TRANSFER_SOURCES[tx_type]
+    with transaction.atomic():
+        transfers = list(
+            archivable(model, before).order_by("pk").select_for_update(skip_locked=True)[:batch_size]
+        )
+        if not transfers:
+            return 0
+        ArchivedTransfer.objects.bulk_create([_archived(tx_type, mapping, transfer) for transfer in transfers])
+        model.objects.filter(pk__in=[transfer.pk for transfer in transfers]).delete()
+    return len(transfers)
+
+
+def archive_transfers(before=None, batch_size=None, stdout=None):
+    """Archive every due transfer; returns {transaction_type: count}."""
+    before = before or archive_horizon()
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    counts = {}
+    for tx_type in TRANSFER_SOURCES:
+        counts[tx_type] = 0
+        while True:
+            moved = archive_batch(tx_type, before, batch_size)
+            if not moved:
+                break
+            counts[tx_type] += moved
+            if stdout:
+                stdout.write(f"{tx_type}: {counts[tx_type]} archived")
+    return counts
@@ -0,0 +1,229 @@
+"""Async-native (ASGI) versions of the login, statement and transfer views.
+
+These are plain Django async views: reads use the async ORM, password hashing
+runs on a bounded thread pool, and only the locked balance update is handed
+to a worker thread, because Django transactions are sync-only.
+"""
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.authtoken.models import Token
+
+from user import ledger, statement_cache
+from user.authentication import aauthenticate_token, acache_token
+from user.backends import login_queryset, login_token, pick_user
+from user.grants import GRANT_HEADER, consume_grant
+from user.idempotency import IDEMPOTENCY_HEADER, REPLAY_HEADER, cache_key, execute_once, fingerprint, replay
+from user.models import UserAccount
+from user.ratelimit import throttle
+from user.routers import aread_replica
+from user.serializers import serialize_rows
+from user.statement import (
+    StatementQueryError, afetch_statement_page, parse_bound, parse_limit, parse_types
+)
+from user.transfers import TRANSFER_TYPES, TransferError
+
+CustomUser = get_user_model()
+
+HASH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, "PASSWORD_HASH_WORKERS", 4),
+    thread_name_prefix="password-hash",
+)
+
+
+async def acheck_password(user, raw_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(HASH_EXECUTOR, user.check_password, raw_password)
+
+
+def _error(message, status):
+    return JsonResponse({"status": "error", "message": message}, status=status)
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def token_required(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        auth = await aauthenticate_token(request)
+        if auth is None:
+            return _error("Invalid or missing authentication token", 401)
+        request.user, request.auth = auth
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@csrf_exempt
+@require_POST
+@throttle("login")
+async def login_account(request):
+    data = _json_body(request)
+    if data is None:
+        return _error("Invalid JSON body", 400)
+    username_or_email = data.get("username_or_email")
+    password = data.get("password")
+
+    if not username_or_email or not password:
+        return _error("username_or_email and password are required", 400)
+
+    # Username or email, resolved with the token in one query
+    users = [user async for user in login_queryset(username_or_email)]
+    user = pick_user(users, username_or_email)
+
+    if user is None or not user.is_active:
+        # Hash anyway so unknown users cost as much as a wrong password
+        await acheck_password(CustomUser(), password)
+        return _error("Invalid credentials", 401)
+    if not await acheck_password(user, password):
+        return _error("Invalid credentials", 401)
+
+    token = login_token(user)
+    if token is None:
+        token, _ = await Token.objects.aget_or_create(user=user)
+    await acache_token(user, token)
+
+    return JsonResponse({
+        "status": "success",
+        "message": "Login successful",
+        "data": {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "token": token.key
+        }
+    }, status=200)
+
+
+@require_GET
+@token_required
+async def account_statement(request):
+    # Same versioned cache and replica routing as the sync view, and the same cache entries
+    user = request.user
+    params = request.GET
+
+    version = await statement_cache.aget_version(user.pk)
+    etag = statement_cache.etag(user.pk, version, params)
+    if statement_cache.etag_matches(request.headers.get("If-None-Match"), etag):
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
+        return response
+
+    first_page = not params.get("cursor")
+    data = await statement_cache.aget_page(user.pk, version, params) if first_page else None
+    if data is None:
+        try:
+            limit = parse_limit(params.get("limit"))
+            types = parse_types(params.get("type"))
+            start = parse_bound(params.get("start_date"))
+            end = parse_bound(params.get("end_date"), end=True)
+            async with aread_replica(user.pk):
+                rows, next_cursor = await afetch_statement_page(
+                    user, limit=limit, cursor=params.get("cursor"), types=types, start=start, end=end
+                )
+        except StatementQueryError as exc:
+            return _error(str(exc), 400)
+
+        account, _ = await UserAccount.objects.aget_or_create(
+            user=user, defaults={"account_balance": 0}
+        )
+        data = {
+            "account_number": account.account_number,
+            "account_balance": float(await ledger.aavailable_balance(account)),
+            "transactions": serialize_rows(rows),
+            "next_cursor": next_cursor,
+        }
+        if first_page:
+            await statement_cache.aset_page(user.pk, version, params, data)
+
+    response = JsonResponse({
+        "status": "success",
+        "message": "Account balance and statement retrieved successfully",
+        "data": data,
+    })
+    response["ETag"] = etag
+    return response
+
+
+def _run_transfer(transfer_type, user, fields, amount, idempotency_key, request_fingerprint):
+    # Sync section: the locked reserve -> record -> settle transaction
+    def execute():
+        status_code, body = transfer_type.execute(user, fields, amount)
+        return status_code, body, None
+
+    if not idempotency_key:
+        status_code, body, _ = execute()
+        return status_code, body, False
+    status_code, body, _, replayed = execute_once(user, idempotency_key, request_fingerprint, execute)
+    return status_code, body, replayed
+
+
+def _transfer_view(kind):
+    transfer_type = TRANSFER_TYPES[kind]
+
+    @csrf_exempt
+    @require_POST
+    @token_required
+    @throttle("transfer")
+    async def view(request):
+        user = request.user
+        data = _json_body(request)
+        if data is None:
+            return _error("Invalid JSON body", 400)
+
+        # Replay a completed idempotent request before doing any hashing
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        request_fingerprint = None
+        if idempotency_key:
+            if len(idempotency_key) > 255:
+                return _error("Idempotency-Key must be at most 255 characters", 400)
+            request_fingerprint = fingerprint(request.method, request.path, data)
+            stored = await cache.aget(cache_key(user.pk, idempotency_key))
+            if stored is not None:
+                status_code, body = replay(stored, request_fingerprint)
+                response = JsonResponse(body, status=status_code)
+                if stored["fingerprint"] == request_fingerprint:
+                    response[REPLAY_HEADER] = "true"
+                return response
+
+        grant = request.headers.get(GRANT_HEADER)
+        try:
+            fields, amount = transfer_type.clean(data, require_password=not grant)
+        except TransferError as exc:
+            return _error(exc.message, exc.status)
+
+        if grant:
+            if not await sync_to_async(consume_grant)(request, grant):
+                return _error("Invalid or expired transfer authorization", 403)
+        elif not await acheck_password(user, data["password"]):
+            return _error("Invalid password", 403)
+
+        status_code, body, replayed = await sync_to_async(_run_transfer)(
+            transfer_type, user, fields, amount, idempotency_key, request_fingerprint
+        )
+        response = JsonResponse(body, status=status_code)
+        if replayed:
+            response[REPLAY_HEADER] = "true"
+        return response
+
+    return view
+
+
+make_domestic_transfer = _transfer_view("domestic")
+make_interbank_transfer = _transfer_view("interbank")
+make_wire_transfer = _transfer_view("wire")
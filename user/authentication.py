@@ -0,0 +1,182 @@
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class LocalLRUCache:
+    """Small thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_tokens = LocalLRUCache(
+    max_entries=getattr(settings, "TOKEN_AUTH_LOCAL_MAX_ENTRIES", 10000),
+    ttl=getattr(settings, "TOKEN_AUTH_LOCAL_TTL", 30),
+)
+
+
+def token_cache_key(key):
+    return f"tokenauth:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def shared_cache():
+    return caches[getattr(settings, "TOKEN_AUTH_CACHE_ALIAS", "default")]
+
+
+def generation_key(user_id):
+    return f"tokenauth:generation:{user_id}"
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def current_generation(user_id):
+    """The user's token generation in the shared cache, created on first use."""
+    cache = shared_cache()
+    key = generation_key(user_id)
+    cache.add(key, _new_generation(), None)
+    return cache.get(key)
+
+
+async def acurrent_generation(user_id):
+    cache = shared_cache()
+    key = generation_key(user_id)
+    await cache.aadd(key, _new_generation(), None)
+    return await cache.aget(key)
+
+
+def bump_generation(user_id):
+    """Stale every local entry of the user's tokens, in all processes."""
+    shared_cache().set(generation_key(user_id), _new_generation(), None)
+
+
+def _local_entry(cache_key, generation):
+    """Local hit still valid in the shared generation; ``generation`` is that value."""
+    entry = local_tokens.get(cache_key)
+    if entry is None:
+        return None
+    user, token, entry_generation = entry
+    # A missing generation (evicted or never set) is treated as a change
+    if generation is None or entry_generation != generation:
+        local_tokens.delete(cache_key)
+        return None
+    return user, token
+
+
+def cache_token(user, token):
+    """Store a token -> (user, token) lookup in both cache tiers."""
+    generation = current_generation(user.pk)
+    cache_key = token_cache_key(token.key)
+    shared_cache().set(cache_key, (user, token), getattr(settings, "TOKEN_AUTH_CACHE_TTL", 300))
+    local_tokens.set(cache_key, (user, token, generation))
+
+
+async def acache_token(user, token):
+    generation = await acurrent_generation(user.pk)
+    cache_key = token_cache_key(token.key)
+    await shared_cache().aset(cache_key, (user, token), getattr(settings, "TOKEN_AUTH_CACHE_TTL", 300))
+    local_tokens.set(cache_key, (user, token, generation))
+
+
+def invalidate_token(key, user_id):
+    cache_key = token_cache_key(key)
+    shared_cache().delete(cache_key)
+    local_tokens.delete(cache_key)
+    bump_generation(user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication with a local LRU in front of a shared cache.
+
+    Entries are invalidated by signals when a token is deleted or its user is
+    saved. The signals also bump the user's generation in the shared cache,
+    and a local hit is only served while its generation is current, so other
+    processes drop their copies on the next request.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        entry = local_tokens.get(cache_key)
+        if entry is not None:
+            entry = _local_entry(cache_key, shared_cache().get(generation_key(entry[0].pk)))
+        if entry is None:
+            entry = shared_cache().get(cache_key)
+            if entry is None:
+                # Falls through to the Token + user join; raises AuthenticationFailed
+                entry = super().authenticate_credentials(key)
+                cache_token(*entry)
+            else:
+                local_tokens.set(cache_key, (*entry, current_generation(entry[0].pk)))
+        user, token = entry
+        # Hand each request its own instance so views can't mutate the cached one
+        return copy.copy(user), token
+
+
+async def aauthenticate_token(request):
+    """Async counterpart of CachedTokenAuthentication for plain Django async views.
+
+    Returns (user, token) or None when the Authorization header is missing or invalid.
+    """
+    header = request.headers.get("Authorization", "").split()
+    if len(header) != 2 or header[0].lower() != "token":
+        return None
+    key = header[1]
+    cache_key = token_cache_key(key)
+    entry = local_tokens.get(cache_key)
+    if entry is not None:
+        entry = _local_entry(cache_key, await shared_cache().aget(generation_key(entry[0].pk)))
+    if entry is None:
+        entry = await shared_cache().aget(cache_key)
+        if entry is None:
+            try:
+                token = await Token.objects.select_related("user").aget(key=key)
+            except Token.DoesNotExist:
+                return None
+            if not token.user.is_active:
+                return None
+            entry = (token.user, token)
+            await acache_token(*entry)
+        else:
+            local_tokens.set(cache_key, (*entry, await acurrent_generation(entry[0].pk)))
+    user, token = entry
+    return copy.copy(user), token
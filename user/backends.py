@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework.authtoken.models import Token
+
+from user.authentication import cache_token
+from user.routers import reading_from_replica
+
+UserModel = get_user_model()
+
+
+def login_queryset(login):
+    """Users whose username or (case-insensitive) email is ``login``, with their token.
+
+    ``LOWER(email) = ...`` matches the user_email_ci_uniq index expression, so
+    both branches are index lookups and the token comes from the same join.
+    """
+    return (
+        UserModel._default_manager.alias(email_lower=Lower("email"))
+        .filter(Q(email_lower=login.lower()) | Q(username=login))
+        .select_related("auth_token")[:2]
+    )
+
+
+def pick_user(users, login):
+    # An email match wins over another user whose username looks like that email
+    lowered = login.lower()
+    for user in users:
+        if user.email and user.email.lower() == lowered:
+            return user
+    return users[0] if users else None
+
+
+def login_token(user):
+    """The token loaded by login_queryset(), or None; never queries."""
+    try:
+        return user.auth_token
+    except Token.DoesNotExist:
+        return None
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """Authenticate by username or email with one query that also fetches the token."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        login = username if username is not None else kwargs.get(UserModel.USERNAME_FIELD)
+        if not login or password is None:
+            return None
+        user = pick_user(list(login_queryset(login)), login)
+        if user is None and reading_from_replica():
+            # The user may have signed up moments ago and not be replicated yet
+            user = pick_user(list(login_queryset(login).using("default")), login)
+        if user is None:
+            # Hash anyway so unknown users cost as much as a wrong password
+            UserModel().set_password(password)
+            return None
+        if not (user.check_password(password) and self.user_can_authenticate(user)):
+            return None
+        token = login_token(user)
+        if token is not None:
+            # The client's next request authenticates from the cache
+            cache_token(user, token)
+        return user
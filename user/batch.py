@@ -0,0 +1,184 @@
+import csv
+import io
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+
+from user import ledger, rollups, statement_cache
+from user.idempotency import fingerprint
+from user.models import DomesticTransfer, TransferBatch, UserAccount
+from user.transfers import TRANSFER_TYPES, TransferError
+
+MAX_BATCH_ITEMS = 10000
+CHUNK_SIZE = 500
+
+DOMESTIC = TRANSFER_TYPES["domestic"]
+CSV_FIELDS = DOMESTIC.required + ["description", "account_type"]
+BATCH_ID_MAX_LENGTH = TransferBatch._meta.get_field("batch_id").max_length
+
+
+class BatchInProgress(Exception):
+    pass
+
+
+class InvalidBatchFile(Exception):
+    pass
+
+
+class BatchMismatch(Exception):
+    """The batch_id was already used with different transfers."""
+
+
+def parse_csv(uploaded_file):
+    """Read batch items from an uploaded CSV; raises InvalidBatchFile if it is unreadable."""
+    reader = csv.DictReader(io.TextIOWrapper(uploaded_file, encoding="utf-8-sig"))
+    try:
+        return [{key: (row.get(key) or "").strip() for key in CSV_FIELDS} for row in reader]
+    except (UnicodeDecodeError, csv.Error):
+        raise InvalidBatchFile("The CSV file must be UTF-8 encoded comma-separated values")
+
+
+def validate_items(items):
+    """Split items into (index, fields, amount) triples and per-item error results.
+
+    Each item goes through the same field schema and amount parsing as a
+    single domestic transfer, so lengths and decimal places match what the
+    transfer rows can store.
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "status": "error", "message": "Invalid transfer entry"})
+            continue
+        try:
+            fields, amount = DOMESTIC.clean(item, require_password=False)
+        except TransferError as exc:
+            errors.append({"index": index, "status": "error", "message": exc.message})
+            continue
+        valid.append((index, fields, amount))
+    return valid, errors
+
+
+def find_batch(user, batch_id):
+    return TransferBatch.objects.filter(user=user, batch_id=batch_id).first()
+
+
+def items_fingerprint(items):
+    return fingerprint("POST", "transfer-batch", items)
+
+
+def replay_batch(batch, items):
+    """Stored result of a completed batch; raises BatchMismatch if ``items`` differ from its own."""
+    # Batches stored before fingerprints were recorded replay unchecked
+    if batch.fingerprint and batch.fingerprint != items_fingerprint(items):
+        raise BatchMismatch(batch.batch_id)
+    return batch.result
+
+
+def run_batch(user, account, batch_id, items):
+    """Execute a batch of domestic transfers with one debit and bulk credits.
+
+    Returns the stored result payload. Raises ledger.InsufficientFunds if the
+    valid transfers exceed the sender's balance (nothing is applied),
+    BatchInProgress if the same batch_id is being processed concurrently, and
+    BatchMismatch if it was already processed with different transfers.
+    """
+    valid, results = validate_items(items)
+
+    # Resolve every beneficiary with one query
+    numbers = {item["beneficiary_account_number"] for _, item, _ in valid}
+    receivers = {
+        acc.account_number: acc
+        for acc in UserAccount.objects.filter(account_number__in=numbers).only(
+            "id", "user_id", "account_number", "balance_shards"
+        )
+    }
+    accepted = []
+    for index, item, amount in valid:
+        if item["beneficiary_account_number"] not in receivers:
+            results.append({
+                "index": index,
+                "status": "error",
+                "message": "Beneficiary account does not exist in our system",
+            })
+        else:
+            accepted.append((index, item, amount))
+
+    total = sum((amount for _, _, amount in accepted), Decimal("0"))
+    credits = {}
+    for _, item, amount in accepted:
+        receiver = receivers[item["beneficiary_account_number"]]
+        credits[receiver.pk] = credits.get(receiver.pk, Decimal("0")) + amount
+
+    try:
+        with transaction.atomic():
+            batch = TransferBatch.objects.create(
+                user=user, batch_id=batch_id, fingerprint=items_fingerprint(items), total_amount=total
+            )
+
+            if accepted:
+                # Hot receivers are credited on a shard, so they are not locked
+                hot = {r.pk: r.balance_shards for r in receivers.values() if r.balance_shards}
+                ledger.lock_accounts(account, *[r for r in receivers.values() if r.pk not in hot])
+                ledger.debit(account, total)
+                ledger.credit_many(credits, shards=hot)
+
+                created_at = now()
+                transfers = DomesticTransfer.objects.bulk_create(
+                    [
+                        DomesticTransfer(
+                            user=user,
+                            account=account,
+                            amount=amount,
+                            transaction_type="domestic_transfer",
+                            description=item["description"],
+                            status="completed",
+                            date=created_at,
+                            beneficiary_name=item["beneficiary_name"],
+                            beneficiary_account_number=item["beneficiary_account_number"],
+                            bank_name=item["bank_name"],
+                            account_type=item["account_type"],
+                        )
+                        for _, item, amount in accepted
+                    ],
+                    batch_size=CHUNK_SIZE,
+                )
+                ledger.record_many(
+                    [
+                        (tx, account, receivers[tx.beneficiary_account_number])
+                        for tx in transfers
+                    ],
+                    batch_size=CHUNK_SIZE,
+                )
+                # bulk_create skips post_save, so roll the batch up here
+                rollups.record_many(transfers)
+                statement_cache.invalidate(user.pk, *[receiver.user_id for receiver in receivers.values()])
+                for (index, item, amount), tx in zip(accepted, transfers):
+                    results.append({
+                        "index": index,
+                        "status": "success",
+                        "transfer_id": tx.id,
+                        "amount": float(amount),
+                        "beneficiary_account": item["beneficiary_account_number"],
+                    })
+
+            results.sort(key=lambda r: r["index"])
+            batch.result = {
+                "batch_id": batch_id,
+                "total_amount": float(total),
+                "succeeded": len(accepted),
+                "failed": len(results) - len(accepted),
+                "account_balance": float(ledger.available_balance(account)),
+                "results": results,
+            }
+            batch.status = "completed"
+            batch.save(update_fields=["result", "status"])
+    except IntegrityError:
+        # Another request created this batch first
+        existing = find_batch(user, batch_id)
+        if existing is None or existing.status != "completed":
+            raise BatchInProgress(batch_id)
+        return replay_batch(existing, items)
+
+    return batch.result
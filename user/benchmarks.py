@@ -0,0 +1,205 @@
+"""Helpers shared by the benchmark management commands."""
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from user.models import CustomUser, UserAccount, DomesticTransfer, InterBankTransfer, WireTransfer
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples_ms, elapsed=None):
+    stats = {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "max_ms": round(max(samples_ms), 3) if samples_ms else 0.0,
+    }
+    if elapsed:
+        stats["throughput_rps"] = round(len(samples_ms) / elapsed, 1)
+    return stats
+
+
+def time_call(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def seed_users(count, prefix="bench", balance=Decimal("0"), password=None, batch_size=1000):
+    """Bulk-create users with accounts; returns the accounts ordered by id."""
+    password_hash = make_password(password) if password else make_password(None)
+    users = [
+        CustomUser(username=f"{prefix}_{i}", email=f"{prefix}_{i}@example.com", password=password_hash)
+        for i in range(count)
+    ]
+    CustomUser.objects.bulk_create(users, batch_size=batch_size)
+    users = CustomUser.objects.filter(username__startswith=f"{prefix}_").order_by("id")
+    existing = set(UserAccount.objects.filter(user__in=users).values_list("user_id", flat=True))
+    UserAccount.objects.bulk_create(
+        [
+            UserAccount(user=user, account_number=f"9{user.id:011d}", account_balance=balance)
+            for user in users if user.id not in existing
+        ],
+        batch_size=batch_size,
+    )
+    return list(UserAccount.objects.filter(user__username__startswith=f"{prefix}_").order_by("id"))
+
+
+def seed_transfers(accounts, rows, batch_size=5000, days=365, stdout=None):
+    """Bulk-insert ``rows`` mixed transfers spread across ``accounts``."""
+    models = [
+        (DomesticTransfer, "domestic_transfer"),
+        (InterBankTransfer, "inter_bank"),
+        (WireTransfer, "wire"),
+    ]
+    statuses = ["completed", "completed", "completed", "pending", "failed"]
+    started_at = now()
+    horizon = days * 24 * 3600
+    inserted = 0
+    while inserted < rows:
+        chunk = min(batch_size, rows - inserted)
+        pending = {model: [] for model, _ in models}
+        for _ in range(chunk):
+            account = random.choice(accounts)
+            model, tx_type = random.choice(models)
+            fields = {
+                "user_id": account.user_id,
+                "account_id": account.id,
+                "amount": Decimal(random.randint(100, 500000)) / 100,
+                "transaction_type": tx_type,
+                "status": random.choice(statuses),
+                "date": started_at - timedelta(seconds=random.randint(0, horizon)),
+                "beneficiary_name": "Benchmark Beneficiary",
+                "bank_name": "Benchmark Bank",
+            }
+            if model is DomesticTransfer:
+                fields["beneficiary_account_number"] = random.choice(accounts).account_number
+            else:
+                fields["iban"] = f"GB{random.randint(10 ** 19, 10 ** 20 - 1)}"
+                fields["country"] = "GB"
+                if model is WireTransfer:
+                    fields["routing_number"] = "021000021"
+                    fields["swift_code"] = "BENCHGB2L"
+            pending[model].append(model(**fields))
+        for model, objs in pending.items():
+            if objs:
+                model.objects.bulk_create(objs, batch_size=batch_size)
+        inserted += chunk
+        if stdout is not None:
+            stdout.write(f"  seeded {inserted}/{rows} transfers")
+    return inserted
+
+
+def http_request(url, method="GET", body=None, headers=None, timeout=30):
+    """Send one JSON request; returns (status_code, decoded body or None)."""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    request.add_header("Content-Type", "application/json")
+    for name, value in (headers or {}).items():
+        request.add_header(name, value)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as exc:
+        status, payload = exc.code, exc.read()
+    try:
+        return status, json.loads(payload) if payload else None
+    except ValueError:
+        return status, None
+
+
+def run_http_load(url, requests, concurrency, method="GET", body_factory=None, headers=None):
+    """Fire ``requests`` calls at ``url`` from ``concurrency`` threads.
+
+    Returns summarize() stats plus error and status counts.
+    """
+    samples = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        body = body_factory(i) if body_factory else None
+        started = time.perf_counter()
+        try:
+            status, _ = http_request(url, method, body, headers)
+        except OSError:
+            status = "connection_error"
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            samples.append(elapsed_ms)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(samples, elapsed)
+    stats["statuses"] = {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))}
+    return stats
+
+
+def run_client_load(requests, concurrency, send):
+    """In-process load: ``send(client, i)`` issues request ``i`` through a Django test client.
+
+    Every worker thread has its own client and database connection, so the
+    queries each request runs can be counted. Returns summarize() stats plus
+    status counts and mean queries per request.
+    """
+    samples = []
+    statuses = {}
+    queries = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, "client"):
+            local.client = Client()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = send(local.client, i)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            samples.append(elapsed_ms)
+            queries.append(len(captured))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    def worker(indexes):
+        try:
+            for i in indexes:
+                one(i)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, [range(n, requests, concurrency) for n in range(concurrency)]))
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(samples, elapsed)
+    stats["queries_per_request"] = round(sum(queries) / len(queries), 2) if queries else 0.0
+    stats["statuses"] = {str(k): v for k, v in sorted(statuses.items())}
+    return stats
@@ -0,0 +1,69 @@
+import csv
+import json
+import zlib
+
+from user.serializers import CSV_HEADER, csv_row, serialize_row
+from user.statement import statement_queryset
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+ITERATOR_CHUNK_SIZE = 2000
+# Buffer roughly this many bytes before handing a chunk to the server
+FLUSH_BYTES = 64 * 1024
+
+
+class _Echo:
+    """File-like object whose write() just returns the line (csv.writer target)."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(csv_row(row))
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(serialize_row(row)) + "\n"
+
+
+def _buffered(lines):
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= FLUSH_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_statement(user, output="csv", gzip=False, types=None, start=None, end=None):
+    """Yield the full statement, oldest first, as encoded byte chunks.
+
+    Rows are pulled from a server-side cursor in chunks, so memory stays flat
+    regardless of history size. Archived history is included.
+    """
+    rows = statement_queryset(user, types, start, end, descending=False, archive=True).iterator(
+        chunk_size=ITERATOR_CHUNK_SIZE
+    )
+    lines = _csv_lines(rows) if output == "csv" else _ndjson_lines(rows)
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if gzip else chunks
@@ -0,0 +1,67 @@
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+GRANT_HEADER = "X-Transfer-Authorization"
+GRANT_SALT = "user.grants.transfer-authorization"
+
+
+def _token_digest(request):
+    # Bind grants to the API token they were issued for
+    key = getattr(request.auth, "key", None)
+    return hashlib.sha256(key.encode()).hexdigest() if key else None
+
+
+def _grant_key(grant_id):
+    return f"transfer-grant:{grant_id}"
+
+
+def _uses_key(grant_id):
+    return f"transfer-grant:{grant_id}:uses"
+
+
+def issue_grant(request):
+    """Store a fresh grant for the authenticated user and return its signed value."""
+    ttl = settings.TRANSFER_GRANT_TTL
+    grant_id = secrets.token_urlsafe(16)
+    cache.set(_grant_key(grant_id), {"user": request.user.pk, "token": _token_digest(request)}, ttl)
+    cache.set(_uses_key(grant_id), 0, ttl)
+    return signing.dumps({"g": grant_id, "u": request.user.pk}, salt=GRANT_SALT)
+
+
+def consume_grant(request, value):
+    """Validate a signed grant and count one use against it."""
+    try:
+        payload = signing.loads(value, salt=GRANT_SALT, max_age=settings.TRANSFER_GRANT_TTL)
+    except signing.BadSignature:
+        return False
+    if payload.get("u") != request.user.pk:
+        return False
+
+    grant = cache.get(_grant_key(payload["g"]))
+    if grant is None or grant["user"] != request.user.pk or grant["token"] != _token_digest(request):
+        return False
+    try:
+        uses = cache.incr(_uses_key(payload["g"]))
+    except ValueError:
+        # Counter expired or was evicted
+        return False
+    return uses <= settings.TRANSFER_GRANT_MAX_USES
+
+
+def has_grant(request):
+    return bool(request.headers.get(GRANT_HEADER))
+
+
+def authorize_transfer(request):
+    """Check the transfer grant header, falling back to the password field.
+
+    Returns (authorized, error_message).
+    """
+    grant = request.headers.get(GRANT_HEADER)
+    if grant:
+        return consume_grant(request, grant), "Invalid or expired transfer authorization"
+    return request.user.check_password(request.data.get("password")), "Invalid password"
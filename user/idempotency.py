@@ -0,0 +1,178 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils.crypto import salted_hmac
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+
+from user.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+POLL_INTERVAL = 0.05
+
+
+# Secrets never go into a fingerprint: it is stored in the database and the cache
+UNFINGERPRINTED_FIELDS = ["password"]
+
+
+def fingerprint(method, path, data):
+    """Keyed digest of a request, so stored fingerprints cannot be brute-forced offline."""
+    if isinstance(data, dict):
+        data = data.copy()
+        for field in UNFINGERPRINTED_FIELDS:
+            data.pop(field, None)
+    body = json.dumps(data, sort_keys=True, default=str)
+    raw = f"{method}:{path}:{body}"
+    return salted_hmac("user.idempotency.fingerprint", raw, algorithm="sha256").hexdigest()
+
+
+def cache_key(user_id, key):
+    return f"idempotency:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def replay(stored, request_fingerprint):
+    """Return (status, body) for a stored response, or a 422 on a reused key."""
+    if stored["fingerprint"] != request_fingerprint:
+        return (
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            {"status": "error", "message": "Idempotency-Key was already used with a different request"},
+        )
+    return stored["status"], stored["body"]
+
+
+def _stored(record):
+    return {"fingerprint": record.fingerprint, "status": record.response_status, "body": record.response_body}
+
+
+def _claim(user, key, request_fingerprint):
+    """Insert the key row; returns (record, claimed)."""
+    cutoff = now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, key=key, fingerprint=request_fingerprint), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue
+            if record.created_at >= cutoff:
+                return record, False
+            # Expired key: evict and claim it again
+            IdempotencyKey.objects.filter(pk=record.pk, created_at__lt=cutoff).delete()
+    return None, False
+
+
+def _wait_for(record):
+    # Another request owns the key; wait for it to finish instead of re-running
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    key = cache_key(record.user_id, record.key)
+    while record is not None and record.status != "completed" and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        stored = cache.get(key)
+        if stored is not None:
+            return stored
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    if record is not None and record.status == "completed":
+        return _stored(record)
+    return None
+
+
+def execute_once(user, key, request_fingerprint, execute):
+    """Run ``execute`` at most once per (user, key).
+
+    ``execute`` returns (status_code, body, result). Returns
+    (status_code, body, result, replayed); ``result`` is None unless this call
+    ran ``execute``. 5xx results and exceptions release the key so the client
+    can retry.
+    """
+    ckey = cache_key(user.pk, key)
+    stored = cache.get(ckey)
+    if stored is not None:
+        return (*replay(stored, request_fingerprint), None, stored["fingerprint"] == request_fingerprint)
+
+    record, claimed = _claim(user, key, request_fingerprint)
+    if not claimed:
+        stored = _wait_for(record) if record is not None else None
+        if stored is None:
+            return (
+                status.HTTP_409_CONFLICT,
+                {"status": "error", "message": "A request with this Idempotency-Key is still being processed"},
+                None,
+                False,
+            )
+        cache.set(ckey, stored, settings.IDEMPOTENCY_KEY_TTL)
+        return (*replay(stored, request_fingerprint), None, stored["fingerprint"] == request_fingerprint)
+
+    try:
+        status_code, body, result = execute()
+    except Exception:
+        record.delete()
+        raise
+    if status_code >= 500:
+        record.delete()
+        return status_code, body, result, False
+
+    record.status = "completed"
+    record.response_status = status_code
+    record.response_body = body
+    record.save(update_fields=["status", "response_status", "response_body"])
+    cache.set(ckey, _stored(record), settings.IDEMPOTENCY_KEY_TTL)
+    return status_code, body, result, False
+
+
+def _replayed(status_code, body, replayed):
+    return Response(body, status=status_code, headers={REPLAY_HEADER: "true"} if replayed else None)
+
+
+def replay_response(request):
+    """Response to send without running the view, or None.
+
+    That is a 400 for an invalid Idempotency-Key, or the cached response of a
+    completed request with the same key. Call it before validating or
+    authorizing, so a retry is answered without a fresh password or grant.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return None
+    if len(key) > 255:
+        return Response(
+            {"status": "error", "message": "Idempotency-Key must be at most 255 characters"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    stored = cache.get(cache_key(request.user.pk, key))
+    if stored is None:
+        return None
+    request_fingerprint = fingerprint(request.method, request.path, request.data)
+    return _replayed(*replay(stored, request_fingerprint), stored["fingerprint"] == request_fingerprint)
+
+
+def respond_once(request, execute):
+    """Run ``execute`` at most once per Idempotency-Key and return its Response.
+
+    ``execute`` returns (status_code, body). Only pass the side effect here:
+    validation and authorization errors must be returned before, so they are
+    not stored and a corrected retry with the same key still runs.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        status_code, body = execute()
+        return Response(body, status=status_code)
+
+    status_code, body, _, replayed = execute_once(
+        request.user, key, fingerprint(request.method, request.path, request.data),
+        lambda: (*execute(), None),
+    )
+    return _replayed(status_code, body, replayed)
+
+
+def purge_expired_keys():
+    cutoff = now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
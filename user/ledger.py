@@ -0,0 +1,290 @@
+import random
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+
+from user.models import BalanceShard, BalanceSnapshot, LedgerEntry, UserAccount
+
+BALANCE_FIELDS = ["account_balance", "total_deposit", "total_withdrawal"]
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def lock_accounts(*accounts):
+    """SELECT ... FOR UPDATE the given accounts in primary-key order.
+
+    Locking in a deterministic order means two opposite transfers between the
+    same pair of accounts queue up instead of deadlocking.
+    """
+    ids = sorted({account.pk for account in accounts})
+    return list(UserAccount.objects.select_for_update().filter(pk__in=ids).order_by("pk"))
+
+
+def _debit_if_covered(account, amount):
+    # Conditional UPDATE: the balance check and the deduction are one statement
+    return UserAccount.objects.filter(pk=account.pk, account_balance__gte=amount).update(
+        account_balance=F("account_balance") - amount,
+        total_withdrawal=F("total_withdrawal") + amount,
+    )
+
+
+def debit(account, amount, locked=False):
+    """Deduct ``amount`` or raise InsufficientFunds.
+
+    Pass ``locked=True`` when ``account`` was loaded by lock_accounts() in
+    this transaction: its in-memory balances are then current, so they are
+    adjusted in place instead of re-read.
+    """
+    updated = _debit_if_covered(account, amount)
+    if not updated and account.balance_shards and compact_shards(account):
+        # Credits parked on the shards may cover it
+        updated = _debit_if_covered(account, amount)
+        locked = False
+    if not updated:
+        raise InsufficientFunds("Insufficient funds")
+    if locked:
+        account.account_balance -= amount
+        account.total_withdrawal += amount
+    else:
+        account.refresh_from_db(fields=BALANCE_FIELDS)
+
+
+def _credit_shard(account_id, shards, amount):
+    """Credit one randomly chosen shard; False if the shard rows are gone."""
+    return BalanceShard.objects.filter(account_id=account_id, shard=random.randrange(shards)).update(
+        balance=F("balance") + amount,
+        total_deposit=F("total_deposit") + amount,
+    ) > 0
+
+
+def credit(account, amount, locked=False):
+    """Add ``amount``; hot accounts are credited on a shard without touching their row."""
+    if account.balance_shards and _credit_shard(account.pk, account.balance_shards, amount):
+        return
+    UserAccount.objects.filter(pk=account.pk).update(
+        account_balance=F("account_balance") + amount,
+        total_deposit=F("total_deposit") + amount,
+    )
+    if locked:
+        account.account_balance += amount
+        account.total_deposit += amount
+    else:
+        account.refresh_from_db(fields=BALANCE_FIELDS)
+
+
+def refund(account, amount):
+    """Return funds debited for a transfer that was never paid out."""
+    UserAccount.objects.filter(pk=account.pk).update(
+        account_balance=F("account_balance") + amount,
+        total_withdrawal=F("total_withdrawal") - amount,
+    )
+
+
+def credit_many(amounts, shards=None):
+    """Credit several accounts in one UPDATE; ``amounts`` maps account id to amount.
+
+    ``shards`` maps hot account ids to their shard count; those are credited
+    on a shard instead.
+    """
+    amounts = dict(amounts)
+    for account_id, count in (shards or {}).items():
+        if count and account_id in amounts and _credit_shard(account_id, count, amounts[account_id]):
+            del amounts[account_id]
+    if not amounts:
+        return
+    increment = Case(
+        *[When(pk=account_id, then=Value(amount)) for account_id, amount in amounts.items()],
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+    UserAccount.objects.filter(pk__in=list(amounts)).update(
+        account_balance=F("account_balance") + increment,
+        total_deposit=F("total_deposit") + increment,
+    )
+
+
+def transfer(sender, receiver, amount):
+    """Move ``amount`` between two accounts inside one transaction."""
+    with transaction.atomic():
+        lock_accounts(sender, receiver)
+        debit(sender, amount)
+        credit(receiver, amount)
+
+
+def available_balance(account):
+    """Compacted balance plus the credits still parked on the account's shards."""
+    if not account.balance_shards:
+        return account.account_balance
+    parked = BalanceShard.objects.filter(account_id=account.pk).aggregate(total=Sum("balance"))["total"]
+    return account.account_balance + (parked or Decimal("0"))
+
+
+async def aavailable_balance(account):
+    """Async version of available_balance for the async views."""
+    if not account.balance_shards:
+        return account.account_balance
+    parked = (await BalanceShard.objects.filter(account_id=account.pk).aaggregate(total=Sum("balance")))["total"]
+    return account.account_balance + (parked or Decimal("0"))
+
+
+def compact_shards(account):
+    """Fold a hot account's shard balances into its UserAccount row.
+
+    The account row is locked before the shards, the same order a debit
+    from the hot account uses. Returns the amount moved.
+    """
+    with transaction.atomic():
+        lock_accounts(account)
+        shards = list(
+            BalanceShard.objects.select_for_update()
+            .filter(account_id=account.pk)
+            .exclude(balance=0, total_deposit=0)
+        )
+        if not shards:
+            return Decimal("0")
+        balance = sum((shard.balance for shard in shards), Decimal("0"))
+        deposits = sum((shard.total_deposit for shard in shards), Decimal("0"))
+        UserAccount.objects.filter(pk=account.pk).update(
+            account_balance=F("account_balance") + balance,
+            total_deposit=F("total_deposit") + deposits,
+        )
+        BalanceShard.objects.filter(pk__in=[shard.pk for shard in shards]).update(
+            balance=0, total_deposit=0
+        )
+    return balance
+
+
+def compact_hot_accounts():
+    """Compact every sharded account; returns how many had parked credits."""
+    compacted = 0
+    for account in UserAccount.objects.filter(balance_shards__gt=0).only("pk", "balance_shards"):
+        if compact_shards(account):
+            compacted += 1
+    return compacted
+
+
+def set_balance_shards(account, count):
+    """Switch an account to ``count`` credit shards (0 turns sharding off).
+
+    Parked credits are compacted first. A credit racing with a shard that is
+    being removed finds no row to update and falls back to the account row.
+    """
+    with transaction.atomic():
+        lock_accounts(account)
+        UserAccount.objects.filter(pk=account.pk).update(balance_shards=count)
+        compact_shards(account)
+        BalanceShard.objects.filter(account_id=account.pk, shard__gte=count).delete()
+        BalanceShard.objects.bulk_create(
+            [BalanceShard(account_id=account.pk, shard=shard) for shard in range(count)],
+            ignore_conflicts=True,
+        )
+    account.balance_shards = count
+    account.refresh_from_db(fields=BALANCE_FIELDS)
+
+
+def _entry_legs(transfer, debit_account, credit_account, created_at):
+    return [
+        LedgerEntry(
+            account=debit_account,
+            entry_type="debit",
+            amount=-transfer.amount,
+            transfer_type=transfer.transaction_type,
+            transfer_id=transfer.id,
+            created_at=created_at,
+        ),
+        LedgerEntry(
+            account=credit_account,
+            entry_type="credit",
+            amount=transfer.amount,
+            transfer_type=transfer.transaction_type,
+            transfer_id=transfer.id,
+            created_at=created_at,
+        ),
+    ]
+
+
+def record_entries(transfer, debit_account, credit_account=None):
+    """Append the debit and credit legs for a recorded transfer.
+
+    ``credit_account`` is None for money leaving the platform, in which case
+    the credit leg is booked against the external clearing side.
+    """
+    LedgerEntry.objects.bulk_create(_entry_legs(transfer, debit_account, credit_account, now()))
+
+
+def record_many(legs, batch_size=500):
+    """Bulk version of record_entries for (transfer, debit_account, credit_account) triples."""
+    created_at = now()
+    entries = []
+    for transfer, debit_account, credit_account in legs:
+        entries.extend(_entry_legs(transfer, debit_account, credit_account, created_at))
+    LedgerEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def _sum_entries(entries):
+    return entries.aggregate(total=Sum("amount"))["total"] or Decimal("0")
+
+
+def ledger_balance(account):
+    """Latest snapshot plus every entry appended since."""
+    snapshot = BalanceSnapshot.objects.filter(account=account).order_by("-last_entry_id").first()
+    entries = LedgerEntry.objects.filter(account=account)
+    if snapshot is None:
+        return _sum_entries(entries)
+    return snapshot.balance + _sum_entries(entries.filter(id__gt=snapshot.last_entry_id))
+
+
+def balance_as_of(account, when):
+    snapshot = (
+        BalanceSnapshot.objects.filter(account=account, taken_at__lte=when)
+        .order_by("-taken_at")
+        .first()
+    )
+    entries = LedgerEntry.objects.filter(account=account, created_at__lte=when)
+    if snapshot is None:
+        return _sum_entries(entries)
+    return snapshot.balance + _sum_entries(entries.filter(id__gt=snapshot.last_entry_id))
+
+
+def snapshot_accounts(account_ids):
+    """Write a fresh snapshot for each account with entries since its last one.
+
+    Accounts without any snapshot adopt their current ``account_balance`` as
+    the opening balance, so pre-ledger history is carried forward.
+    Returns the number of snapshots written.
+    """
+    latest = BalanceSnapshot.objects.filter(account=OuterRef("pk")).order_by("-last_entry_id")
+    accounts = UserAccount.objects.filter(pk__in=account_ids).annotate(
+        snap_balance=Subquery(latest.values("balance")[:1]),
+        snap_entry=Coalesce(Subquery(latest.values("last_entry_id")[:1]), 0),
+    )
+    new_entries = (
+        LedgerEntry.objects.filter(account=OuterRef("pk"), id__gt=OuterRef("snap_entry"))
+        .order_by()
+        .values("account")
+    )
+    parked = BalanceShard.objects.filter(account=OuterRef("pk")).order_by().values("account")
+    accounts = accounts.annotate(
+        delta=Subquery(new_entries.annotate(total=Sum("amount")).values("total")),
+        max_entry=Subquery(new_entries.annotate(top=Max("id")).values("top")),
+        parked=Subquery(parked.annotate(total=Sum("balance")).values("total")),
+    ).values_list("pk", "account_balance", "snap_balance", "snap_entry", "delta", "max_entry", "parked")
+
+    taken_at = now()
+    snapshots = []
+    for pk, counter, snap_balance, snap_entry, delta, max_entry, parked in accounts:
+        if snap_balance is None:
+            # Uncompacted shard credits are part of the opening balance too
+            snapshots.append(BalanceSnapshot(
+                account_id=pk, balance=counter + (parked or 0), last_entry_id=max_entry or 0, taken_at=taken_at
+            ))
+        elif max_entry is not None:
+            snapshots.append(BalanceSnapshot(
+                account_id=pk, balance=snap_balance + delta, last_entry_id=max_entry, taken_at=taken_at
+            ))
+    BalanceSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
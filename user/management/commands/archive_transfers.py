@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from user.archive import archivable, archive_transfers
+from user.statement import TRANSFER_SOURCES
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed and failed transfers older than the archive horizon into "
+        "the archive table, in batches; schedule periodically (e.g. nightly cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Defaults to ARCHIVE_AFTER_DAYS")
+        parser.add_argument("--batch-size", type=int, default=None, help="Defaults to ARCHIVE_BATCH_SIZE")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be archived")
+
+    def handle(self, *args, **options):
+        days = options["days"] or settings.ARCHIVE_AFTER_DAYS
+        if days < settings.ARCHIVE_AFTER_DAYS:
+            # Statements only look in the archive past ARCHIVE_AFTER_DAYS
+            raise CommandError("--days cannot be shorter than ARCHIVE_AFTER_DAYS")
+        before = now() - timedelta(days=days)
+
+        if options["dry_run"]:
+            for tx_type, (model, _) in TRANSFER_SOURCES.items():
+                self.stdout.write(f"{tx_type}: {archivable(model, before).count()} due")
+            return
+
+        counts = archive_transfers(before, options["batch_size"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {sum(counts.values())} transfers older than {before:%Y-%m-%d}"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from user.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-account daily transfer rollups from the transfer tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = backfill(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily aggregate rows"))
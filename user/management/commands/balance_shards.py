@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+
+from user.ledger import available_balance, compact_hot_accounts, set_balance_shards
+from user.models import UserAccount
+
+
+class Command(BaseCommand):
+    help = (
+        "Turn sharded credits on or off for hot receiving accounts, and compact "
+        "parked shard credits into the account balance (once, or forever with --loop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--enable", metavar="ACCOUNT_NUMBER", action="append", default=[])
+        parser.add_argument("--disable", metavar="ACCOUNT_NUMBER", action="append", default=[])
+        parser.add_argument("--shards", type=int, default=None, help="Defaults to BALANCE_SHARDS_DEFAULT")
+        parser.add_argument("--loop", action="store_true", help="Keep compacting every --interval seconds")
+        parser.add_argument("--interval", type=float, default=None, help="Defaults to BALANCE_SHARD_COMPACT_INTERVAL")
+
+    def _account(self, number):
+        try:
+            return UserAccount.objects.get(account_number=number)
+        except UserAccount.DoesNotExist:
+            raise CommandError(f"Account {number} does not exist")
+
+    def handle(self, *args, **options):
+        shards = options["shards"] or settings.BALANCE_SHARDS_DEFAULT
+        if shards < 1:
+            raise CommandError("--shards must be at least 1")
+
+        for number in options["enable"]:
+            account = self._account(number)
+            set_balance_shards(account, shards)
+            self.stdout.write(f"{number}: {shards} shards")
+        for number in options["disable"]:
+            account = self._account(number)
+            set_balance_shards(account, 0)
+            self.stdout.write(f"{number}: sharding off, balance {available_balance(account)}")
+        if (options["enable"] or options["disable"]) and not options["loop"]:
+            return
+
+        interval = options["interval"] or settings.BALANCE_SHARD_COMPACT_INTERVAL
+        while True:
+            try:
+                compacted = compact_hot_accounts()
+            except OperationalError:
+                if not options["loop"]:
+                    raise
+                # SQLite "database is locked"; parked credits wait for the next pass
+                compacted = 0
+            if not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} hot accounts"))
+                return
+            time.sleep(interval)
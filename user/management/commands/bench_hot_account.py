@@ -0,0 +1,106 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from user import ledger
+from user.benchmarks import seed_users, summarize
+from user.models import CustomUser, UserAccount
+from user.transfers import TRANSFER_TYPES
+
+
+class Command(BaseCommand):
+    help = (
+        "Contention benchmark: many concurrent payers sending domestic transfers to "
+        "one receiver, with the receiver unsharded and then sharded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payers", type=int, default=64)
+        parser.add_argument("--transfers", type=int, default=20, help="Transfers per payer")
+        parser.add_argument("--shards", type=int, default=16)
+        parser.add_argument("--prefix", default="hotbench")
+
+    def _round(self, label, payers, receiver, transfers):
+        domestic = TRANSFER_TYPES["domestic"]
+        fields = {
+            "beneficiary_name": "Merchant",
+            "beneficiary_account_number": receiver.account_number,
+            "bank_name": "TDB",
+            "description": "",
+            "account_type": "savings",
+        }
+        amount = Decimal("1.00")
+        users = {u.pk: u for u in CustomUser.objects.filter(pk__in=[p.user_id for p in payers])}
+        samples = []
+        counters = {"ok": 0, "failed": 0, "retries": 0}
+        lock = threading.Lock()
+        start = threading.Barrier(len(payers))
+
+        def payer(user):
+            local_samples = []
+            local = {"ok": 0, "failed": 0, "retries": 0}
+            try:
+                start.wait()
+                for _ in range(transfers):
+                    started = time.perf_counter()
+                    while True:
+                        try:
+                            status_code, _ = domestic.execute(user, fields, amount)
+                        except OperationalError:
+                            # SQLite "database is locked"; retry the whole transaction
+                            local["retries"] += 1
+                            continue
+                        break
+                    local["ok" if status_code == 201 else "failed"] += 1
+                    local_samples.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+            with lock:
+                samples.extend(local_samples)
+                for key, value in local.items():
+                    counters[key] += value
+
+        threads = [threading.Thread(target=payer, args=(users[p.user_id],)) for p in payers]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        receiver.refresh_from_db()
+        received = ledger.available_balance(receiver)
+        expected = amount * counters["ok"]
+        self.stdout.write(f"{label}: {counters}")
+        self.stdout.write(f"  {summarize(samples, elapsed)}")
+        if received != expected:
+            raise CommandError(f"{label}: receiver holds {received}, expected {expected}")
+        ledger.compact_shards(receiver)
+        receiver.refresh_from_db()
+        if receiver.account_balance != expected or ledger.available_balance(receiver) != expected:
+            raise CommandError(f"{label}: compaction changed the balance to {receiver.account_balance}")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if UserAccount.objects.filter(user__username__startswith=f"{prefix}_").exists():
+            raise CommandError(f"Accounts with prefix '{prefix}' already exist; pass a fresh --prefix")
+
+        transfers = options["transfers"]
+        balance = Decimal(transfers) * 2
+        payers = seed_users(options["payers"], prefix=f"{prefix}_payer", balance=balance)
+        plain, hot = seed_users(2, prefix=f"{prefix}_merchant")
+
+        self._round("unsharded receiver", payers, plain, transfers)
+        ledger.set_balance_shards(hot, options["shards"])
+        self._round(f"receiver with {options['shards']} shards", payers, hot, transfers)
+
+        total = UserAccount.objects.filter(user__username__startswith=f"{prefix}_").aggregate(
+            total=Sum("account_balance")
+        )["total"]
+        if total != balance * len(payers):
+            raise CommandError(f"Balance drift detected: {total} != {balance * len(payers)}")
+        self.stdout.write(self.style.SUCCESS("No balance drift"))
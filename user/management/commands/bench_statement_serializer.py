@@ -0,0 +1,119 @@
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localtime, now
+
+from user.renderers import FastJSONRenderer
+from user.serializers import serialize_rows
+from user.statement import STATEMENT_COLUMNS
+
+# The per-row format the statement used before rows were serialized from tuples
+LEGACY_FIELDS = {
+    "domestic_transfer": [
+        ("beneficiary_name", "tx_beneficiary_name"),
+        ("beneficiary_account", "tx_beneficiary_account"),
+        ("bank_name", "tx_bank_name"),
+        ("account_type", "tx_account_type"),
+    ],
+    "inter_bank": [
+        ("beneficiary_name", "tx_beneficiary_name"),
+        ("iban", "tx_iban"),
+        ("bank_name", "tx_bank_name"),
+        ("account_type", "tx_account_type"),
+        ("country", "tx_country"),
+    ],
+    "wire": [
+        ("beneficiary_name", "tx_beneficiary_name"),
+        ("routing_number", "tx_routing_number"),
+        ("iban", "tx_iban"),
+        ("bank_name", "tx_bank_name"),
+        ("swift_code", "tx_swift_code"),
+        ("country", "tx_country"),
+        ("account_type", "tx_account_type"),
+    ],
+}
+
+
+def legacy_serialize(rows):
+    items = []
+    for row in rows:
+        values = dict(zip(STATEMENT_COLUMNS, row))
+        item = {
+            "id": values["tx_id"],
+            "type": values["tx_type"],
+            "amount": float(values["tx_amount"]),
+            "description": values["tx_description"],
+        }
+        for key, column in LEGACY_FIELDS[values["tx_type"]]:
+            item[key] = values[column]
+        item["date"] = localtime(values["tx_date"]).strftime("%Y-%m-%d %H:%M:%S")
+        item["status"] = values["tx_status"]
+        items.append(item)
+    items.sort(key=lambda item: item["date"], reverse=True)
+    return items
+
+
+def fake_rows(count):
+    types = list(LEGACY_FIELDS)
+    started = now()
+    rows = []
+    for i in range(count):
+        values = dict.fromkeys(STATEMENT_COLUMNS)
+        values.update(
+            tx_id=i + 1,
+            tx_type=types[i % len(types)],
+            tx_amount=Decimal(random.randint(1, 10_000_000)) / 100,
+            tx_description="Benchmark transfer",
+            tx_status="completed",
+            tx_date=started - timedelta(seconds=i),
+            tx_beneficiary_name="Benchmark Beneficiary",
+            tx_beneficiary_account="1234567890",
+            tx_iban="GB29NWBK60161331926819",
+            tx_routing_number="021000021",
+            tx_swift_code="NWBKGB2L",
+            tx_bank_name="Benchmark Bank",
+            tx_country="GB",
+            tx_account_type="savings",
+        )
+        rows.append(tuple(values[column] for column in STATEMENT_COLUMNS))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the legacy dict/float/strftime statement serialization with the "
+        "tuple serializer and JSON renderer. Needs no database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per path; the best is reported")
+
+    def handle(self, *args, **options):
+        rows = fake_rows(options["rows"])
+        renderer = FastJSONRenderer()
+
+        def legacy():
+            return json.dumps({"transactions": legacy_serialize(rows)}).encode()
+
+        def current():
+            return renderer.render({"transactions": serialize_rows(rows)})
+
+        results = {}
+        for name, func in (("legacy", legacy), ("current", current)):
+            best = min(self.timed(func) for _ in range(options["repeat"]))
+            results[name] = best
+            self.stdout.write(
+                f"{name:>8}: {best * 1000:.1f} ms  ({options['rows'] / best:,.0f} rows/s)"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {results['legacy'] / results['current']:.1f}x"))
+
+    @staticmethod
+    def timed(func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
@@ -0,0 +1,127 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from user.benchmarks import seed_transfers, seed_users, time_call
+from user.models import CustomUser, DomesticTransfer, InterBankTransfer, UserAccount, WireTransfer
+
+TRANSFER_MODELS = [DomesticTransfer, InterBankTransfer, WireTransfer]
+PREFIX = "idxbench"
+
+
+def benchmarked_indexes(model):
+    # The settlement worker's claim index is not part of this benchmark
+    return [index for index in model._meta.indexes if not index.name.endswith("_settle_idx")]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a transfer dataset and compare query plans and timings of the "
+        "statement hot paths with and without the transaction indexes. "
+        "Dropping the indexes affects every user of the database, so the "
+        "unindexed run needs --drop-indexes; point it at a benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000, help="Transfers to seed")
+        parser.add_argument("--users", type=int, default=10_000, help="Accounts to spread transfers over")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query")
+        parser.add_argument("--skip-seed", action="store_true", help="Reuse a dataset kept with --keep-data")
+        parser.add_argument(
+            "--drop-indexes", action="store_true",
+            help="Also time the queries without the transaction indexes (drops and rebuilds them)",
+        )
+        parser.add_argument("--keep-data", action="store_true", help="Leave the seeded accounts and transfers")
+
+    def handle(self, *args, **options):
+        if not options["skip_seed"]:
+            self.stdout.write(f"Seeding {options['users']} accounts and {options['rows']} transfers...")
+            accounts = seed_users(options["users"], prefix=PREFIX)
+            seed_transfers(accounts, options["rows"], batch_size=options["batch_size"], stdout=self.stdout)
+
+        account = UserAccount.objects.filter(user__username__startswith=f"{PREFIX}_").order_by("id").first()
+        if account is None:
+            self.stderr.write("No seeded accounts found; run without --skip-seed first.")
+            return
+
+        try:
+            self.stdout.write(self.style.MIGRATE_HEADING("With indexes"))
+            with_indexes = self.run_queries(account, options["repeat"])
+            if not options["drop_indexes"]:
+                return
+
+            self.drop_indexes()
+            try:
+                self.stdout.write(self.style.MIGRATE_HEADING("Without indexes"))
+                without_indexes = self.run_queries(account, options["repeat"])
+            finally:
+                self.create_indexes()
+
+            self.stdout.write(self.style.MIGRATE_HEADING("Summary (p50 ms)"))
+            for name in with_indexes:
+                self.stdout.write(
+                    f"  {name:<32} indexed={with_indexes[name]['p50_ms']:>10} "
+                    f"unindexed={without_indexes[name]['p50_ms']:>10}"
+                )
+        finally:
+            if not options["keep_data"]:
+                self.delete_seeded()
+
+    def queries(self, account):
+        return {
+            "statement_by_user": [
+                model.objects.filter(user_id=account.user_id).order_by("-date")[:50]
+                for model in TRANSFER_MODELS
+            ],
+            "history_by_account": [
+                model.objects.filter(account_id=account.id).order_by("-date")[:50]
+                for model in TRANSFER_MODELS
+            ],
+            "pending_by_status": [
+                model.objects.filter(status="pending").order_by("date")[:50]
+                for model in TRANSFER_MODELS
+            ],
+            "incoming_by_beneficiary": [
+                DomesticTransfer.objects.filter(
+                    beneficiary_account_number=account.account_number
+                ).order_by("-date")[:50]
+            ],
+            "lookup_by_iban": [
+                model.objects.filter(iban="GB00000000000000000000")
+                for model in (InterBankTransfer, WireTransfer)
+            ],
+        }
+
+    def run_queries(self, account, repeat):
+        results = {}
+        for name, querysets in self.queries(account).items():
+            self.stdout.write(self.style.SQL_KEYWORD(name))
+            for qs in querysets:
+                self.stdout.write("  " + qs.explain().replace("\n", "\n  "))
+            results[name] = time_call(lambda: [list(qs.all()) for qs in querysets], repeat=repeat)
+            self.stdout.write(f"  {results[name]}")
+        return results
+
+    def _index_options(self):
+        # Non-atomic editor, so PostgreSQL can drop and rebuild CONCURRENTLY
+        # without blocking writes to the transfer tables
+        return {"concurrently": True} if connection.vendor == "postgresql" else {}
+
+    def drop_indexes(self):
+        with connection.schema_editor(atomic=False) as editor:
+            for model in TRANSFER_MODELS:
+                for index in benchmarked_indexes(model):
+                    editor.remove_index(model, index, **self._index_options())
+
+    def create_indexes(self):
+        with connection.schema_editor(atomic=False) as editor:
+            for model in TRANSFER_MODELS:
+                for index in benchmarked_indexes(model):
+                    editor.add_index(model, index, **self._index_options())
+
+    def delete_seeded(self):
+        users = CustomUser.objects.filter(username__startswith=f"{PREFIX}_")
+        for model in TRANSFER_MODELS:
+            model.objects.filter(user__in=users).delete()
+        users.delete()
+        self.stdout.write("Deleted the seeded accounts and transfers")
@@ -0,0 +1,36 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from user.signup import OPTIONAL_FIELDS, REQUIRED_FIELDS, bulk_signup
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users, accounts and tokens from a CSV file with bulk inserts. "
+        "Columns: first_name, last_name, username, email and either password "
+        "or a Django-format password_hash (neither gives an unusable password), "
+        "plus any optional profile fields."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction")
+        parser.add_argument("--workers", type=int, default=None, help="Password hashing threads")
+        parser.add_argument("--show-skipped", type=int, default=20, help="Skipped rows to list")
+
+    def handle(self, *args, **options):
+        columns = REQUIRED_FIELDS + OPTIONAL_FIELDS + ["password_hash", "account_type", "account_currency"]
+        with open(options["csv_file"], newline="", encoding="utf-8-sig") as handle:
+            rows = [
+                {key: (row.get(key) or "").strip() or None for key in columns}
+                for row in csv.DictReader(handle)
+            ]
+
+        created, skipped = bulk_signup(rows, batch_size=options["batch_size"], workers=options["workers"])
+
+        for number, reason in skipped[:options["show_skipped"]]:
+            self.stdout.write(f"  row {number}: {reason}")
+        if len(skipped) > options["show_skipped"]:
+            self.stdout.write(f"  ... and {len(skipped) - options['show_skipped']} more")
+        self.stdout.write(self.style.SUCCESS(f"Created {created} users; skipped {len(skipped)} rows"))
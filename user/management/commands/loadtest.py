@@ -0,0 +1,110 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user.benchmarks import http_request, run_http_load
+
+# scenario -> (sync path, async path, method)
+SCENARIOS = {
+    "login": ("/user/login/", "/user/async/login/", "POST"),
+    "statement": ("/user/account/statement/", "/user/async/account/statement/", "GET"),
+    "domestic": ("/user/domestic/transfer/", "/user/async/domestic/transfer/", "POST"),
+}
+
+
+def non_2xx(stats):
+    """Counts of the statuses in ``stats`` that are not 2xx (including connection errors)."""
+    return {status: count for status, count in stats["statuses"].items() if not status.startswith("2")}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/second and p99 latency of the sync views under a WSGI "
+        "server with the async views under an ASGI server. Start both first with "
+        "rate limits off, e.g. 'DISABLE_RATE_LIMITS=1 gunicorn tdback.wsgi -w 4 -b :8000' and "
+        "'DISABLE_RATE_LIMITS=1 uvicorn tdback.asgi:application --workers 4 --port 8001'. "
+        "Fails if any response is not 2xx, since the timings would then measure rejections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wsgi-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--asgi-url", default="http://127.0.0.1:8001")
+        parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+        parser.add_argument("--username", required=True, help="Existing user to log in as")
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--beneficiary", help="Account number credited by the domestic scenario")
+        parser.add_argument("--amount", default="0.01")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--allow-errors", action="store_true", help="Report non-2xx responses instead of failing on them"
+        )
+
+    def login(self, base_url, login_path, options):
+        status, body = http_request(
+            base_url + login_path,
+            "POST",
+            {"username_or_email": options["username"], "password": options["password"]},
+        )
+        if status != 200:
+            raise CommandError(f"Login against {base_url} failed with HTTP {status}: {body}")
+        return body["data"]["token"]
+
+    def handle(self, *args, **options):
+        scenarios = options["scenario"] or sorted(SCENARIOS)
+        if "domestic" in scenarios and not options["beneficiary"]:
+            raise CommandError("--beneficiary is required for the domestic scenario")
+
+        results = {}
+        failed = []
+        for server, base_url, index in (("wsgi", options["wsgi_url"], 0), ("asgi", options["asgi_url"], 1)):
+            token = self.login(base_url, SCENARIOS["login"][index], options)
+            auth = {"Authorization": f"Token {token}"}
+            for scenario in scenarios:
+                path, method = SCENARIOS[scenario][index], SCENARIOS[scenario][2]
+                if scenario == "login":
+                    headers = None
+                    body_factory = lambda i: {
+                        "username_or_email": options["username"], "password": options["password"]
+                    }
+                elif scenario == "statement":
+                    headers, body_factory = auth, None
+                else:
+                    headers = auth
+                    body_factory = lambda i: {
+                        "password": options["password"],
+                        "beneficiary_name": "Load Test",
+                        "beneficiary_account_number": options["beneficiary"],
+                        "bank_name": "Load Test Bank",
+                        "amount": options["amount"],
+                        "description": f"loadtest {uuid.uuid4()}",
+                    }
+                self.stdout.write(f"{server} {scenario}: {options['requests']} requests @ {options['concurrency']}")
+                results[(server, scenario)] = run_http_load(
+                    base_url + path,
+                    options["requests"],
+                    options["concurrency"],
+                    method=method,
+                    body_factory=body_factory,
+                    headers=headers,
+                )
+                self.stdout.write(f"  {results[(server, scenario)]}")
+                errors = non_2xx(results[(server, scenario)])
+                if errors:
+                    failed.append(f"{server} {scenario}")
+                    self.stdout.write(self.style.WARNING(f"  non-2xx responses: {errors}"))
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Summary"))
+        self.stdout.write(f"  {'scenario':<12}{'wsgi rps':>12}{'asgi rps':>12}{'wsgi p99':>12}{'asgi p99':>12}")
+        for scenario in scenarios:
+            wsgi, asgi = results[("wsgi", scenario)], results[("asgi", scenario)]
+            self.stdout.write(
+                f"  {scenario:<12}{wsgi['throughput_rps']:>12}{asgi['throughput_rps']:>12}"
+                f"{wsgi['p99_ms']:>12}{asgi['p99_ms']:>12}"
+            )
+
+        if failed and not options["allow_errors"]:
+            raise CommandError(
+                f"Non-2xx responses in {', '.join(failed)}; the timings above include rejected requests. "
+                "A 429 or 503 means the servers rate limit: start them with DISABLE_RATE_LIMITS=1."
+            )
@@ -0,0 +1,156 @@
+import json
+import random
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from user.benchmarks import run_client_load, seed_transfers, seed_users
+from user.models import UserAccount
+
+SCENARIOS = ["signup", "login", "statement", "domestic", "interbank", "wire"]
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "perf" / "baseline.json"
+# Options that shape the workload; a baseline is only comparable under the same ones
+RUN_OPTIONS = ["users", "transfers", "requests", "concurrency"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed users and transfers, drive the signup, login, statement and transfer "
+        "endpoints in-process at a given concurrency, and report throughput, "
+        "p50/p95/p99 latency and queries per request. Results can be saved as a "
+        "baseline and later runs compared against it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--transfers", type=int, default=1_000_000, help="Mixed transfers to seed")
+        parser.add_argument("--prefix", default="perf")
+        parser.add_argument("--password", default="perf-password")
+        parser.add_argument("--skip-seed", action="store_true", help="Reuse accounts seeded with --prefix")
+        parser.add_argument("--scenario", action="append", choices=SCENARIOS)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+        parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+        parser.add_argument(
+            "--tolerance", type=float, default=25.0,
+            help="Allowed percentage regression in p95 latency and throughput",
+        )
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        seeded = UserAccount.objects.filter(user__username__startswith=f"{prefix}_")
+        if options["skip_seed"]:
+            accounts = list(seeded.select_related("user").order_by("id"))
+            if len(accounts) < 2:
+                raise CommandError(f"No seeded accounts with prefix '{prefix}'; run without --skip-seed")
+        else:
+            if seeded.exists():
+                raise CommandError(f"Accounts with prefix '{prefix}' already exist; pass --skip-seed or a fresh --prefix")
+            self.stdout.write(f"Seeding {options['users']} accounts and {options['transfers']} transfers...")
+            accounts = seed_users(
+                options["users"], prefix=prefix, balance=Decimal("1000000000.00"), password=options["password"]
+            )
+            seed_transfers(accounts, options["transfers"], stdout=self.stdout)
+            accounts = list(seeded.select_related("user").order_by("id"))
+
+        tokens = {token.user_id: token.key for token in Token.objects.filter(user__in=[a.user for a in accounts])}
+        Token.objects.bulk_create(
+            [Token(user=a.user, key=Token.generate_key()) for a in accounts if a.user_id not in tokens]
+        )
+        tokens = {token.user_id: token.key for token in Token.objects.filter(user__in=[a.user for a in accounts])}
+
+        run_id = uuid.uuid4().hex[:8]
+        password = options["password"]
+
+        def auth(account):
+            return {"HTTP_AUTHORIZATION": f"Token {tokens[account.user_id]}"}
+
+        def post(client, path, body, account=None):
+            return client.post(path, body, content_type="application/json", **(auth(account) if account else {}))
+
+        senders = {
+            "signup": lambda client, i: post(client, "/user/register/", {
+                "first_name": "Perf", "last_name": "User", "password": password,
+                "username": f"{prefix}signup_{run_id}_{i}", "email": f"{prefix}signup_{run_id}_{i}@example.com",
+            }),
+            "login": lambda client, i: post(client, "/user/login/", {
+                "username_or_email": accounts[i % len(accounts)].user.username, "password": password,
+            }),
+            "statement": lambda client, i: client.get(
+                "/user/account/statement/", **auth(accounts[i % len(accounts)])
+            ),
+            "domestic": lambda client, i: post(client, "/user/domestic/transfer/", {
+                "password": password,
+                "beneficiary_name": "Perf Beneficiary",
+                "beneficiary_account_number": random.choice(accounts).account_number,
+                "bank_name": "Perf Bank",
+                "amount": "1.00",
+            }, accounts[i % len(accounts)]),
+            "interbank": lambda client, i: post(client, "/user/interbank/transfer/", {
+                "password": password, "beneficiary_name": "Perf Beneficiary", "iban": "GB29NWBK60161331926819",
+                "bank_name": "Perf Bank", "country": "GB", "amount": "1.00",
+            }, accounts[i % len(accounts)]),
+            "wire": lambda client, i: post(client, "/user/wire/transfer/", {
+                "password": password, "beneficiary_name": "Perf Beneficiary", "routing_number": "021000021",
+                "iban": "GB29NWBK60161331926819", "bank_name": "Perf Bank", "swift_code": "NWBKGB2L",
+                "country": "GB", "amount": "1.00",
+            }, accounts[i % len(accounts)]),
+        }
+
+        results = {}
+        # Every simulated client shares one IP; measure capacity, not the rate limiter
+        with override_settings(RATE_LIMITS={}):
+            for scenario in options["scenario"] or SCENARIOS:
+                self.stdout.write(f"{scenario}: {options['requests']} requests @ {options['concurrency']}")
+                results[scenario] = run_client_load(options["requests"], options["concurrency"], senders[scenario])
+                self.stdout.write(f"  {results[scenario]}")
+
+        self.report(results)
+        run_options = {key: options[key] for key in RUN_OPTIONS}
+        if options["save_baseline"]:
+            options["baseline"].parent.mkdir(parents=True, exist_ok=True)
+            baseline = {"options": run_options, "scenarios": results}
+            options["baseline"].write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+        elif options["baseline"].exists():
+            baseline = json.loads(options["baseline"].read_text())
+            if baseline["options"] != run_options:
+                self.stdout.write(self.style.WARNING(
+                    f"Baseline was recorded with {baseline['options']}; timings may not be comparable"
+                ))
+            self.compare(results, baseline["scenarios"], options["tolerance"])
+
+    def report(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING("Summary"))
+        self.stdout.write(f"  {'scenario':<12}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>10}")
+        for scenario, stats in results.items():
+            self.stdout.write(
+                f"  {scenario:<12}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+                f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['queries_per_request']:>10}"
+            )
+
+    def compare(self, results, baseline, tolerance):
+        self.stdout.write(self.style.MIGRATE_HEADING("Against baseline"))
+        regressions = []
+        for scenario, stats in results.items():
+            base = baseline.get(scenario)
+            if base is None:
+                continue
+            # Query counts do not depend on the machine; allow only cache warm-up noise
+            if stats["queries_per_request"] > base["queries_per_request"] + 0.5:
+                regressions.append(
+                    f"{scenario}: queries/request {base['queries_per_request']} -> {stats['queries_per_request']}"
+                )
+            if stats["p95_ms"] > base["p95_ms"] * (1 + tolerance / 100):
+                regressions.append(f"{scenario}: p95 {base['p95_ms']}ms -> {stats['p95_ms']}ms")
+            if stats["throughput_rps"] < base["throughput_rps"] * (1 - tolerance / 100):
+                regressions.append(f"{scenario}: throughput {base['throughput_rps']} -> {stats['throughput_rps']} rps")
+        if regressions:
+            raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
@@ -0,0 +1,105 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from user.reconcile import (
+    account_ranges, clear_checkpoint, load_checkpoint, reconcile_range, save_checkpoint
+)
+
+
+def _reconcile_chunk(args):
+    # Runs in a forked worker, which opens its own database connection
+    lo, hi, repair = args
+    try:
+        return reconcile_range(lo, hi, repair)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Check account deposit/withdrawal counters against transfer history, "
+        "optionally repairing mismatches. Resumes from a checkpoint file; "
+        "runs one pass, or one every --interval seconds with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Worker processes; 1 runs inline")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Defaults to RECONCILE_CHUNK_SIZE")
+        parser.add_argument("--repair", action="store_true", help="Correct mismatched counters (and balances the ledger shows are off)")
+        parser.add_argument("--checkpoint", default=None, help="Defaults to RECONCILE_CHECKPOINT_FILE")
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+        parser.add_argument("--loop", action="store_true", help="Keep reconciling every --interval seconds")
+        parser.add_argument("--interval", type=float, default=None, help="Defaults to RECONCILE_INTERVAL")
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"] or str(settings.RECONCILE_CHECKPOINT_FILE)
+        if options["restart"]:
+            clear_checkpoint(checkpoint)
+        interval = options["interval"] or settings.RECONCILE_INTERVAL
+        while True:
+            self.reconcile(options, checkpoint)
+            if not options["loop"]:
+                return
+            time.sleep(interval)
+
+    def _chunks(self, ranges, repair, workers):
+        if workers <= 1:
+            for lo, hi in ranges:
+                yield reconcile_range(lo, hi, repair)
+            return
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            # map() yields in submission order, so the checkpoint only moves
+            # past a range once every range before it is done
+            yield from pool.map(_reconcile_chunk, [(lo, hi, repair) for lo, hi in ranges])
+
+    def describe(self, mismatch):
+        if mismatch["kind"] == "ledger_drift":
+            return (
+                f"Account {mismatch['account_number']}: balance is {mismatch['ledger_drift']} off the ledger "
+                f"while its counters agree; left for review"
+            )
+        message = (
+            f"Account {mismatch['account_number']}: "
+            f"deposits {mismatch['total_deposit']} (expected {mismatch['expected_deposit']}), "
+            f"withdrawals {mismatch['total_withdrawal']} (expected {mismatch['expected_withdrawal']})"
+        )
+        if mismatch["balance_adjustment"]:
+            message += f", balance adjusted by {mismatch['balance_adjustment']}"
+        return message
+
+    def reconcile(self, options, checkpoint):
+        chunk_size = options["chunk_size"] or settings.RECONCILE_CHUNK_SIZE
+        state = load_checkpoint(checkpoint) or {"next_id": 1, "checked": 0, "mismatches": 0}
+        if state["next_id"] > 1:
+            self.stdout.write(f"Resuming from account id {state['next_id']}")
+
+        started = time.perf_counter()
+        ranges = account_ranges(state["next_id"], chunk_size)
+        for (lo, hi), (checked, mismatches) in zip(
+            ranges, self._chunks(ranges, options["repair"], options["workers"])
+        ):
+            for mismatch in mismatches:
+                self.stdout.write(self.style.WARNING(self.describe(mismatch)))
+            state = {
+                "next_id": hi,
+                "checked": state["checked"] + checked,
+                "mismatches": state["mismatches"] + len(mismatches),
+            }
+            save_checkpoint(checkpoint, state)
+
+        clear_checkpoint(checkpoint)
+        elapsed = time.perf_counter() - started
+        action = "repaired" if options["repair"] else "found"
+        style = self.style.WARNING if state["mismatches"] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Reconciled {state['checked']} accounts in {elapsed:.1f}s: "
+            f"{state['mismatches']} mismatches {action}"
+        ))
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from user.settlement import settle_due
+
+
+class Command(BaseCommand):
+    help = (
+        "Settle pending interbank and wire transfers with the configured gateway. "
+        "Runs until nothing is due, or forever with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent settlement threads")
+        parser.add_argument("--batch-size", type=int, default=None, help="Defaults to SETTLEMENT_BATCH_SIZE")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for due transfers")
+        parser.add_argument("--interval", type=float, default=1.0, help="Idle poll interval with --loop")
+
+    def handle(self, *args, **options):
+        totals = {"completed": 0, "failed": 0, "retrying": 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def worker():
+            try:
+                while not stop.is_set():
+                    try:
+                        counts = settle_due(options["batch_size"])
+                    except OperationalError:
+                        # SQLite "database is locked"; leased transfers come back when the lease expires
+                        stop.wait(options["interval"])
+                        continue
+                    with lock:
+                        for state, count in counts.items():
+                            totals[state] += count
+                    if not any(counts.values()):
+                        if not options["loop"]:
+                            break
+                        stop.wait(options["interval"])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(options["workers"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Settled in {elapsed:.1f}s: {totals['completed']} completed, "
+            f"{totals['failed']} failed, {totals['retrying']} scheduled for retry"
+        ))
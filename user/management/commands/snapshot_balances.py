@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from user.ledger import snapshot_accounts
+from user.models import UserAccount
+
+
+class Command(BaseCommand):
+    help = "Materialize balance snapshots from the ledger; schedule periodically (e.g. cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        written = 0
+        last_id = 0
+        while True:
+            ids = list(
+                UserAccount.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            written += snapshot_accounts(ids)
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} balance snapshots"))
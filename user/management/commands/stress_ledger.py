@@ -0,0 +1,95 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from user import ledger
+from user.benchmarks import seed_users, summarize
+from user.models import UserAccount
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer the ledger service with concurrent random transfers and verify "
+        "that no money is created or lost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=50)
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--transfers", type=int, default=500, help="Transfers per thread")
+        parser.add_argument("--balance", type=Decimal, default=Decimal("1000.00"))
+        parser.add_argument("--prefix", default="ledgerstress")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if UserAccount.objects.filter(user__username__startswith=f"{prefix}_").exists():
+            raise CommandError(f"Accounts with prefix '{prefix}' already exist; pass a fresh --prefix")
+
+        accounts = seed_users(options["accounts"], prefix=prefix, balance=options["balance"])
+        account_ids = [account.id for account in accounts]
+        expected_total = options["balance"] * len(accounts)
+
+        samples = []
+        counters = {"ok": 0, "insufficient": 0, "retries": 0}
+        lock = threading.Lock()
+
+        def worker():
+            local_samples = []
+            local = {"ok": 0, "insufficient": 0, "retries": 0}
+            try:
+                for _ in range(options["transfers"]):
+                    sender_id, receiver_id = random.sample(account_ids, 2)
+                    amount = Decimal(random.randint(1, 20000)) / 100
+                    sender = UserAccount(pk=sender_id)
+                    receiver = UserAccount(pk=receiver_id)
+                    started = time.perf_counter()
+                    while True:
+                        try:
+                            ledger.transfer(sender, receiver, amount)
+                            local["ok"] += 1
+                        except ledger.InsufficientFunds:
+                            local["insufficient"] += 1
+                        except OperationalError:
+                            # SQLite "database is locked"; retry the whole transaction
+                            local["retries"] += 1
+                            continue
+                        break
+                    local_samples.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+            with lock:
+                samples.extend(local_samples)
+                for key, value in local.items():
+                    counters[key] += value
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        totals = UserAccount.objects.filter(pk__in=account_ids).aggregate(
+            balance=Sum("account_balance"),
+            deposits=Sum("total_deposit"),
+            withdrawals=Sum("total_withdrawal"),
+        )
+        negative = UserAccount.objects.filter(pk__in=account_ids, account_balance__lt=0).count()
+
+        self.stdout.write(f"Transfers: {counters}")
+        self.stdout.write(f"Latency: {summarize(samples, elapsed)}")
+        self.stdout.write(f"Expected total balance: {expected_total}  actual: {totals['balance']}")
+
+        drift = totals["balance"] - expected_total
+        if drift or negative or totals["deposits"] != totals["withdrawals"]:
+            raise CommandError(
+                f"Balance drift detected: drift={drift} negative_accounts={negative} "
+                f"deposits={totals['deposits']} withdrawals={totals['withdrawals']}"
+            )
+        self.stdout.write(self.style.SUCCESS("No balance drift"))
@@ -0,0 +1,217 @@
+"""Per-route request, database and password-hash metrics in Prometheus text format.
+
+Metrics live in process memory, so each worker process exposes its own
+series; let Prometheus scrape each worker or sum them.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+HASH_EWMA_ALPHA = 0.2
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "Request latency by route.",
+            LATENCY_BUCKETS, ("route", "method", "status"),
+        )
+        self.request_queries = Histogram(
+            "http_request_db_queries", "Database queries per request by route.",
+            QUERY_COUNT_BUCKETS, ("route",),
+        )
+        self.request_db_time = Histogram(
+            "http_request_db_duration_seconds", "Time spent in database queries per request by route.",
+            LATENCY_BUCKETS, ("route",),
+        )
+        self.password_hash = Histogram(
+            "password_hash_duration_seconds", "Password hashing time.",
+            LATENCY_BUCKETS, ("algorithm",),
+        )
+        # Moving average of hash time, read by the load shedder
+        self.hash_latency = 0.0
+        self.hash_observed_at = 0.0
+
+    def observe_request(self, route, method, status, elapsed, state):
+        with self._lock:
+            self.request_latency.observe((route, method, str(status)), elapsed)
+            self.request_queries.observe((route,), state.queries)
+            self.request_db_time.observe((route,), state.query_time)
+
+    def observe_hash(self, algorithm, elapsed):
+        with self._lock:
+            self.password_hash.observe((algorithm,), elapsed)
+            if self.hash_observed_at:
+                self.hash_latency += HASH_EWMA_ALPHA * (elapsed - self.hash_latency)
+            else:
+                self.hash_latency = elapsed
+            self.hash_observed_at = time.monotonic()
+
+    def recent_hash_latency(self, window):
+        """Average hash time, or 0 if nothing was hashed in the last ``window`` seconds."""
+        if time.monotonic() - self.hash_observed_at > window:
+            return 0.0
+        return self.hash_latency
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for histogram in (self.request_latency, self.request_queries, self.request_db_time, self.password_hash):
+                lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestState:
+    __slots__ = ("route", "queries", "query_time", "hash_time", "statements", "reported")
+
+    def __init__(self):
+        self.route = ""
+        self.queries = 0
+        self.query_time = 0.0
+        self.hash_time = 0.0
+        self.statements = {}
+        self.reported = set()
+
+
+def _record_query(execute, sql, params, many, context):
+    state = _current.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        state.queries += 1
+        state.query_time += elapsed
+        if elapsed * 1000 >= settings.METRICS_SLOW_QUERY_MS:
+            logger.warning("Slow query (%.1f ms) on %s: %.500s", elapsed * 1000, state.route, sql)
+        # Same SQL text with different parameters, over and over: likely an N+1
+        seen = state.statements[sql] = state.statements.get(sql, 0) + 1
+        if seen == settings.METRICS_N_PLUS_ONE_THRESHOLD and sql not in state.reported:
+            state.reported.add(sql)
+            logger.warning("Possible N+1 on %s: query repeated %d times: %.500s", state.route, seen, sql)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Installed per connection so queries from sync_to_async threads are counted too
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class InstrumentedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2PasswordHasher that records hashing time; stored hashes are unchanged."""
+
+    def encode(self, password, salt, iterations=None):
+        started = time.perf_counter()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.observe_hash(self.algorithm, elapsed)
+            state = _current.get()
+            if state is not None:
+                state.hash_time += elapsed
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token, started = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, state, started)
+        return response
+
+    async def __acall__(self, request):
+        state, token, started = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, state, started)
+        return response
+
+    def _start(self, request):
+        state = RequestState()
+        state.route = request.path  # replaced by the URL pattern once resolved
+        return state, _current.set(state), time.perf_counter()
+
+    def _finish(self, request, response, state, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        state.route = match.route if match else "unmatched"
+        registry.observe_request(state.route, request.method, response.status_code, elapsed, state)
+        if settings.METRICS_RESPONSE_HEADERS:
+            response["Server-Timing"] = (
+                f"db;dur={state.query_time * 1000:.1f};desc=\"{state.queries} queries\", "
+                f"hash;dur={state.hash_time * 1000:.1f}, total;dur={elapsed * 1000:.1f}"
+            )
+
+
+def metrics_view(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
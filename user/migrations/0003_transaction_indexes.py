@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:03
+
+from django.db import migrations, models
+
+from user.operations import AddIndexOnline
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on PostgreSQL, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('user', '0002_useraccount_interbanktransfer_domestictransfer_and_more'),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='domestictransfer',
+            index=models.Index(fields=['user', '-date'], name='domestictransfer_user_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='domestictransfer',
+            index=models.Index(fields=['account', '-date'], name='domestictransfer_acct_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='domestictransfer',
+            index=models.Index(fields=['status', 'date'], name='domestictransfer_stat_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='domestictransfer',
+            index=models.Index(fields=['beneficiary_account_number', '-date'], name='domestic_benef_date_idx'),
+        ),
+        AddIndexOnline(
+            model_name='interbanktransfer',
+            index=models.Index(fields=['user', '-date'], name='interbanktransfer_user_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='interbanktransfer',
+            index=models.Index(fields=['account', '-date'], name='interbanktransfer_acct_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='interbanktransfer',
+            index=models.Index(fields=['status', 'date'], name='interbanktransfer_stat_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='interbanktransfer',
+            index=models.Index(fields=['iban'], name='interbank_iban_idx'),
+        ),
+        AddIndexOnline(
+            model_name='wiretransfer',
+            index=models.Index(fields=['user', '-date'], name='wiretransfer_user_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='wiretransfer',
+            index=models.Index(fields=['account', '-date'], name='wiretransfer_acct_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='wiretransfer',
+            index=models.Index(fields=['status', 'date'], name='wiretransfer_stat_dt_idx'),
+        ),
+        AddIndexOnline(
+            model_name='wiretransfer',
+            index=models.Index(fields=['iban'], name='wire_iban_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.useraccount')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', '-last_entry_id'], name='snapshot_acct_entry_idx'), models.Index(fields=['account', '-taken_at'], name='snapshot_acct_taken_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('debit', 'Debit'), ('credit', 'Credit')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('transfer_type', models.CharField(choices=[('domestic_transfer', 'Domestic Transfer'), ('inter_bank', 'Inter-Bank Transfer'), ('wire', 'Wire Transfer'), ('deposit', 'Deposit'), ('withdrawal', 'Withdrawal')], max_length=50)),
+                ('transfer_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='user.useraccount')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'created_at'], name='ledger_acct_created_idx'), models.Index(fields=['account', 'id'], name='ledger_acct_id_idx'), models.Index(fields=['transfer_type', 'transfer_id'], name='ledger_transfer_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:09
+
+from django.db import migrations, models
+
+FIRST_ACCOUNT_SERIAL = 100000000
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE SEQUENCE IF NOT EXISTS user_account_number_seq START WITH {FIRST_ACCOUNT_SERIAL}'
+        )
+    else:
+        AccountNumberSequence = apps.get_model('user', 'AccountNumberSequence')
+        AccountNumberSequence.objects.get_or_create(
+            name='account_number', defaults={'next_value': FIRST_ACCOUNT_SERIAL}
+        )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS user_account_number_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountNumberSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
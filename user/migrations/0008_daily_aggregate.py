@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_account_number_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('domestic_transfer', 'Domestic Transfer'), ('inter_bank', 'Inter-Bank Transfer'), ('wire', 'Wire Transfer'), ('deposit', 'Deposit'), ('withdrawal', 'Withdrawal')], max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('unknown', 'Unknown')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=20)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.useraccount')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'day', 'transaction_type', 'status'), name='daily_aggregate_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:29
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # Fail with the offending addresses rather than a bare IntegrityError
+    CustomUser = apps.get_model('user', 'CustomUser')
+    duplicates = list(
+        CustomUser.objects.using(schema_editor.connection.alias)
+        .exclude(email='')
+        .annotate(email_lower=Lower('email'))
+        .values('email_lower')
+        .annotate(users=Count('id'))
+        .filter(users__gt=1)
+        .values_list('email_lower', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Merge or change users sharing an email (case-insensitively) before migrating: '
+            + ', '.join(duplicates)
+        )
+
+
+EMAIL_CONSTRAINT = models.UniqueConstraint(
+    Lower('email'), condition=models.Q(('email', ''), _negated=True), name='user_email_ci_uniq'
+)
+
+
+def create_email_index(apps, schema_editor):
+    # Built without blocking signups and logins on PostgreSQL
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.add_constraint(apps.get_model('user', 'CustomUser'), EMAIL_CONSTRAINT)
+        return
+    # A failed concurrent build leaves an INVALID index of the same name behind
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS "user_email_ci_uniq"')
+    schema_editor.execute(
+        'CREATE UNIQUE INDEX CONCURRENTLY "user_email_ci_uniq" '
+        'ON "user_customuser" (LOWER("email")) WHERE NOT ("email" = \'\')'
+    )
+
+
+def drop_email_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.remove_constraint(apps.get_model('user', 'CustomUser'), EMAIL_CONSTRAINT)
+        return
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS "user_email_ci_uniq"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user', '0009_external_transfer_settlement'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(model_name='customuser', constraint=EMAIL_CONSTRAINT),
+            ],
+            database_operations=[
+                migrations.RunPython(create_email_index, drop_email_index),
+            ],
+        ),
+    ]
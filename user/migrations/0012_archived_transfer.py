@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0011_balance_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_type', models.CharField(choices=[('domestic_transfer', 'Domestic Transfer'), ('inter_bank', 'Inter-Bank Transfer'), ('wire', 'Wire Transfer'), ('deposit', 'Deposit'), ('withdrawal', 'Withdrawal')], max_length=50)),
+                ('source_id', models.BigIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('unknown', 'Unknown')], max_length=20)),
+                ('date', models.DateTimeField()),
+                ('beneficiary_name', models.CharField(blank=True, default='', max_length=100)),
+                ('beneficiary_account_number', models.CharField(blank=True, default='', max_length=20)),
+                ('iban', models.CharField(blank=True, default='', max_length=34)),
+                ('routing_number', models.CharField(blank=True, default='', max_length=20)),
+                ('swift_code', models.CharField(blank=True, default='', max_length=20)),
+                ('bank_name', models.CharField(blank=True, default='', max_length=100)),
+                ('country', models.CharField(blank=True, default='', max_length=100)),
+                ('account_type', models.CharField(blank=True, default='', max_length=20)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.useraccount')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-date'], name='archived_user_dt_idx'), models.Index(fields=['account', 'status'], name='archived_acct_status_idx'), models.Index(fields=['beneficiary_account_number'], name='archived_benef_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source_type', 'source_id'), name='archived_transfer_source_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models, transaction
+from django.db.models import Min, Sum
+from django.utils.timezone import now
+
+CHUNK_SIZE = 1000
+
+
+def _total(queryset):
+    return queryset.aggregate(total=Sum('amount'))['total'] or 0
+
+
+def capture_baselines(apps, schema_editor):
+    # Transfers before the ledger series never moved total_deposit or
+    # total_withdrawal, so every existing account starts from its current
+    # counters and only later transfers are reconciled against them. An
+    # account with pending transfers starts at the oldest one, so that a
+    # later refund is checked too.
+    alias = schema_editor.connection.alias
+    UserAccount = apps.get_model('user', 'UserAccount')
+    BalanceShard = apps.get_model('user', 'BalanceShard')
+    CounterBaseline = apps.get_model('user', 'CounterBaseline')
+    outgoing = [apps.get_model('user', name) for name in ('DomesticTransfer', 'InterBankTransfer', 'WireTransfer')]
+    DomesticTransfer = outgoing[0]
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=alias):
+            # Locked, so no transfer dated after the cutover is already counted
+            accounts = list(
+                UserAccount.objects.using(alias).select_for_update()
+                .filter(pk__gt=last_id).order_by('pk')[:CHUNK_SIZE]
+            )
+            if not accounts:
+                return
+            cutover = now()
+            ids = [account.pk for account in accounts]
+            parked = dict(
+                BalanceShard.objects.using(alias).filter(account_id__in=ids)
+                .values('account').annotate(total=Sum('total_deposit')).values_list('account', 'total')
+            )
+            oldest_pending = {}
+            for model in outgoing[1:]:
+                for account_id, oldest in (
+                    model.objects.using(alias).filter(account_id__in=ids, status='pending')
+                    .values('account').annotate(oldest=Min('date')).values_list('account', 'oldest')
+                ):
+                    oldest_pending[account_id] = min(oldest, oldest_pending.get(account_id, oldest))
+
+            baselines = []
+            for account in accounts:
+                deposit = account.total_deposit + (parked.get(account.pk) or 0)
+                withdrawal = account.total_withdrawal
+                since = oldest_pending.get(account.pk, cutover)
+                if account.pk in oldest_pending:
+                    for model in outgoing:
+                        withdrawal -= _total(
+                            model.objects.using(alias).filter(account_id=account.pk, date__gte=since)
+                            .exclude(status='failed')
+                        )
+                    deposit -= _total(
+                        DomesticTransfer.objects.using(alias).filter(
+                            beneficiary_account_number=account.account_number, status='completed', date__gte=since
+                        )
+                    )
+                baselines.append(CounterBaseline(
+                    account_id=account.pk, total_deposit=deposit, total_withdrawal=withdrawal, since=since
+                ))
+            CounterBaseline.objects.using(alias).bulk_create(baselines)
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Baselines are captured one locked chunk of accounts at a time
+    atomic = False
+
+    dependencies = [
+        ('user', '0012_archived_transfer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_deposit', models.DecimalField(decimal_places=2, default=0.0, max_digits=20)),
+                ('total_withdrawal', models.DecimalField(decimal_places=2, default=0.0, max_digits=20)),
+                ('since', models.DateTimeField(default=django.utils.timezone.now)),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='counter_baseline', to='user.useraccount')),
+            ],
+        ),
+        migrations.RunPython(capture_baselines, migrations.RunPython.noop),
+    ]
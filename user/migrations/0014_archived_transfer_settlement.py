@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0013_counter_baseline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtransfer',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedtransfer',
+            name='failure_reason',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='archivedtransfer',
+            name='gateway_reference',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='archivedtransfer',
+            name='settled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
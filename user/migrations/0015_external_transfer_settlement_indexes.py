@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:56
+
+from django.db import migrations, models
+
+from user.operations import AddIndexOnline
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on PostgreSQL, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('user', '0014_archived_transfer_settlement'),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='interbanktransfer',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='interbanktransfer_settle_idx'),
+        ),
+        AddIndexOnline(
+            model_name='wiretransfer',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='wiretransfer_settle_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0015_external_transfer_settlement_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transferbatch',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
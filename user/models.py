@@ -5,6 +5,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.contrib.auth import get_user_model
 from django.utils.timezone import now
 
@@ -65,6 +67,12 @@ class CustomUser(AbstractUser):
         default='usd'
     )
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Login accepts an email in any case, so it must identify one user
+            models.UniqueConstraint(Lower("email"), condition=~Q(email=""), name="user_email_ci_uniq"),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.email})"
 
@@ -78,6 +86,8 @@ class UserAccount(models.Model):
     account_balance = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
     total_deposit = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
     total_withdrawal = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
+    # Hot accounts spread credits over this many BalanceShard rows; 0 = not sharded
+    balance_shards = models.PositiveSmallIntegerField(default=0)
     
     def __str__(self):
         return f"{self.user.username} - {self.account_number}"
@@ -108,6 +118,11 @@ class Transaction(models.Model):
 
     class Meta:
         abstract = True  
+        indexes = [
+            models.Index(fields=["user", "-date"], name="%(class)s_user_dt_idx"),
+            models.Index(fields=["account", "-date"], name="%(class)s_acct_dt_idx"),
+            models.Index(fields=["status", "date"], name="%(class)s_stat_dt_idx"),
+        ]
 
 # Domestic transfer
 class DomesticTransfer(Transaction):
@@ -116,12 +131,36 @@ class DomesticTransfer(Transaction):
     bank_name = models.CharField(max_length=100)
     account_type = models.CharField(max_length=20, default='savings') 
 
+    class Meta(Transaction.Meta):
+        indexes = Transaction.Meta.indexes + [
+            models.Index(fields=["beneficiary_account_number", "-date"], name="domestic_benef_date_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         self.transaction_type = "domestic_transfer"
         super().save(*args, **kwargs)
 
+# Transfers settled with another bank: accepted as pending, settled by a worker
+class ExternalTransfer(Transaction):
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    settled_at = models.DateTimeField(blank=True, null=True)
+    failure_reason = models.TextField(blank=True, default='')
+    gateway_reference = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta(Transaction.Meta):
+        abstract = True
+        indexes = Transaction.Meta.indexes + [
+            models.Index(fields=["status", "next_attempt_at"], name="%(class)s_settle_idx"),
+        ]
+
+    @property
+    def settlement_reference(self):
+        # Same on every attempt; gateways dedupe payouts on it
+        return f"{self._meta.model_name}:{self.pk}"
+
 # Inter-bank transfer (international)
-class InterBankTransfer(Transaction):
+class InterBankTransfer(ExternalTransfer):
     beneficiary_name = models.CharField(max_length=100)
     iban = models.CharField(max_length=34)  
     bank_name = models.CharField(max_length=100)
@@ -129,12 +168,17 @@ class InterBankTransfer(Transaction):
     password_confirm = models.CharField(max_length=128) 
     country = models.CharField(max_length=100)
 
+    class Meta(ExternalTransfer.Meta):
+        indexes = ExternalTransfer.Meta.indexes + [
+            models.Index(fields=["iban"], name="interbank_iban_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         self.transaction_type = "inter_bank"
         super().save(*args, **kwargs)
 
 # Wire transfer
-class WireTransfer(Transaction):
+class WireTransfer(ExternalTransfer):
     beneficiary_name = models.CharField(max_length=100)
     routing_number = models.CharField(max_length=20)
     iban = models.CharField(max_length=34)
@@ -144,6 +188,212 @@ class WireTransfer(Transaction):
     account_type = models.CharField(max_length=20, default='savings')
     password_confirm = models.CharField(max_length=128)
 
+    class Meta(ExternalTransfer.Meta):
+        indexes = ExternalTransfer.Meta.indexes + [
+            models.Index(fields=["iban"], name="wire_iban_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         self.transaction_type = "wire"
         super().save(*args, **kwargs)
+
+
+# Cold transfer history moved out of the transfer tables (see user/archive.py).
+# One table for every transfer type, with the columns the statement projects
+# plus the settlement audit trail of interbank and wire transfers.
+class ArchivedTransfer(models.Model):
+    source_type = models.CharField(max_length=50, choices=Transaction.TRANSACTION_TYPE)
+    source_id = models.BigIntegerField()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    account = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+    description = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=Transaction.TRANSACTION_STATUS)
+    date = models.DateTimeField()
+    beneficiary_name = models.CharField(max_length=100, blank=True, default='')
+    beneficiary_account_number = models.CharField(max_length=20, blank=True, default='')
+    iban = models.CharField(max_length=34, blank=True, default='')
+    routing_number = models.CharField(max_length=20, blank=True, default='')
+    swift_code = models.CharField(max_length=20, blank=True, default='')
+    bank_name = models.CharField(max_length=100, blank=True, default='')
+    country = models.CharField(max_length=100, blank=True, default='')
+    account_type = models.CharField(max_length=20, blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    settled_at = models.DateTimeField(blank=True, null=True)
+    failure_reason = models.TextField(blank=True, default='')
+    gateway_reference = models.CharField(max_length=100, blank=True, default='')
+    archived_at = models.DateTimeField(default=now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source_type", "source_id"], name="archived_transfer_source_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-date"], name="archived_user_dt_idx"),
+            models.Index(fields=["account", "status"], name="archived_acct_status_idx"),
+            models.Index(fields=["beneficiary_account_number"], name="archived_benef_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.source_type} #{self.source_id} - {self.amount}"
+
+
+# Append-only double-entry ledger; every transfer writes a debit and a credit leg
+class LedgerEntry(models.Model):
+    ENTRY_TYPE = [
+        ('debit', 'Debit'),
+        ('credit', 'Credit'),
+    ]
+
+    # Null account means the external clearing side of interbank/wire transfers
+    account = models.ForeignKey(UserAccount, on_delete=models.PROTECT, null=True, blank=True)
+    entry_type = models.CharField(max_length=10, choices=ENTRY_TYPE)
+    amount = models.DecimalField(max_digits=20, decimal_places=2)  # signed: debits are negative
+    transfer_type = models.CharField(max_length=50, choices=Transaction.TRANSACTION_TYPE)
+    transfer_id = models.BigIntegerField()
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "created_at"], name="ledger_acct_created_idx"),
+            models.Index(fields=["account", "id"], name="ledger_acct_id_idx"),
+            models.Index(fields=["transfer_type", "transfer_id"], name="ledger_transfer_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Ledger entries are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Ledger entries are append-only")
+
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} ({self.transfer_type} #{self.transfer_id})"
+
+
+# Materialized account balance covering every ledger entry up to last_entry_id
+class BalanceSnapshot(models.Model):
+    account = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
+    balance = models.DecimalField(max_digits=20, decimal_places=2)
+    last_entry_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "-last_entry_id"], name="snapshot_acct_entry_idx"),
+            models.Index(fields=["account", "-taken_at"], name="snapshot_acct_taken_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.account.account_number} - {self.balance} @ {self.taken_at}"
+
+
+# Credits to a hot account that have not been compacted into UserAccount yet
+class BalanceShard(models.Model):
+    account = models.ForeignKey(UserAccount, on_delete=models.CASCADE, related_name="shards")
+    shard = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
+    total_deposit = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["account", "shard"], name="balance_shard_account_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} shard {self.shard} - {self.balance}"
+
+
+# Counters an account carried before reconciliation started checking it
+# (see user/reconcile.py). Only transfers dated from ``since`` are checked
+# on top; accounts without a row are checked against their whole history.
+class CounterBaseline(models.Model):
+    account = models.OneToOneField(UserAccount, on_delete=models.CASCADE, related_name="counter_baseline")
+    total_deposit = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
+    total_withdrawal = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
+    since = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return f"{self.account_id} since {self.since}"
+
+
+# Payroll-style batch of domestic transfers, idempotent per (user, batch_id)
+class TransferBatch(models.Model):
+    BATCH_STATUS = [
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    batch_id = models.CharField(max_length=64)
+    # Keyed digest of the submitted transfers; a reused batch_id must repeat them
+    fingerprint = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=20, choices=BATCH_STATUS, default='processing')
+    total_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
+    result = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "batch_id"], name="transfer_batch_user_batch_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - batch {self.batch_id}"
+
+
+# Durable record of an Idempotency-Key and the response it produced
+class IdempotencyKey(models.Model):
+    KEY_STATUS = [
+        ('in_progress', 'In Progress'),
+        ('completed', 'Completed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=KEY_STATUS, default='in_progress')
+    response_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="idempotency_user_key_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"], name="idempotency_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.key} ({self.status})"
+
+
+# Backing row for the account number allocator on databases without sequences
+class AccountNumberSequence(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} -> {self.next_value}"
+
+
+# Per-account daily rollup of outgoing transfers by type and status
+class DailyAggregate(models.Model):
+    account = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
+    day = models.DateField()
+    transaction_type = models.CharField(max_length=50, choices=Transaction.TRANSACTION_TYPE)
+    status = models.CharField(max_length=20, choices=Transaction.TRANSACTION_STATUS)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "day", "transaction_type", "status"], name="daily_aggregate_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account.account_number} {self.day} {self.transaction_type}/{self.status}: {self.total}"
@@ -0,0 +1,224 @@
+"""Token-bucket rate limiting and load shedding for endpoints that hash passwords.
+
+``throttle(scope)`` wraps a view and refuses the request before the view
+body, and therefore before any PBKDF2 work, runs:
+
+- 503 when the scope already has ``max_in_flight`` requests running in this
+  process, or when recent password hashes take longer than
+  ``max_hash_seconds`` (the CPUs are saturated);
+- 429 when any of the scope's token buckets, keyed by client IP, submitted
+  username or auth token, is empty.
+
+Budgets per scope live in settings.RATE_LIMITS; a scope without an entry is
+not limited.
+"""
+import functools
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from user.metrics import registry
+
+LOCAL_MAX_KEYS = 100000
+
+
+def _take(tokens, updated, now, capacity, period):
+    """Refill a bucket and take one token; returns (tokens, seconds to wait)."""
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) * period / capacity
+
+
+class LocalBackend:
+    """Buckets in process memory; every worker process limits on its own."""
+
+    def __init__(self, max_keys=LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, wait = _take(tokens, updated, now, capacity, period)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def atake(self, key, capacity, period):
+        return self.take(key, capacity, period)
+
+
+class CacheBackend:
+    """Buckets in the shared cache, so limits hold across worker processes.
+
+    The read-modify-write is not atomic: concurrent requests for one key can
+    overshoot a bucket by roughly the number of workers, which is acceptable
+    for abuse control.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.RATE_LIMIT_CACHE_ALIAS]
+
+    def take(self, key, capacity, period):
+        now = time.time()
+        tokens, updated = self.cache.get(key) or (capacity, now)
+        tokens, wait = _take(tokens, updated, now, capacity, period)
+        # A bucket left alone for a whole period is full again
+        self.cache.set(key, (tokens, now), math.ceil(period))
+        return wait
+
+    async def atake(self, key, capacity, period):
+        now = time.time()
+        tokens, updated = await self.cache.aget(key) or (capacity, now)
+        tokens, wait = _take(tokens, updated, now, capacity, period)
+        await self.cache.aset(key, (tokens, now), math.ceil(period))
+        return wait
+
+
+BACKENDS = {"local": LocalBackend, "cache": CacheBackend}
+_backends = {}
+
+
+def get_backend():
+    name = settings.RATE_LIMIT_BACKEND
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+# Bucket keys
+
+def client_ip(request):
+    header = settings.RATE_LIMIT_IP_HEADER
+    if header and request.META.get(header):
+        # Only set RATE_LIMIT_IP_HEADER behind a proxy that overwrites it
+        return request.META[header].split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def login_name(request):
+    data = getattr(request, "data", None)
+    if data is None:
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            data = None
+    value = data.get("username_or_email") if isinstance(data, dict) else None
+    return str(value).strip().lower() if value else None
+
+
+def auth_token(request):
+    token = getattr(request, "auth", None)
+    return getattr(token, "key", None)
+
+
+KEY_FUNCTIONS = {"ip": client_ip, "username": login_name, "token": auth_token}
+
+
+def _bucket_keys(scope, request, buckets):
+    for kind, (capacity, period) in buckets.items():
+        value = KEY_FUNCTIONS[kind](request)
+        if value:
+            digest = hashlib.sha256(value.encode()).hexdigest()[:32]
+            yield f"ratelimit:{scope}:{kind}:{digest}", capacity, period
+
+
+# Load shedding
+
+class InFlight:
+    """Requests currently running per scope in this process."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def enter(self, scope, limit):
+        with self._lock:
+            count = self._counts.get(scope, 0)
+            if limit and count >= limit:
+                return False
+            self._counts[scope] = count + 1
+        return True
+
+    def leave(self, scope):
+        with self._lock:
+            self._counts[scope] -= 1
+
+
+in_flight = InFlight()
+
+
+def _overloaded(budget):
+    max_hash = budget.get("max_hash_seconds")
+    return bool(max_hash) and registry.recent_hash_latency(settings.RATE_LIMIT_HASH_WINDOW) > max_hash
+
+
+def _busy():
+    response = JsonResponse({"status": "error", "message": "Server is busy, retry shortly"}, status=503)
+    response["Retry-After"] = "1"
+    return response
+
+
+def _too_many(wait):
+    response = JsonResponse({"status": "error", "message": "Too many requests, retry later"}, status=429)
+    response["Retry-After"] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def throttle(scope):
+    """Shed and rate limit a sync or async view under ``settings.RATE_LIMITS[scope]``."""
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                budget = settings.RATE_LIMITS.get(scope)
+                if not budget:
+                    return await view(request, *args, **kwargs)
+                if _overloaded(budget) or not in_flight.enter(scope, budget.get("max_in_flight")):
+                    return _busy()
+                try:
+                    backend = get_backend()
+                    for key, capacity, period in _bucket_keys(scope, request, budget.get("buckets", {})):
+                        wait = await backend.atake(key, capacity, period)
+                        if wait:
+                            return _too_many(wait)
+                    return await view(request, *args, **kwargs)
+                finally:
+                    in_flight.leave(scope)
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            budget = settings.RATE_LIMITS.get(scope)
+            if not budget:
+                return view(request, *args, **kwargs)
+            if _overloaded(budget) or not in_flight.enter(scope, budget.get("max_in_flight")):
+                return _busy()
+            try:
+                backend = get_backend()
+                for key, capacity, period in _bucket_keys(scope, request, budget.get("buckets", {})):
+                    wait = backend.take(key, capacity, period)
+                    if wait:
+                        return _too_many(wait)
+                return view(request, *args, **kwargs)
+            finally:
+                in_flight.leave(scope)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,221 @@
+"""Reconcile account counters against transfer history.
+
+For every account, ``total_withdrawal`` must equal the transfers it sent
+that were not refunded (everything but ``failed``), and ``total_deposit``
+(including credits parked on balance shards) must equal the completed
+domestic transfers it received. Archived transfers count like live ones.
+Both expectations are computed per chunk of account ids with one aggregate
+query of correlated subqueries.
+
+Transfers from before the ledger series never moved the counters, so
+accounts that existed then carry a CounterBaseline: their counters are
+checked as baseline + transfers dated from ``baseline.since``.
+
+The ledger is checked too, where it covers an account's whole history
+(the account has a snapshot, which carried its legacy balance forward, or
+never had a baseline): a balance that differs from the ledger is reported
+as a ``ledger_drift`` mismatch even when the counters agree.
+
+A repair only corrects the counters. ``account_balance`` is also shifted,
+by the same amount, when the ledger proves the balance lost that change
+too; anything else (admin-funded deposits, legacy history, ledger drift on
+its own) is left to a human.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import BigIntegerField, DateTimeField, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from user import statement_cache
+from user.models import (
+    ArchivedTransfer, BalanceShard, BalanceSnapshot, DomesticTransfer, InterBankTransfer, LedgerEntry,
+    UserAccount, WireTransfer,
+)
+
+OUTGOING_MODELS = [DomesticTransfer, InterBankTransfer, WireTransfer]
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+AMOUNT = DecimalField(max_digits=20, decimal_places=2)
+
+
+def _sum(queryset, group_by, field="amount"):
+    """Correlated SUM(field) subquery, 0 when there are no rows."""
+    totals = queryset.order_by().values(group_by).annotate(total=Sum(field)).values("total")
+    return Coalesce(Subquery(totals, output_field=AMOUNT), ZERO, output_field=AMOUNT)
+
+
+def expected_totals(accounts):
+    """Annotate an account queryset with recorded and expected counters and balances.
+
+    Returns (pk, account_number, total_deposit, parked_deposit,
+    expected_deposit, total_withdrawal, expected_withdrawal,
+    account_balance, parked_balance, snapshot_balance, ledger_entries,
+    baseline) rows. ``snapshot_balance`` is None for an account without a
+    snapshot and ``baseline`` None for one without a CounterBaseline.
+    """
+    snapshots = BalanceSnapshot.objects.filter(account=OuterRef("pk")).order_by("-last_entry_id")
+    accounts = accounts.annotate(
+        since=Coalesce(F("counter_baseline__since"), Value(EPOCH), output_field=DateTimeField()),
+        snapshot_balance=Subquery(snapshots.values("balance")[:1], output_field=AMOUNT),
+        snapshot_entry=Coalesce(
+            Subquery(snapshots.values("last_entry_id")[:1]), Value(0), output_field=BigIntegerField()
+        ),
+    )
+    sent = {"account": OuterRef("pk"), "date__gte": OuterRef("since")}
+    expected_withdrawal = Coalesce(F("counter_baseline__total_withdrawal"), ZERO, output_field=AMOUNT)
+    for model in OUTGOING_MODELS + [ArchivedTransfer]:
+        expected_withdrawal += _sum(model.objects.filter(**sent).exclude(status="failed"), "account")
+    received = {
+        "beneficiary_account_number": OuterRef("account_number"),
+        "status": "completed",
+        "date__gte": OuterRef("since"),
+    }
+    return accounts.annotate(
+        parked_deposit=_sum(BalanceShard.objects.filter(account=OuterRef("pk")), "account", "total_deposit"),
+        parked_balance=_sum(BalanceShard.objects.filter(account=OuterRef("pk")), "account", "balance"),
+        ledger_entries=_sum(
+            LedgerEntry.objects.filter(account=OuterRef("pk"), id__gt=OuterRef("snapshot_entry")), "account"
+        ),
+        expected_deposit=(
+            Coalesce(F("counter_baseline__total_deposit"), ZERO, output_field=AMOUNT)
+            + _sum(DomesticTransfer.objects.filter(**received), "beneficiary_account_number")
+            + _sum(
+                ArchivedTransfer.objects.filter(source_type="domestic_transfer", **received),
+                "beneficiary_account_number",
+            )
+        ),
+        expected_withdrawal=expected_withdrawal,
+    ).values_list(
+        "pk", "account_number", "total_deposit", "parked_deposit", "expected_deposit",
+        "total_withdrawal", "expected_withdrawal",
+        "account_balance", "parked_balance", "snapshot_balance", "ledger_entries", "counter_baseline",
+    )
+
+
+def _cents(value):
+    return Decimal(value or 0).quantize(CENT)
+
+
+def _ledger_drift(balance, parked, snapshot_balance, entries, baseline):
+    """How far the ledger says the balance is off, or None if it cannot tell.
+
+    The ledger only covers an account's whole history when the account has
+    a snapshot or never had a legacy baseline.
+    """
+    if snapshot_balance is None and baseline is not None:
+        return None
+    return _cents(snapshot_balance) + _cents(entries) - _cents(balance) - _cents(parked)
+
+
+def find_mismatches(rows):
+    """Accounts whose counters (``kind`` "counters") or balance (``kind`` "ledger_drift") are off."""
+    mismatches = []
+    for (
+        pk, number, deposit, parked, expected_deposit, withdrawal, expected_withdrawal,
+        balance, parked_balance, snapshot_balance, entries, baseline,
+    ) in rows:
+        deposit = _cents(deposit) + _cents(parked)
+        deposit_delta = _cents(expected_deposit) - deposit
+        withdrawal_delta = _cents(expected_withdrawal) - _cents(withdrawal)
+        drift = _ledger_drift(balance, parked_balance, snapshot_balance, entries, baseline)
+        if deposit_delta or withdrawal_delta:
+            kind = "counters"
+        elif drift:
+            kind = "ledger_drift"
+        else:
+            continue
+        mismatches.append({
+            "account_id": pk,
+            "account_number": number,
+            "kind": kind,
+            "total_deposit": str(deposit),
+            "expected_deposit": str(_cents(expected_deposit)),
+            "total_withdrawal": str(_cents(withdrawal)),
+            "expected_withdrawal": str(_cents(expected_withdrawal)),
+            "ledger_drift": None if drift is None else str(drift),
+            "balance_adjustment": None,
+        })
+    return mismatches
+
+
+def _repair(mismatches):
+    # Drift the counters do not explain is reported, never repaired
+    mismatches = [m for m in mismatches if m["kind"] == "counters"]
+    if not mismatches:
+        return
+    for mismatch in mismatches:
+        deposit_delta = Decimal(mismatch["expected_deposit"]) - Decimal(mismatch["total_deposit"])
+        withdrawal_delta = Decimal(mismatch["expected_withdrawal"]) - Decimal(mismatch["total_withdrawal"])
+        fields = {
+            "total_deposit": F("total_deposit") + deposit_delta,
+            "total_withdrawal": F("total_withdrawal") + withdrawal_delta,
+        }
+        # A lost update drops the balance change with its counter change; only
+        # follow the counters when the ledger shows exactly that balance gap
+        adjustment = deposit_delta - withdrawal_delta
+        drift = mismatch["ledger_drift"]
+        if adjustment and drift is not None and Decimal(drift) == adjustment:
+            fields["account_balance"] = F("account_balance") + adjustment
+            mismatch["balance_adjustment"] = str(adjustment)
+        UserAccount.objects.filter(pk=mismatch["account_id"]).update(**fields)
+    statement_cache.invalidate(*UserAccount.objects.filter(
+        pk__in=[m["account_id"] for m in mismatches]
+    ).values_list("user_id", flat=True))
+
+
+def reconcile_range(lo, hi, repair=False):
+    """Check accounts with lo <= pk < hi; returns (checked, mismatches).
+
+    Transfers in flight can make an unlocked read look wrong, so candidate
+    mismatches are checked again with their accounts locked before being
+    reported or repaired.
+    """
+    rows = list(expected_totals(UserAccount.objects.filter(pk__gte=lo, pk__lt=hi)))
+    checked = len(rows)
+    candidates = find_mismatches(rows)
+    if not candidates:
+        return checked, []
+
+    with transaction.atomic():
+        ids = [m["account_id"] for m in candidates]
+        list(UserAccount.objects.select_for_update().filter(pk__in=ids).order_by("pk").values_list("pk"))
+        mismatches = find_mismatches(expected_totals(UserAccount.objects.filter(pk__in=ids)))
+        if repair and mismatches:
+            _repair(mismatches)
+    return checked, mismatches
+
+
+def account_ranges(start_id, chunk_size):
+    """Split [start_id, max account id] into half-open id ranges."""
+    last = UserAccount.objects.order_by("-pk").values_list("pk", flat=True).first()
+    if last is None:
+        return []
+    return [(lo, lo + chunk_size) for lo in range(start_id, last + 1, chunk_size)]
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_checkpoint(path, state):
+    if not path:
+        return
+    # Write then rename, so a crash never leaves a half-written checkpoint
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(state, fh)
+    os.replace(tmp, path)
+
+
+def clear_checkpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,112 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils.timezone import localtime
+
+from user.models import ArchivedTransfer, DailyAggregate, DomesticTransfer, InterBankTransfer, WireTransfer
+
+TRANSFER_MODELS = {
+    "domestic_transfer": DomesticTransfer,
+    "inter_bank": InterBankTransfer,
+    "wire": WireTransfer,
+}
+
+
+def _bucket(transfer):
+    return (transfer.account_id, localtime(transfer.date).date(), transfer.transaction_type, transfer.status)
+
+
+def add(account_id, day, transaction_type, status, count, total):
+    """Increment one rollup bucket, creating it on first use."""
+    bucket = DailyAggregate.objects.filter(
+        account_id=account_id, day=day, transaction_type=transaction_type, status=status
+    )
+    if bucket.update(count=F("count") + count, total=F("total") + total):
+        return
+    try:
+        with transaction.atomic():
+            DailyAggregate.objects.create(
+                account_id=account_id, day=day, transaction_type=transaction_type,
+                status=status, count=count, total=total,
+            )
+    except IntegrityError:
+        # Created concurrently; fall back to the increment
+        bucket.update(count=F("count") + count, total=F("total") + total)
+
+
+def record(transfer):
+    add(*_bucket(transfer), 1, transfer.amount)
+
+
+def record_many(transfers):
+    """Roll up many transfers with one write per distinct bucket."""
+    buckets = defaultdict(lambda: [0, Decimal("0")])
+    for transfer in transfers:
+        entry = buckets[_bucket(transfer)]
+        entry[0] += 1
+        entry[1] += transfer.amount
+    for key, (count, total) in buckets.items():
+        add(*key, count, total)
+
+
+def move(transfer, old_status):
+    """Shift a transfer from its old status bucket into its current one."""
+    account_id, day, transaction_type, status = _bucket(transfer)
+    add(account_id, day, transaction_type, old_status, -1, -transfer.amount)
+    add(account_id, day, transaction_type, status, 1, transfer.amount)
+
+
+def _daily_totals(queryset, batch_size):
+    return (
+        queryset.annotate(day=TruncDate("date"))
+        .values("account_id", "day", "status")
+        .annotate(count=Count("id"), total=Sum("amount"))
+        .order_by()
+        .iterator(chunk_size=batch_size)
+    )
+
+
+def backfill(batch_size=1000):
+    """Rebuild every rollup from the transfer and archive tables with set-based aggregates."""
+    with transaction.atomic():
+        DailyAggregate.objects.all().delete()
+        written = 0
+        for transaction_type, model in TRANSFER_MODELS.items():
+            # The day at the archive horizon can have rows on both sides
+            buckets = defaultdict(lambda: [0, Decimal("0")])
+            for queryset in (model.objects.all(), ArchivedTransfer.objects.filter(source_type=transaction_type)):
+                for row in _daily_totals(queryset, batch_size):
+                    entry = buckets[(row["account_id"], row["day"], row["status"])]
+                    entry[0] += row["count"]
+                    entry[1] += row["total"]
+            rollups = [
+                DailyAggregate(
+                    account_id=account_id, day=day, transaction_type=transaction_type,
+                    status=status, count=count, total=total,
+                )
+                for (account_id, day, status), (count, total) in buckets.items()
+            ]
+            DailyAggregate.objects.bulk_create(rollups, batch_size=batch_size)
+            written += len(rollups)
+    return written
+
+
+def summarize(account, start, end):
+    """Totals per (transaction_type, status) for days in [start, end]."""
+    return list(
+        DailyAggregate.objects.filter(account=account, day__gte=start, day__lte=end)
+        .values("transaction_type", "status")
+        .annotate(count=Sum("count"), total=Sum("total"))
+        .order_by("transaction_type", "status")
+    )
+
+
+def daily(account, start, end):
+    return list(
+        DailyAggregate.objects.filter(account=account, day__gte=start, day__lte=end)
+        .values("day", "transaction_type", "status", "count", "total")
+        .order_by("day", "transaction_type", "status")
+    )
@@ -0,0 +1,80 @@
+"""Primary/replica database routing.
+
+Everything reads from and writes to the primary unless a request opts in
+with ``read_replica()``. After a user's transfer commits, that user is pinned
+to the primary for ``REPLICA_STICKY_SECONDS`` so replica lag never hides a
+write they just made.
+"""
+import random
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def _pin_key(user_id):
+    return f"db:primary-pin:{user_id}"
+
+
+def pin_to_primary(user_ids):
+    ttl = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+    if ttl:
+        cache.set_many({_pin_key(user_id): True for user_id in user_ids}, ttl)
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(_pin_key(user_id)) is not None
+
+
+async def ais_pinned(user_id):
+    return user_id is not None and await cache.aget(_pin_key(user_id)) is not None
+
+
+def reading_from_replica():
+    return _replica_reads.get()
+
+
+@contextmanager
+def read_replica(user_id=None):
+    """Route reads inside the block to a replica, unless ``user_id`` recently wrote."""
+    enabled = bool(replicas()) and not is_pinned(user_id)
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@asynccontextmanager
+async def aread_replica(user_id=None):
+    """Async counterpart of read_replica(); the async ORM carries the context to its threads."""
+    enabled = bool(replicas()) and not await ais_pinned(user_id)
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return random.choice(replicas())
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so every alias holds the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,79 @@
+"""Serialization of statement rows (tuples in STATEMENT_COLUMNS order).
+
+Amounts are emitted as exact decimal strings and dates as ISO 8601 in UTC,
+so no per-row float conversion or timezone lookup is needed.
+"""
+from user.statement import COLUMN_INDEX, STATEMENT_COLUMNS
+
+# Response keys per transfer type, in display order, mapped to row positions
+_FIELDS = {
+    "domestic_transfer": (
+        ("beneficiary_name", "tx_beneficiary_name"),
+        ("beneficiary_account", "tx_beneficiary_account"),
+        ("bank_name", "tx_bank_name"),
+        ("account_type", "tx_account_type"),
+    ),
+    "inter_bank": (
+        ("beneficiary_name", "tx_beneficiary_name"),
+        ("iban", "tx_iban"),
+        ("bank_name", "tx_bank_name"),
+        ("account_type", "tx_account_type"),
+        ("country", "tx_country"),
+    ),
+    "wire": (
+        ("beneficiary_name", "tx_beneficiary_name"),
+        ("routing_number", "tx_routing_number"),
+        ("iban", "tx_iban"),
+        ("bank_name", "tx_bank_name"),
+        ("swift_code", "tx_swift_code"),
+        ("country", "tx_country"),
+        ("account_type", "tx_account_type"),
+    ),
+}
+RESPONSE_FIELDS = {
+    tx_type: tuple((key, COLUMN_INDEX[column]) for key, column in fields)
+    for tx_type, fields in _FIELDS.items()
+}
+
+_ID = COLUMN_INDEX["tx_id"]
+_TYPE = COLUMN_INDEX["tx_type"]
+_AMOUNT = COLUMN_INDEX["tx_amount"]
+_DESCRIPTION = COLUMN_INDEX["tx_description"]
+_STATUS = COLUMN_INDEX["tx_status"]
+_DATE = COLUMN_INDEX["tx_date"]
+
+CSV_HEADER = [column[len("tx_"):] for column in STATEMENT_COLUMNS]
+# Leading characters that make spreadsheets treat a CSV cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def serialize_row(row):
+    item = {
+        "id": row[_ID],
+        "type": row[_TYPE],
+        "amount": str(row[_AMOUNT]),
+        "description": row[_DESCRIPTION],
+    }
+    for key, index in RESPONSE_FIELDS[row[_TYPE]]:
+        item[key] = row[index]
+    item["date"] = row[_DATE].isoformat()
+    item["status"] = row[_STATUS]
+    return item
+
+
+def serialize_rows(rows):
+    return [serialize_row(row) for row in rows]
+
+
+def csv_cell(value):
+    """Neutralize text a spreadsheet would evaluate as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_row(row):
+    """Flat row in CSV_HEADER order, safe to open in a spreadsheet."""
+    values = [csv_cell(value) for value in row]
+    values[_DATE] = row[_DATE].isoformat()
+    return values
@@ -0,0 +1,188 @@
+"""Settlement of interbank and wire transfers against an external gateway.
+
+The transfer views debit the sender and store the transfer as ``pending``.
+Workers then claim due transfers in batches, submit them to the configured
+gateway and move each one to ``completed`` or ``failed``. A failed transfer
+is refunded. Transient gateway errors are retried with exponential backoff.
+
+A transfer can reach the gateway more than once: after a retry, or when a
+slow batch outlives its lease and another worker claims it again. Gateways
+must therefore pass each transfer's ``settlement_reference`` to the bank as
+its idempotency key, so a repeated submission is not paid out twice.
+"""
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from user import ledger, rollups, statement_cache
+from user.models import InterBankTransfer, UserAccount, WireTransfer
+
+SETTLEMENT_MODELS = [InterBankTransfer, WireTransfer]
+
+# Gateway outcomes
+SETTLED = "settled"
+REJECTED = "rejected"
+RETRY = "retry"
+
+
+class GatewayUnavailable(Exception):
+    """The gateway could not take the batch; every transfer in it is retried."""
+
+
+class LocalGateway:
+    """In-process gateway for development and tests.
+
+    Settles everything, except that an IBAN containing ``REJECT`` is refused
+    and one containing ``RETRY`` fails transiently. ``latency`` (seconds)
+    simulates the round trip to the bank. A resubmitted settlement reference
+    gets its original gateway reference back instead of a second payout.
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.payouts = {}  # settlement reference -> gateway reference
+
+    def settle(self, transfers):
+        if self.latency:
+            time.sleep(self.latency)
+        outcomes = {}
+        for transfer in transfers:
+            if "REJECT" in transfer.iban:
+                outcomes[transfer.pk] = (REJECTED, "Beneficiary bank rejected the transfer")
+            elif "RETRY" in transfer.iban:
+                outcomes[transfer.pk] = (RETRY, "Beneficiary bank temporarily unavailable")
+            else:
+                reference = self.payouts.setdefault(transfer.settlement_reference, uuid.uuid4().hex)
+                outcomes[transfer.pk] = (SETTLED, reference)
+        return outcomes
+
+
+_gateway = None
+
+
+def get_gateway():
+    """Instantiate SETTLEMENT_GATEWAY once per process.
+
+    A gateway takes a list of transfers and returns {pk: (outcome, detail)},
+    where detail is the gateway reference for SETTLED and a reason otherwise.
+    It must dedupe on each transfer's ``settlement_reference`` and answer a
+    repeated one with the outcome of the first submission.
+    """
+    global _gateway
+    if _gateway is None:
+        gateway_class = import_string(settings.SETTLEMENT_GATEWAY)
+        _gateway = gateway_class(**getattr(settings, "SETTLEMENT_GATEWAY_OPTIONS", {}))
+    return _gateway
+
+
+def retry_delay(attempts):
+    """Exponential backoff with full jitter, capped at SETTLEMENT_RETRY_MAX_SECONDS."""
+    cap = min(settings.SETTLEMENT_RETRY_MAX_SECONDS, settings.SETTLEMENT_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=random.uniform(cap / 2, cap))
+
+
+def claim_batch(model, batch_size):
+    """Lease up to ``batch_size`` due pending transfers to this worker.
+
+    The lease pushes next_attempt_at forward, so a worker that dies mid-batch
+    only delays its transfers until the lease expires. A batch still at the
+    gateway when its lease expires can be claimed again; the gateway's dedupe
+    on ``settlement_reference`` keeps that from paying out twice.
+    """
+    current = now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        ids = list(
+            model.objects.select_for_update(skip_locked=skip_locked)
+            .filter(status="pending", next_attempt_at__lte=current)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        model.objects.filter(id__in=ids).update(
+            attempts=F("attempts") + 1,
+            next_attempt_at=current + timedelta(seconds=settings.SETTLEMENT_LEASE_SECONDS),
+        )
+    return list(model.objects.filter(id__in=ids))
+
+
+def _finish(transfer, status, **fields):
+    """Move a pending transfer to ``status``; returns False if another worker got there first."""
+    updated = type(transfer).objects.filter(pk=transfer.pk, status="pending").update(status=status, **fields)
+    if not updated:
+        return False
+    transfer.status = status
+    rollups.move(transfer, "pending")
+    statement_cache.invalidate(transfer.user_id)
+    return True
+
+
+def mark_settled(transfer, reference):
+    with transaction.atomic():
+        return _finish(transfer, "completed", settled_at=now(), gateway_reference=reference, failure_reason="")
+
+
+def mark_failed(transfer, reason):
+    with transaction.atomic():
+        if not _finish(transfer, "failed", failure_reason=reason, next_attempt_at=None):
+            return False
+        account = UserAccount(pk=transfer.account_id)
+        ledger.refund(account, transfer.amount)
+        # Reverse the original legs: the clearing side pays the sender back
+        ledger.record_entries(transfer, None, account)
+    return True
+
+
+def schedule_retry(transfer, reason):
+    """Back off and retry later; returns False once attempts are exhausted and the transfer failed."""
+    if transfer.attempts >= settings.SETTLEMENT_MAX_ATTEMPTS:
+        mark_failed(transfer, f"Gave up after {transfer.attempts} attempts: {reason}")
+        return False
+    type(transfer).objects.filter(pk=transfer.pk, status="pending").update(
+        next_attempt_at=now() + retry_delay(transfer.attempts), failure_reason=reason
+    )
+    return True
+
+
+def settle_batch(transfers, gateway=None):
+    """Submit claimed transfers and apply the outcomes; returns counts per final state."""
+    gateway = gateway or get_gateway()
+    counts = {"completed": 0, "failed": 0, "retrying": 0}
+    try:
+        outcomes = gateway.settle(transfers)
+    except GatewayUnavailable as exc:
+        outcomes = {transfer.pk: (RETRY, str(exc) or "Gateway unavailable") for transfer in transfers}
+
+    for transfer in transfers:
+        outcome, detail = outcomes.get(transfer.pk, (RETRY, "No result from gateway"))
+        if outcome == SETTLED:
+            mark_settled(transfer, detail)
+            counts["completed"] += 1
+        elif outcome == REJECTED:
+            mark_failed(transfer, detail)
+            counts["failed"] += 1
+        elif schedule_retry(transfer, detail):
+            counts["retrying"] += 1
+        else:
+            counts["failed"] += 1
+    return counts
+
+
+def settle_due(batch_size=None, gateway=None):
+    """Claim and settle one batch per transfer type; returns counts per final state."""
+    batch_size = batch_size or settings.SETTLEMENT_BATCH_SIZE
+    counts = {"completed": 0, "failed": 0, "retrying": 0}
+    for model in SETTLEMENT_MODELS:
+        transfers = claim_batch(model, batch_size)
+        if transfers:
+            for state, count in settle_batch(transfers, gateway).items():
+                counts[state] += count
+    return counts
@@ -1,14 +1,48 @@
-from django.db.models.signals import post_save
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import CustomUser, UserAccount
+from rest_framework.authtoken.models import Token
+from .authentication import invalidate_token
+from . import rollups
+from .models import CustomUser, UserAccount, DomesticTransfer, InterBankTransfer, WireTransfer
 from .utils import generate_account_number
 
+ACCOUNT_NUMBER_ATTEMPTS = 3
+
 @receiver(post_save, sender=CustomUser)
 def create_user_account(sender, instance, created, **kwargs):
     if created:
-        # Generate unique account number
-        account_number = generate_account_number()
-        while UserAccount.objects.filter(account_number=account_number).exists():
+        # Numbers come from a reserved block, so no existence checks are needed.
+        # The retry only covers clashes with legacy randomly generated numbers.
+        for attempt in range(ACCOUNT_NUMBER_ATTEMPTS):
+            # Allocate outside the savepoint: rolling it back must not undo the reservation
             account_number = generate_account_number()
+            try:
+                with transaction.atomic():
+                    UserAccount.objects.create(user=instance, account_number=account_number)
+                return
+            except IntegrityError:
+                if attempt == ACCOUNT_NUMBER_ATTEMPTS - 1:
+                    raise
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    # Password changes, deactivation or profile edits must not be served from a stale cache
+    if not created:
+        for key in Token.objects.filter(user=instance).values_list("key", flat=True):
+            invalidate_token(key, instance.pk)
 
-        UserAccount.objects.create(user=instance, account_number=account_number)
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key, instance.user_id)
+
+
+@receiver(post_save, sender=DomesticTransfer)
+@receiver(post_save, sender=InterBankTransfer)
+@receiver(post_save, sender=WireTransfer)
+def roll_up_transfer(sender, instance, created, **kwargs):
+    # Status changes on existing transfers are rolled up by whoever changes them
+    if created:
+        rollups.record(instance)
@@ -0,0 +1,187 @@
+"""Account creation: user, account and token written in one transaction.
+
+Uniqueness is left to the database constraints (username, the
+case-insensitive email index and the account number); a violation is
+reported as a SignupConflict instead of being pre-checked with extra queries.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from rest_framework.authtoken.models import Token
+
+from user.models import CustomUser, UserAccount
+from user.utils import generate_account_numbers
+
+REQUIRED_FIELDS = ["first_name", "last_name", "username", "password", "email"]
+OPTIONAL_FIELDS = [
+    "middle_name", "occupation", "phone_number", "date_of_birth",
+    "marital_status", "gender", "address",
+]
+DEFAULTS = {"account_type": "savings", "account_currency": "usd"}
+
+# Substrings of the violated constraint's name (or SQLite's column list), per field
+CONFLICTS = [
+    ("email", "Email already exists"),
+    ("username", "Username already exists"),
+]
+
+
+class SignupConflict(Exception):
+    pass
+
+
+def conflict_message(exc):
+    """Map a unique violation to the message for the clashing field, or None."""
+    diag = getattr(exc.__cause__, "diag", None)
+    if diag is not None:
+        # PostgreSQL's message quotes the clashing value, which is user input
+        detail = diag.constraint_name or ""
+    else:
+        # SQLite names the constraint or its columns, never the value
+        detail = str(exc)
+    detail = detail.lower()
+    for field, message in CONFLICTS:
+        if field in detail:
+            return message
+    return None
+
+
+def build_user(data):
+    fields = {field: data.get(field) for field in OPTIONAL_FIELDS}
+    fields.update({field: data.get(field) or default for field, default in DEFAULTS.items()})
+    return CustomUser(
+        first_name=data["first_name"],
+        last_name=data["last_name"],
+        username=data["username"],
+        email=data["email"],
+        **fields,
+    )
+
+
+def signup(data):
+    """Create the user, its account and token; returns (user, token).
+
+    Raises SignupConflict if the username or email is taken.
+    """
+    user = build_user(data)
+    # Hash outside the transaction so it holds no locks during the slow part
+    user.set_password(data["password"])
+    try:
+        with transaction.atomic():
+            user.save()  # the post_save signal inserts the UserAccount
+            token = Token.objects.create(user=user)
+    except IntegrityError as exc:
+        message = conflict_message(exc)
+        if message is None:
+            raise
+        raise SignupConflict(message) from exc
+    return user, token
+
+
+def validate_row(row):
+    """Return an error message for an unusable bulk signup row, or None."""
+    missing = [field for field in REQUIRED_FIELDS if field != "password" and not row.get(field)]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    try:
+        validate_email(row["email"])
+    except ValidationError:
+        return "Invalid email address"
+    return None
+
+
+def _password_hash(row):
+    # Pre-hashed passwords (Django format) are taken as is; neither means an unusable password
+    if row.get("password_hash"):
+        return row["password_hash"]
+    return make_password(row.get("password") or None)
+
+
+def _existing(rows):
+    usernames = [row["username"] for row in rows]
+    emails = [row["email"].lower() for row in rows]
+    taken = CustomUser.objects.alias(email_lower=Lower("email"))
+    return (
+        set(taken.filter(username__in=usernames).values_list("username", flat=True)),
+        {email.lower() for email in taken.filter(email_lower__in=emails).values_list("email", flat=True)},
+    )
+
+
+def _account_numbers(count):
+    """Fresh account numbers, replacing any that clash with legacy randomly generated ones."""
+    numbers = generate_account_numbers(count)
+    while True:
+        taken = set(UserAccount.objects.filter(account_number__in=numbers).values_list("account_number", flat=True))
+        if not taken:
+            return numbers
+        numbers = [number for number in numbers if number not in taken] + generate_account_numbers(len(taken))
+
+
+def bulk_signup(rows, batch_size=1000, workers=None):
+    """Create users, accounts and tokens for many rows with bulk inserts.
+
+    Each chunk of ``batch_size`` rows is one transaction. Rows that are
+    invalid, repeat an earlier row, or clash with existing users are skipped.
+    Returns (created, skipped) where skipped is a list of (row number, reason).
+    """
+    skipped = []
+    seen_usernames, seen_emails = set(), set()
+    valid = []
+    for number, row in enumerate(rows, start=1):
+        error = validate_row(row)
+        if error is None and row["username"] in seen_usernames:
+            error = "Duplicate username in input"
+        if error is None and row["email"].lower() in seen_emails:
+            error = "Duplicate email in input"
+        if error:
+            skipped.append((number, error))
+            continue
+        seen_usernames.add(row["username"])
+        seen_emails.add(row["email"].lower())
+        valid.append((number, row))
+
+    created = 0
+    workers = workers or getattr(settings, "PASSWORD_HASH_WORKERS", 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(valid), batch_size):
+            chunk = valid[start:start + batch_size]
+            usernames, emails = _existing([row for _, row in chunk])
+            fresh = []
+            for number, row in chunk:
+                if row["username"] in usernames:
+                    skipped.append((number, "Username already exists"))
+                elif row["email"].lower() in emails:
+                    skipped.append((number, "Email already exists"))
+                else:
+                    fresh.append(row)
+            if not fresh:
+                continue
+
+            # PBKDF2 releases the GIL, so threads hash in parallel
+            hashes = list(pool.map(_password_hash, fresh))
+            users = []
+            for row, password in zip(fresh, hashes):
+                user = build_user(row)
+                user.password = password
+                users.append(user)
+            account_numbers = _account_numbers(len(users))
+
+            with transaction.atomic():
+                # bulk_create skips post_save, so accounts and tokens are inserted here
+                users = CustomUser.objects.bulk_create(users)
+                if users and users[0].pk is None:
+                    # Backends that cannot return ids from a bulk insert
+                    users = list(CustomUser.objects.filter(username__in=[user.username for user in users]))
+                UserAccount.objects.bulk_create(
+                    [UserAccount(user=user, account_number=number) for user, number in zip(users, account_numbers)]
+                )
+                Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+            created += len(users)
+
+    skipped.sort()
+    return created, skipped
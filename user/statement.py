@@ -0,0 +1,285 @@
+import base64
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import CharField, F, Q, Value
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import get_current_timezone, is_naive, make_aware, now
+
+from user.models import ArchivedTransfer, DomesticTransfer, InterBankTransfer, WireTransfer
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Common projection shared by every branch of the statement UNION.
+# Columns are positional, so every branch must list them in this order.
+STATEMENT_COLUMNS = (
+    "tx_id",
+    "tx_type",
+    "tx_amount",
+    "tx_description",
+    "tx_status",
+    "tx_date",
+    "tx_beneficiary_name",
+    "tx_beneficiary_account",
+    "tx_iban",
+    "tx_routing_number",
+    "tx_swift_code",
+    "tx_bank_name",
+    "tx_country",
+    "tx_account_type",
+)
+
+# transaction_type -> (model, {column: model field or None})
+TRANSFER_SOURCES = {
+    "domestic_transfer": (DomesticTransfer, {
+        "tx_id": "id",
+        "tx_amount": "amount",
+        "tx_description": "description",
+        "tx_status": "status",
+        "tx_date": "date",
+        "tx_beneficiary_name": "beneficiary_name",
+        "tx_beneficiary_account": "beneficiary_account_number",
+        "tx_bank_name": "bank_name",
+        "tx_account_type": "account_type",
+    }),
+    "inter_bank": (InterBankTransfer, {
+        "tx_id": "id",
+        "tx_amount": "amount",
+        "tx_description": "description",
+        "tx_status": "status",
+        "tx_date": "date",
+        "tx_beneficiary_name": "beneficiary_name",
+        "tx_iban": "iban",
+        "tx_bank_name": "bank_name",
+        "tx_country": "country",
+        "tx_account_type": "account_type",
+    }),
+    "wire": (WireTransfer, {
+        "tx_id": "id",
+        "tx_amount": "amount",
+        "tx_description": "description",
+        "tx_status": "status",
+        "tx_date": "date",
+        "tx_beneficiary_name": "beneficiary_name",
+        "tx_routing_number": "routing_number",
+        "tx_iban": "iban",
+        "tx_bank_name": "bank_name",
+        "tx_swift_code": "swift_code",
+        "tx_country": "country",
+        "tx_account_type": "account_type",
+    }),
+}
+
+# Statement column -> ArchivedTransfer field; archived rows keep their type and id
+ARCHIVE_FIELDS = {
+    "tx_id": "source_id",
+    "tx_type": "source_type",
+    "tx_amount": "amount",
+    "tx_description": "description",
+    "tx_status": "status",
+    "tx_date": "date",
+    "tx_beneficiary_name": "beneficiary_name",
+    "tx_beneficiary_account": "beneficiary_account_number",
+    "tx_iban": "iban",
+    "tx_routing_number": "routing_number",
+    "tx_swift_code": "swift_code",
+    "tx_bank_name": "bank_name",
+    "tx_country": "country",
+    "tx_account_type": "account_type",
+}
+
+COLUMN_INDEX = {name: i for i, name in enumerate(STATEMENT_COLUMNS)}
+
+
+class StatementQueryError(ValueError):
+    pass
+
+
+def encode_cursor(row):
+    raw = "{}|{}|{}".format(
+        row[COLUMN_INDEX["tx_date"]].isoformat(),
+        row[COLUMN_INDEX["tx_type"]],
+        row[COLUMN_INDEX["tx_id"]],
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_part, tx_type, tx_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        date = datetime.fromisoformat(date_part)
+        tx_id = int(tx_id)
+    except (ValueError, UnicodeDecodeError):
+        raise StatementQueryError("Invalid cursor")
+    if tx_type not in TRANSFER_SOURCES:
+        raise StatementQueryError("Invalid cursor")
+    return date, tx_type, tx_id
+
+
+def parse_bound(value, end=False):
+    """Parse a date or datetime query parameter into an aware datetime."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise StatementQueryError(f"Invalid date: {value}")
+        # A bare end date includes the whole day
+        if end:
+            day += timedelta(days=1)
+        parsed = datetime.combine(day, time.min)
+    if is_naive(parsed):
+        parsed = make_aware(parsed, get_current_timezone())
+    return parsed
+
+
+def parse_types(value):
+    if not value:
+        return list(TRANSFER_SOURCES)
+    types = [t.strip() for t in value.split(",") if t.strip()]
+    unknown = [t for t in types if t not in TRANSFER_SOURCES]
+    if unknown:
+        raise StatementQueryError(f"Unknown transaction type: {', '.join(unknown)}")
+    return types
+
+
+def parse_limit(value):
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise StatementQueryError("limit must be an integer")
+    if limit <= 0:
+        raise StatementQueryError("limit must be greater than 0")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _projection(tx_type, mapping):
+    annotations = {}
+    for column in STATEMENT_COLUMNS:
+        if column == "tx_type":
+            annotations[column] = Value(tx_type, output_field=CharField())
+        elif mapping.get(column):
+            annotations[column] = F(mapping[column])
+        else:
+            annotations[column] = Value(None, output_field=CharField())
+    return annotations
+
+
+def _keyset_filter(tx_type, cursor):
+    # Rows are ordered by (date, type, id) descending; keep what sorts after the cursor
+    date, cursor_type, cursor_id = cursor
+    if tx_type < cursor_type:
+        return Q(date__lte=date)
+    if tx_type == cursor_type:
+        return Q(date__lt=date) | Q(date=date, id__lt=cursor_id)
+    return Q(date__lt=date)
+
+
+def archive_horizon():
+    """Everything in ArchivedTransfer is older than this."""
+    return now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def archive_queryset(user, types=None, start=None, end=None, cursor=None):
+    """Archived statement rows, in the same projection as the hot tables."""
+    qs = ArchivedTransfer.objects.filter(user=user)
+    if types is not None:
+        qs = qs.filter(source_type__in=types)
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lt=end)
+    if cursor is not None:
+        date, cursor_type, cursor_id = cursor
+        qs = qs.filter(
+            Q(date__lt=date)
+            | Q(date=date, source_type__lt=cursor_type)
+            | Q(date=date, source_type=cursor_type, source_id__lt=cursor_id)
+        )
+    return qs.annotate(
+        **{column: F(ARCHIVE_FIELDS[column]) for column in STATEMENT_COLUMNS}
+    ).values_list(*STATEMENT_COLUMNS)
+
+
+def statement_queryset(user, types=None, start=None, end=None, cursor=None, descending=True, archive=False):
+    """Merge the transfer tables into one (date, type, id) ordered UNION ALL.
+
+    ``archive=True`` adds ArchivedTransfer as one more branch. Keyset cursors
+    are only supported for the default descending order.
+    """
+    branches = []
+    for tx_type in types or TRANSFER_SOURCES:
+        model, mapping = TRANSFER_SOURCES[tx_type]
+        qs = model.objects.filter(user=user)
+        if start is not None:
+            qs = qs.filter(date__gte=start)
+        if end is not None:
+            qs = qs.filter(date__lt=end)
+        if cursor is not None:
+            qs = qs.filter(_keyset_filter(tx_type, cursor))
+        branches.append(
+            qs.annotate(**_projection(tx_type, mapping)).values_list(*STATEMENT_COLUMNS)
+        )
+
+    if archive:
+        branches.append(archive_queryset(user, types, start, end, cursor))
+
+    merged = branches[0]
+    if len(branches) > 1:
+        merged = merged.union(*branches[1:], all=True)
+    if descending:
+        return merged.order_by("-tx_date", "-tx_type", "-tx_id")
+    return merged.order_by("tx_date", "tx_type", "tx_id")
+
+
+def _split_page(rows, limit):
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _sort_key(row):
+    return row[COLUMN_INDEX["tx_date"]], row[COLUMN_INDEX["tx_type"]], row[COLUMN_INDEX["tx_id"]]
+
+
+def _reaches_archive(rows, limit, start):
+    """Whether the page may contain archived rows.
+
+    Only when the requested range starts before the archive horizon and the
+    hot tables ran out of rows, or their page already reaches past it.
+    """
+    horizon = archive_horizon()
+    if start is not None and start >= horizon:
+        return False
+    return len(rows) <= limit or rows[-1][COLUMN_INDEX["tx_date"]] < horizon
+
+
+def _merge(rows, archived, limit):
+    return sorted(rows + archived, key=_sort_key, reverse=True)[:limit + 1]
+
+
+def fetch_statement_page(user, limit=DEFAULT_PAGE_SIZE, cursor=None, types=None, start=None, end=None):
+    """Return one page of statement rows and the cursor for the next page."""
+    decoded = decode_cursor(cursor) if cursor else None
+    rows = list(statement_queryset(user, types, start, end, decoded)[:limit + 1])
+    if _reaches_archive(rows, limit, start):
+        archived = list(archive_queryset(user, types, start, end, decoded).order_by(
+            "-tx_date", "-tx_type", "-tx_id"
+        )[:limit + 1])
+        rows = _merge(rows, archived, limit)
+    return _split_page(rows, limit)
+
+
+async def afetch_statement_page(user, limit=DEFAULT_PAGE_SIZE, cursor=None, types=None, start=None, end=None):
+    decoded = decode_cursor(cursor) if cursor else None
+    rows = [row async for row in statement_queryset(user, types, start, end, decoded)[:limit + 1]]
+    if _reaches_archive(rows, limit, start):
+        archived = [row async for row in archive_queryset(user, types, start, end, decoded).order_by(
+            "-tx_date", "-tx_type", "-tx_id"
+        )[:limit + 1]]
+        rows = _merge(rows, archived, limit)
+    return _split_page(rows, limit)
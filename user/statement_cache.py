@@ -0,0 +1,95 @@
+"""Versioned cache for the account statement.
+
+Every user has a version counter in the cache. Transfers bump it once their
+transaction commits, so cached pages and ETags for older versions simply stop
+matching; nothing has to be deleted.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from user.routers import pin_to_primary
+
+
+def _version_key(user_id):
+    return f"statement:version:{user_id}"
+
+
+def get_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version evicted from the cache never comes back
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(user_id):
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump(user_ids):
+    # Replicas may not have the commit yet; a replica read now would be
+    # cached under the new version
+    pin_to_primary(user_ids)
+    for user_id in user_ids:
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            # Not cached yet: the next read seeds a fresh version
+            pass
+
+
+def invalidate(*user_ids):
+    """Bump the statement version of ``user_ids`` when the current transaction commits.
+
+    Also pins those users to the primary database for a few seconds.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        transaction.on_commit(lambda: _bump(user_ids))
+
+
+def _params_digest(params):
+    raw = "&".join(f"{key}={params.get(key) or ''}" for key in sorted(params))
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def etag(user_id, version, params):
+    return f'"{user_id}-{version}-{_params_digest(params)}"'
+
+
+def etag_matches(if_none_match, current):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == current for tag in tags)
+
+
+def _page_key(user_id, version, params):
+    return f"statement:page:{user_id}:{version}:{_params_digest(params)}"
+
+
+def get_page(user_id, version, params):
+    return cache.get(_page_key(user_id, version, params))
+
+
+def set_page(user_id, version, params, data):
+    cache.set(_page_key(user_id, version, params), data, settings.STATEMENT_CACHE_TTL)
+
+
+async def aget_page(user_id, version, params):
+    return await cache.aget(_page_key(user_id, version, params))
+
+
+async def aset_page(user_id, version, params, data):
+    await cache.aset(_page_key(user_id, version, params), data, settings.STATEMENT_CACHE_TTL)
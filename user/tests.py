@@ -1,3 +1,915 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import re
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils.timezone import localdate, now
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from user import ledger, ratelimit, reconcile, rollups, settlement, statement_cache
+from user.archive import archive_transfers
+from user.authentication import CachedTokenAuthentication, generation_key, local_tokens, token_cache_key
+from user.batch import InvalidBatchFile, parse_csv, run_batch
+from user.export import stream_statement
+from user.grants import GRANT_HEADER
+from user.idempotency import IDEMPOTENCY_HEADER, REPLAY_HEADER, execute_once, fingerprint
+from user.management.commands.loadtest import non_2xx
+from user.metrics import Histogram
+from user.models import (
+    AccountNumberSequence, ArchivedTransfer, BalanceShard, CounterBaseline, CustomUser, DailyAggregate,
+    DomesticTransfer, UserAccount, WireTransfer,
+)
+from user.renderers import FastJSONRenderer
+from user.routers import PrimaryReplicaRouter, aread_replica, pin_to_primary, read_replica
+from user.settlement import LocalGateway
+from user.signup import bulk_signup, conflict_message
+from user.statement import COLUMN_INDEX, fetch_statement_page
+from user.transfers import TRANSFER_TYPES, TransferError
+from user.utils import account_numbers, format_account_number
+
+
+def make_account(username, balance=0):
+    user = CustomUser.objects.create_user(username, f"{username}@example.com", "secret")
+    UserAccount.objects.filter(user=user).update(account_balance=balance)
+    return user, UserAccount.objects.get(user=user)
+
+
+def token_headers(user):
+    return {"Authorization": f"Token {Token.objects.get_or_create(user=user)[0].key}"}
+
+
+@override_settings(RATE_LIMITS={})
+class ApiTestCase(TestCase):
+    """Endpoint tests: no rate limits, and no cached tokens or pages from earlier tests."""
+
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+
+    def post(self, path, data, user, **headers):
+        return self.client.post(path, data, content_type="application/json", headers={**token_headers(user), **headers})
+
+
+def domestic_fields(account, **overrides):
+    return {
+        "beneficiary_name": "Beneficiary",
+        "beneficiary_account_number": account.account_number,
+        "bank_name": "TDB",
+        "description": "",
+        "account_type": "savings",
+        **overrides,
+    }
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user, self.account = make_account("sender", balance=100)
+
+    def test_debit_deducts_balance_and_counts_withdrawal(self):
+        ledger.debit(self.account, Decimal("30"))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal("70"))
+        self.assertEqual(self.account.total_withdrawal, Decimal("30"))
+
+    def test_debit_beyond_balance_raises_and_changes_nothing(self):
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.debit(self.account, Decimal("100.01"))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal("100"))
+        self.assertEqual(self.account.total_withdrawal, Decimal("0"))
+
+
+class DomesticTransferTests(TestCase):
+    def setUp(self):
+        self.user, self.account = make_account("sender", balance=100)
+        self.receiver_user, self.receiver = make_account("receiver")
+        self.domestic = TRANSFER_TYPES["domestic"]
+
+    def test_transfer_moves_funds_and_writes_ledger_legs(self):
+        status, body = self.domestic.execute(self.user, domestic_fields(self.receiver), Decimal("40"))
+        self.assertEqual(status, 201)
+        self.assertEqual(body["data"]["account_balance"], 60.0)
+        self.receiver.refresh_from_db()
+        self.assertEqual(self.receiver.account_balance, Decimal("40"))
+        self.assertEqual(self.receiver.total_deposit, Decimal("40"))
+        self.assertEqual(ledger.ledger_balance(self.receiver), Decimal("40"))
+
+    def test_transfer_to_self_keeps_balance(self):
+        status, body = self.domestic.execute(self.user, domestic_fields(self.account), Decimal("25"))
+        self.assertEqual(status, 201)
+        self.assertEqual(body["data"]["account_balance"], 100.0)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal("100"))
+        self.assertEqual(self.account.total_deposit, Decimal("25"))
+        self.assertEqual(self.account.total_withdrawal, Decimal("25"))
+
+    def test_insufficient_funds_rolls_back(self):
+        status, body = self.domestic.execute(self.user, domestic_fields(self.receiver), Decimal("150"))
+        self.assertEqual(status, 400)
+        self.assertFalse(DomesticTransfer.objects.exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal("100"))
+
+    def test_transfer_to_hot_account_parks_credit_on_a_shard(self):
+        ledger.set_balance_shards(self.receiver, 4)
+        status, _ = self.domestic.execute(self.user, domestic_fields(self.receiver), Decimal("40"))
+        self.assertEqual(status, 201)
+        self.receiver.refresh_from_db()
+        self.assertEqual(self.receiver.account_balance, Decimal("0"))
+        self.assertEqual(ledger.available_balance(self.receiver), Decimal("40"))
+        self.assertEqual(sum(BalanceShard.objects.values_list("total_deposit", flat=True)), Decimal("40"))
+
+        self.assertEqual(ledger.compact_shards(self.receiver), Decimal("40"))
+        self.receiver.refresh_from_db()
+        self.assertEqual(self.receiver.account_balance, Decimal("40"))
+        self.assertEqual(self.receiver.total_deposit, Decimal("40"))
+
+    def test_amount_with_more_than_two_decimals_is_rejected(self):
+        with self.assertRaisesMessage(TransferError, "at most 2 decimal places"):
+            self.domestic.clean({**domestic_fields(self.receiver), "amount": "1.005"}, require_password=False)
+
+
+async def make_async_account():
+    def create():
+        user, account = make_account("hot", balance=10)
+        ledger.set_balance_shards(account, 2)
+        BalanceShard.objects.filter(account=account, shard=0).update(balance=5, total_deposit=5)
+        user.token = Token.objects.create(user=user).key
+        return user, account
+
+    return await sync_to_async(create)()
+
+
+@override_settings(RATE_LIMITS={})
+class AsyncStatementTests(TestCase):
+    async def test_balance_includes_parked_shard_credits(self):
+        user, account = await make_async_account()
+        response = await self.async_client.get(
+            "/user/async/account/statement/", headers={"Authorization": f"Token {user.token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["account_balance"], 15.0)
+
+    async def test_shares_the_sync_etag_and_version(self):
+        await cache.aclear()
+        user, account = await make_async_account()
+        headers = {"Authorization": f"Token {user.token}"}
+        sync_response = await sync_to_async(self.client.get)("/user/account/statement/", headers=headers)
+        etag = sync_response.headers["ETag"]
+
+        conditional = {**headers, "If-None-Match": etag}
+        response = await self.async_client.get("/user/async/account/statement/", headers=conditional)
+        self.assertEqual(response.status_code, 304)
+
+        await sync_to_async(statement_cache._bump)({user.pk})
+        response = await self.async_client.get("/user/async/account/statement/", headers=conditional)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+
+class StatementPaginationTests(TestCase):
+    def setUp(self):
+        self.user, self.account = make_account("sender")
+        self.date = now().replace(microsecond=0)
+        for _ in range(5):
+            DomesticTransfer.objects.create(
+                user=self.user, account=self.account, amount=1, status="completed", date=self.date,
+                beneficiary_name="b", beneficiary_account_number="1", bank_name="TDB",
+            )
+        for _ in range(3):
+            WireTransfer.objects.create(
+                user=self.user, account=self.account, amount=2, status="completed", date=self.date,
+                beneficiary_name="b", routing_number="1", iban="DE00", bank_name="TDB", swift_code="S",
+                country="DE",
+            )
+
+    def test_pages_cover_rows_with_equal_timestamps_exactly_once(self):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = fetch_statement_page(self.user, limit=3, cursor=cursor)
+            seen.extend((row[COLUMN_INDEX["tx_type"]], row[COLUMN_INDEX["tx_id"]]) for row in rows)
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(len(set(seen)), 8)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.user, self.account = make_account("payer", balance=100)
+        self.receiver_user, self.receiver = make_account("payee")
+
+    def item(self, **overrides):
+        return {**domestic_fields(self.receiver), "amount": "1", **overrides}
+
+    def test_sub_cent_amounts_are_rejected_per_item(self):
+        result = run_batch(self.user, self.account, "b1", [self.item(amount="0.004"), self.item(amount="1.005")])
+        self.assertEqual(result["succeeded"], 0)
+        self.assertEqual([r["message"] for r in result["results"]], ["Amount must have at most 2 decimal places"] * 2)
+        self.account.refresh_from_db()
+        self.receiver.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal("100"))
+        self.assertEqual(self.receiver.account_balance, Decimal("0"))
+        self.assertFalse(DailyAggregate.objects.exists())
+
+    def test_stored_rows_match_the_money_moved(self):
+        result = run_batch(self.user, self.account, "b1", [self.item(amount="12.50"), self.item(amount="0.01")])
+        self.assertEqual(result["succeeded"], 2)
+        self.receiver.refresh_from_db()
+        stored = sum(DomesticTransfer.objects.values_list("amount", flat=True))
+        self.assertEqual(stored, Decimal("12.51"))
+        self.assertEqual(self.receiver.account_balance, stored)
+
+    def test_malformed_fields_are_per_item_errors(self):
+        result = run_batch(self.user, self.account, "b1", [
+            self.item(beneficiary_account_number=["1234"]),
+            self.item(beneficiary_name="n" * 101),
+            self.item(),
+        ])
+        messages = [r.get("message") for r in result["results"]]
+        self.assertEqual(messages[0], "Beneficiary account does not exist in our system")
+        self.assertEqual(messages[1], "beneficiary_name must be at most 100 characters")
+        self.assertEqual(result["results"][2]["status"], "success")
+
+    def test_non_utf8_csv_is_rejected(self):
+        with self.assertRaises(InvalidBatchFile):
+            parse_csv(io.BytesIO(b"beneficiary_name,amount\n\xff\xfe,1\n"))
+
+    @override_settings(RATE_LIMITS={})
+    def test_reused_batch_id_replays_only_the_same_transfers(self):
+        def post(items):
+            return self.client.post(
+                "/user/domestic/transfer/batch/",
+                {"batch_id": "payroll-1", "password": "secret", "transfers": items},
+                content_type="application/json", headers=token_headers(self.user),
+            )
+
+        self.assertEqual(post([self.item(amount="5")]).status_code, 201)
+        replay = post([self.item(amount="5")])
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.json()["message"], "Batch already processed")
+        self.assertEqual(post([self.item(amount="50")]).status_code, 422)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal("95"))
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        self.domestic = TRANSFER_TYPES["domestic"]
+
+    def test_legacy_history_is_not_applied_again(self):
+        sender_user, sender = make_account("legacy_sender", balance=900)
+        _, receiver = make_account("legacy_receiver", balance=100)
+        _, funded = make_account("admin_funded", balance=50)
+        DomesticTransfer.objects.create(
+            user=sender_user, account=sender, amount=100, status="completed", date=now() - timedelta(days=30),
+            beneficiary_name="r", beneficiary_account_number=receiver.account_number, bank_name="TDB",
+        )
+        # What migration 0013 records for accounts that predate the counters
+        CounterBaseline.objects.bulk_create(
+            [CounterBaseline(account=account) for account in (sender, receiver, funded)]
+        )
+
+        checked, mismatches = reconcile.reconcile_range(0, 10 ** 9, repair=True)
+        self.assertEqual(checked, 3)
+        self.assertEqual(mismatches, [])
+        balances = dict(UserAccount.objects.values_list("pk", "account_balance"))
+        self.assertEqual(balances, {sender.pk: 900, receiver.pk: 100, funded.pk: 50})
+
+    def test_lost_update_proven_by_the_ledger_is_repaired(self):
+        sender_user, sender = make_account("sender", balance=100)
+        _, receiver = make_account("receiver")
+        ledger.snapshot_accounts([sender.pk, receiver.pk])
+        self.domestic.execute(sender_user, domestic_fields(receiver), Decimal("10"))
+        # The credit was lost together with its counter
+        UserAccount.objects.filter(pk=receiver.pk).update(account_balance=0, total_deposit=0)
+
+        _, mismatches = reconcile.reconcile_range(0, 10 ** 9, repair=True)
+        self.assertEqual([m["balance_adjustment"] for m in mismatches], ["10.00"])
+        receiver.refresh_from_db()
+        self.assertEqual((receiver.account_balance, receiver.total_deposit), (Decimal("10"), Decimal("10")))
+
+    def test_counter_drift_alone_leaves_the_balance(self):
+        sender_user, sender = make_account("sender", balance=100)
+        _, receiver = make_account("receiver")
+        self.domestic.execute(sender_user, domestic_fields(receiver), Decimal("10"))
+        UserAccount.objects.filter(pk=sender.pk).update(total_withdrawal=0)
+
+        _, mismatches = reconcile.reconcile_range(0, 10 ** 9, repair=True)
+        self.assertEqual([m["balance_adjustment"] for m in mismatches], [None])
+        sender.refresh_from_db()
+        self.assertEqual((sender.account_balance, sender.total_withdrawal), (Decimal("90"), Decimal("10")))
+
+    def test_balance_drift_with_matching_counters_is_reported_not_repaired(self):
+        sender_user, sender = make_account("sender", balance=100)
+        _, receiver = make_account("receiver")
+        ledger.snapshot_accounts([sender.pk, receiver.pk])
+        self.domestic.execute(sender_user, domestic_fields(receiver), Decimal("10"))
+        # Only the balance write was lost; the counters still agree with the transfers
+        UserAccount.objects.filter(pk=receiver.pk).update(account_balance=0)
+        # Without a snapshot, a baselined account's ledger proves nothing
+        _, legacy = make_account("legacy", balance=70)
+        CounterBaseline.objects.create(account=legacy)
+
+        _, mismatches = reconcile.reconcile_range(0, 10 ** 9)
+        self.assertEqual(
+            [(m["account_id"], m["kind"], m["ledger_drift"]) for m in mismatches],
+            [(receiver.pk, "ledger_drift", "10.00")],
+        )
+        reconcile.reconcile_range(0, 10 ** 9, repair=True)
+        receiver.refresh_from_db()
+        self.assertEqual(receiver.account_balance, Decimal("0"))
+
+
+class AccountNumberTests(TestCase):
+    def test_block_reserved_in_a_rolled_back_savepoint_is_dropped(self):
+        account_numbers.reset()
+        try:
+            with transaction.atomic():
+                account_numbers.allocate()
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        serial = int(account_numbers.allocate()[:-1])
+        next_value = AccountNumberSequence.objects.get().next_value
+        self.assertLess(serial, next_value)
+        self.assertGreaterEqual(serial, next_value - 100)
+
+    def test_bulk_signup_skips_legacy_account_numbers(self):
+        account_numbers.reset()
+        _, legacy = make_account("legacy")
+        # Inside a transaction serials are reserved one by one, so the next number is known
+        upcoming = format_account_number(AccountNumberSequence.objects.get().next_value)
+        UserAccount.objects.filter(pk=legacy.pk).update(account_number=upcoming)
+
+        rows = [
+            {"first_name": "A", "last_name": "B", "username": f"bulk{i}", "email": f"bulk{i}@example.com"}
+            for i in range(2)
+        ]
+        self.assertEqual(bulk_signup(rows), (2, []))
+        self.assertEqual(UserAccount.objects.filter(account_number=upcoming).count(), 1)
+
+
+class ArchiveTests(TestCase):
+    def test_settlement_audit_trail_survives_archiving(self):
+        user, account = make_account("sender")
+        settled = now() - timedelta(days=400)
+        WireTransfer.objects.create(
+            user=user, account=account, amount=5, status="completed", date=settled,
+            beneficiary_name="b", routing_number="1", iban="DE00", bank_name="TDB", swift_code="S", country="DE",
+            attempts=2, settled_at=settled, gateway_reference="ref-1",
+        )
+        archive_transfers()
+        archived = ArchivedTransfer.objects.get()
+        self.assertEqual((archived.attempts, archived.settled_at, archived.gateway_reference), (2, settled, "ref-1"))
+
+
+class ExportTests(TestCase):
+    def test_formula_cells_are_escaped_in_csv(self):
+        user, account = make_account("sender")
+        DomesticTransfer.objects.create(
+            user=user, account=account, amount=1, status="completed",
+            beneficiary_name='=HYPERLINK("http://evil")', beneficiary_account_number="1", bank_name="@SUM(A1)",
+        )
+        exported = b"".join(stream_statement(user)).decode()
+        self.assertIn("\"'=HYPERLINK(\"\"http://evil\"\")\"", exported)
+        self.assertIn("'@SUM(A1)", exported)
+
+
+class SecurityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fingerprint_is_keyed_and_ignores_the_password(self):
+        body = {"amount": "5", "password": "secret"}
+        self.assertEqual(fingerprint("POST", "/t/", body), fingerprint("POST", "/t/", {"amount": "5"}))
+        plain = hashlib.sha256(f"POST:/t/:{json.dumps(body, sort_keys=True)}".encode()).hexdigest()
+        self.assertNotEqual(fingerprint("POST", "/t/", body), plain)
+
+    def test_signup_conflict_ignores_the_clashing_value(self):
+        class Diag:
+            constraint_name = "user_customuser_username_key"
+
+        class Cause(Exception):
+            diag = Diag()
+
+        try:
+            raise IntegrityError("DETAIL:  Key (username)=(myemail) already exists.") from Cause()
+        except IntegrityError as exc:
+            self.assertEqual(conflict_message(exc), "Username already exists")
+
+
+class RendererTests(TestCase):
+    def test_orjson_output_matches_the_stock_encoder(self):
+        data = {"amount": Decimal("10.50"), "at": datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc)}
+        stock = json.loads(JSONRenderer().render(data))
+        self.assertEqual(stock, {"amount": 10.5, "at": "2026-01-02T03:04:05.678901Z"})
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), stock)
+        with mock.patch("user.renderers.orjson", None):
+            self.assertEqual(json.loads(FastJSONRenderer().render(data)), stock)
+
+
+class GrantTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.account = make_account("sender", balance=100)
+        _, self.receiver = make_account("receiver")
+        response = self.post("/user/transfer/authorize/", {"password": "secret"}, self.user)
+        self.assertEqual(response.status_code, 201)
+        self.grant = response.json()["data"]["transfer_authorization"]
+
+    def transfer(self):
+        return self.post(
+            "/user/domestic/transfer/", {**domestic_fields(self.receiver), "amount": "1"}, self.user,
+            **{GRANT_HEADER: self.grant},
+        )
+
+    @override_settings(TRANSFER_GRANT_MAX_USES=2)
+    def test_grant_replaces_the_password_up_to_max_uses(self):
+        self.assertEqual(self.transfer().status_code, 201)
+        self.assertEqual(self.transfer().status_code, 201)
+        response = self.transfer()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["message"], "Invalid or expired transfer authorization")
+
+    def test_grant_expires_after_its_ttl(self):
+        expired = time.time() + settings.TRANSFER_GRANT_TTL + 1
+        with mock.patch("django.core.signing.time.time", return_value=expired):
+            self.assertEqual(self.transfer().status_code, 403)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal("100"))
+
+    def test_grant_is_bound_to_its_user(self):
+        other, _ = make_account("other", balance=100)
+        response = self.post(
+            "/user/domestic/transfer/", {**domestic_fields(self.receiver), "amount": "1"}, other,
+            **{GRANT_HEADER: self.grant},
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class IdempotencyTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.account = make_account("sender", balance=100)
+        _, self.receiver = make_account("receiver")
+
+    def transfer(self, key, **overrides):
+        fields = {**domestic_fields(self.receiver), "amount": "10", "password": "secret", **overrides}
+        return self.post("/user/domestic/transfer/", fields, self.user, **{IDEMPOTENCY_HEADER: key})
+
+    def assertBalance(self, expected):
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal(expected))
+
+    def test_repeated_key_replays_the_first_response(self):
+        first = self.transfer("k1")
+        second = self.transfer("k1")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers[REPLAY_HEADER], "true")
+        self.assertBalance("90")
+
+    def test_replay_survives_a_cache_flush(self):
+        self.transfer("k1")
+        cache.clear()
+        response = self.transfer("k1")
+        self.assertEqual(response.headers[REPLAY_HEADER], "true")
+        self.assertBalance("90")
+
+    def test_reused_key_with_a_different_body_is_rejected(self):
+        self.transfer("k1")
+        self.assertEqual(self.transfer("k1", amount="20").status_code, 422)
+        self.assertBalance("90")
+
+    def test_rejected_attempts_are_not_stored(self):
+        self.assertEqual(self.transfer("k1", password="wrong").status_code, 403)
+        self.assertEqual(self.transfer("k1", amount="").status_code, 400)
+        response = self.transfer("k1")
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn(REPLAY_HEADER, response.headers)
+        self.assertBalance("90")
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_concurrent_duplicate_runs_once(self):
+        calls = []
+        request_fingerprint = fingerprint("POST", "/x", {})
+
+        def execute():
+            calls.append(1)
+            # The duplicate arrives while the first request still holds the key
+            duplicate = execute_once(self.user, "k1", request_fingerprint, execute)
+            self.assertEqual(duplicate[0], 409)
+            return 201, {"status": "success"}, None
+
+        self.assertEqual(execute_once(self.user, "k1", request_fingerprint, execute)[:2], (201, {"status": "success"}))
+        cache.clear()
+        self.assertEqual(execute_once(self.user, "k1", request_fingerprint, execute)[::3], (201, True))
+        self.assertEqual(len(calls), 1)
+
+
+class TokenCacheTests(ApiTestCase):
+    """Another process's local entry is simulated by putting the stale one back after an invalidation."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, _ = make_account("holder")
+        self.headers = token_headers(self.user)
+        self.key = Token.objects.get(user=self.user).key
+        self.cache_key = token_cache_key(self.key)
+
+    def test_logout_evicts_the_token_in_every_process(self):
+        self.assertEqual(self.client.get("/user/account/summary/", headers=self.headers).status_code, 200)
+        stale = local_tokens.get(self.cache_key)
+        self.assertIsNotNone(stale)
+
+        self.assertEqual(self.client.post("/user/logout/", headers=self.headers).status_code, 200)
+        local_tokens.set(self.cache_key, stale)
+        self.assertEqual(self.client.get("/user/account/summary/", headers=self.headers).status_code, 401)
+
+    def test_password_change_refreshes_the_cached_user(self):
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(self.key)
+        stale = local_tokens.get(self.cache_key)
+
+        self.user.set_password("changed")
+        self.user.save()
+        local_tokens.set(self.cache_key, stale)
+        user, _ = auth.authenticate_credentials(self.key)
+        self.assertTrue(user.check_password("changed"))
+
+    def test_local_hit_needs_the_shared_generation(self):
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(self.key)
+        stale = local_tokens.get(self.cache_key)[2]
+        # Evicted from the shared cache: the local entry is refetched under a new generation
+        cache.delete(generation_key(self.user.pk))
+        auth.authenticate_credentials(self.key)
+        fresh = local_tokens.get(self.cache_key)[2]
+        self.assertNotEqual(fresh, stale)
+        self.assertEqual(fresh, cache.get(generation_key(self.user.pk)))
+
+
+class RollupTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.account = make_account("sender", balance=100)
+        _, self.receiver = make_account("receiver")
+
+    def wire(self, amount, status="pending"):
+        return WireTransfer.objects.create(
+            user=self.user, account=self.account, amount=amount, status=status,
+            beneficiary_name="b", routing_number="1", iban="DE00", bank_name="TDB", swift_code="S", country="DE",
+        )
+
+    def test_incremental_rollups_match_a_backfill(self):
+        fields = {**domestic_fields(self.receiver), "amount": "10", "password": "secret"}
+        self.assertEqual(self.post("/user/domestic/transfer/", fields, self.user).status_code, 201)
+        self.wire(5)
+        failed = self.wire(7)
+        failed.status = "failed"
+        failed.save(update_fields=["status"])
+        rollups.move(failed, "pending")
+
+        def snapshot():
+            return sorted(DailyAggregate.objects.values_list("account", "transaction_type", "status", "count", "total"))
+
+        incremental = snapshot()
+        rollups.backfill()
+        self.assertEqual(snapshot(), incremental)
+        self.assertEqual(
+            [row[1:] for row in incremental if row[0] == self.account.pk],
+            [("domestic_transfer", "completed", 1, Decimal("10")), ("wire", "failed", 1, Decimal("7")),
+             ("wire", "pending", 1, Decimal("5"))],
+        )
+
+    def test_summary_totals_and_money_out(self):
+        self.wire(5)
+        self.wire(7, status="failed")
+        self.wire(3, status="completed")
+        response = self.client.get("/user/account/summary/?group_by=day", headers=token_headers(self.user))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual(
+            [(row["type"], row["status"], row["count"], row["amount"]) for row in data["totals"]],
+            [("wire", "completed", 1, 3.0), ("wire", "failed", 1, 7.0), ("wire", "pending", 1, 5.0)],
+        )
+        self.assertEqual(data["money_out"], 8.0)
+        self.assertEqual({row["date"] for row in data["days"]}, {localdate().isoformat()})
+
+    def test_summary_rejects_an_inverted_range(self):
+        response = self.client.get(
+            "/user/account/summary/?start_date=2026-02-01&end_date=2026-01-01", headers=token_headers(self.user)
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class StatementCacheTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.account = make_account("sender", balance=100)
+        self.receiver_user, self.receiver = make_account("receiver")
+
+    def statement(self, user, etag=None, headers=None):
+        headers = dict(headers or token_headers(user))
+        if etag:
+            headers["If-None-Match"] = etag
+        return self.client.get("/user/account/statement/", headers=headers)
+
+    def test_unchanged_statement_is_not_modified(self):
+        etag = self.statement(self.user).headers["ETag"]
+        response = self.statement(self.user, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.statement(self.user, f'W/{etag}, "other"').status_code, 304)
+
+    def test_transfer_bumps_both_parties_versions(self):
+        sender_etag = self.statement(self.user).headers["ETag"]
+        receiver_etag = self.statement(self.receiver_user).headers["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            fields = {**domestic_fields(self.receiver), "amount": "10", "password": "secret"}
+            self.assertEqual(self.post("/user/domestic/transfer/", fields, self.user).status_code, 201)
+
+        response = self.statement(self.user, sender_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["account_balance"], 90.0)
+        self.assertEqual(len(response.json()["data"]["transactions"]), 1)
+        self.assertEqual(self.statement(self.receiver_user, receiver_etag).status_code, 200)
+
+    def test_first_page_is_served_from_the_cache(self):
+        headers = token_headers(self.user)
+        self.statement(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.statement(self.user, headers=headers).status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+
+    def db_for_read(self, user_id):
+        with read_replica(user_id):
+            return self.router.db_for_read(UserAccount)
+
+    def test_reads_opt_in_to_replicas(self):
+        self.assertEqual(self.router.db_for_read(UserAccount), "default")
+        self.assertEqual(self.db_for_read(1), "replica")
+        self.assertEqual(self.router.db_for_write(UserAccount), "default")
+
+    def test_committed_transfer_pins_its_users_to_the_primary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            statement_cache.invalidate(1, 2)
+        self.assertEqual(self.db_for_read(1), "default")
+        self.assertEqual(self.db_for_read(2), "default")
+        self.assertEqual(self.db_for_read(3), "replica")
+
+    def test_rolled_back_transfer_does_not_pin(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            statement_cache.invalidate(1)
+        self.assertEqual(self.db_for_read(1), "replica")
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_pinning_can_be_disabled(self):
+        pin_to_primary([1])
+        self.assertEqual(self.db_for_read(1), "replica")
+
+    async def test_async_reads_respect_the_pin(self):
+        await sync_to_async(pin_to_primary)([1])
+        for user_id, expected in ((1, "default"), (2, "replica")):
+            async with aread_replica(user_id):
+                self.assertEqual(self.router.db_for_read(UserAccount), expected)
+
+
+@override_settings(SETTLEMENT_MAX_ATTEMPTS=2)
+class SettlementTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.account = make_account("sender", balance=100)
+        self.gateway = LocalGateway()
+
+    def wire(self, iban="DE00", amount="10"):
+        fields = {
+            "beneficiary_name": "b", "routing_number": "1", "iban": iban, "bank_name": "TDB", "swift_code": "S",
+            "country": "DE", "amount": amount, "password": "secret",
+        }
+        response = self.post("/user/wire/transfer/", fields, self.user)
+        self.assertEqual(response.status_code, 202)
+        return WireTransfer.objects.get(pk=response.json()["data"]["transfer_id"])
+
+    def settle(self):
+        return settlement.settle_due(gateway=self.gateway)
+
+    def due_again(self, transfer):
+        WireTransfer.objects.filter(pk=transfer.pk).update(next_attempt_at=now())
+
+    def assertBalance(self, expected):
+        self.account.refresh_from_db()
+        self.assertEqual(ledger.available_balance(self.account), Decimal(expected))
+
+    def assertRolledUp(self, status):
+        self.assertEqual(
+            list(DailyAggregate.objects.filter(account=self.account).exclude(count=0).values_list("status", "count")),
+            [(status, 1)],
+        )
+
+    def test_settled_transfer_is_completed(self):
+        transfer = self.wire()
+        self.assertEqual(self.settle(), {"completed": 1, "failed": 0, "retrying": 0})
+        transfer.refresh_from_db()
+        self.assertEqual(transfer.status, "completed")
+        self.assertEqual(transfer.gateway_reference, self.gateway.payouts[transfer.settlement_reference])
+        self.assertIsNotNone(transfer.settled_at)
+        self.assertBalance("90")
+        self.assertRolledUp("completed")
+
+    def test_rejected_transfer_fails_and_is_refunded(self):
+        transfer = self.wire(iban="REJECT")
+        self.assertEqual(self.settle(), {"completed": 0, "failed": 1, "retrying": 0})
+        transfer.refresh_from_db()
+        self.assertEqual((transfer.status, transfer.next_attempt_at), ("failed", None))
+        self.assertEqual(transfer.failure_reason, "Beneficiary bank rejected the transfer")
+        self.assertBalance("100")
+        # The refund reverses the debit's ledger legs
+        self.assertEqual(ledger.ledger_balance(self.account), Decimal("0"))
+        self.assertRolledUp("failed")
+
+    def test_transient_failure_backs_off_then_gives_up(self):
+        transfer = self.wire(iban="RETRY")
+        self.assertEqual(self.settle(), {"completed": 0, "failed": 0, "retrying": 1})
+        transfer.refresh_from_db()
+        self.assertEqual((transfer.status, transfer.attempts), ("pending", 1))
+        self.assertGreater(transfer.next_attempt_at, now())
+        # Not due yet
+        self.assertEqual(self.settle(), {"completed": 0, "failed": 0, "retrying": 0})
+
+        self.due_again(transfer)
+        self.assertEqual(self.settle(), {"completed": 0, "failed": 1, "retrying": 0})
+        transfer.refresh_from_db()
+        self.assertEqual(transfer.status, "failed")
+        self.assertTrue(transfer.failure_reason.startswith("Gave up after 2 attempts"))
+        self.assertBalance("100")
+
+    def test_gateway_outage_retries_the_whole_batch(self):
+        class Down:
+            def settle(self, transfers):
+                raise settlement.GatewayUnavailable
+
+        self.wire()
+        self.wire()
+        self.assertEqual(settlement.settle_due(gateway=Down()), {"completed": 0, "failed": 0, "retrying": 2})
+
+    def test_reclaimed_transfer_keeps_its_reference_and_is_finished_once(self):
+        transfer = self.wire()
+        claimed = settlement.claim_batch(WireTransfer, 10)
+        # The lease expires while the first worker is still at the gateway
+        self.due_again(transfer)
+        reclaimed = settlement.claim_batch(WireTransfer, 10)
+        self.assertEqual(claimed[0].settlement_reference, reclaimed[0].settlement_reference)
+
+        settlement.settle_batch(claimed, self.gateway)
+        settlement.settle_batch(reclaimed, self.gateway)
+        self.assertEqual(len(self.gateway.payouts), 1)
+        transfer.refresh_from_db()
+        self.assertEqual(transfer.gateway_reference, self.gateway.payouts[transfer.settlement_reference])
+        self.assertBalance("90")
+        self.assertRolledUp("completed")
+
+
+@override_settings(METRICS_TOKEN=None, METRICS_RESPONSE_HEADERS=True)
+class MetricsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, _ = make_account("watcher")
+
+    def scrape(self, **headers):
+        return self.client.get("/metrics", headers=headers)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("demo_seconds", "Demo.", (0.1, 1.0), ("route",))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(("r",), value)
+        self.assertEqual(histogram.render(), [
+            "# HELP demo_seconds Demo.",
+            "# TYPE demo_seconds histogram",
+            'demo_seconds_bucket{route="r",le="0.1"} 1',
+            'demo_seconds_bucket{route="r",le="1.0"} 2',
+            'demo_seconds_bucket{route="r",le="+Inf"} 3',
+            'demo_seconds_count{route="r"} 3',
+            'demo_seconds_sum{route="r"} 5.550000',
+        ])
+
+    def test_requests_are_recorded_per_route(self):
+        response = self.client.get("/user/account/summary/", headers=token_headers(self.user))
+        self.assertRegex(response.headers["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", hash;dur=[\d.]+, ')
+
+        response = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{route="user/account/summary/",method="GET",status="200"}', body
+        )
+        queries = re.search(r'http_request_db_queries_sum\{route="user/account/summary/"\} ([\d.]+)', body)
+        self.assertGreater(float(queries.group(1)), 0)
+        self.assertIn('password_hash_duration_seconds_count{algorithm="pbkdf2_sha256"}', body)
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_scrapes_need_the_token_when_set(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(Authorization="Bearer wrong").status_code, 403)
+        self.assertEqual(self.scrape(Authorization="Bearer scrape-me").status_code, 200)
+
+
+class LoginTests(ApiTestCase):
+    def login(self, login, password="secret", path="/user/login/"):
+        return self.client.post(
+            path, {"username_or_email": login, "password": password}, content_type="application/json"
+        )
+
+    def test_email_wins_over_a_username_that_looks_like_it(self):
+        owner, _ = make_account("owner")
+        # Another user took the owner's email address as a username
+        CustomUser.objects.create_user("owner@example.com", "squatter@example.com", "secret")
+        for path in ("/user/login/", "/user/async/login/"):
+            response = self.login("OWNER@example.com", path=path)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["data"]["id"], owner.pk)
+
+    def test_username_login(self):
+        user, _ = make_account("plain")
+        response = self.login("plain")
+        self.assertEqual(response.json()["data"]["id"], user.pk)
+        self.assertEqual(self.login("plain", password="wrong").status_code, 401)
+        self.assertEqual(self.login("nobody").status_code, 401)
+
+    def test_login_is_one_query(self):
+        user, _ = make_account("quick")
+        token_headers(user)
+        with self.assertNumQueries(1):
+            response = self.login("quick@example.com")
+        self.assertEqual(response.json()["data"]["token"], Token.objects.get(user=user).key)
+
+
+class ThrottleTests(ApiTestCase):
+    limits = {
+        "login": {"buckets": {"ip": (100, 60), "username": (2, 60)}, "max_in_flight": 4, "max_hash_seconds": 1.0},
+    }
+
+    def setUp(self):
+        super().setUp()
+        ratelimit._backends.clear()
+        make_account("limited")
+
+    def login(self, path="/user/login/", login="limited"):
+        return self.client.post(
+            path, {"username_or_email": login, "password": "wrong"}, content_type="application/json"
+        )
+
+    def test_empty_bucket_is_429_with_retry_after(self):
+        with override_settings(RATE_LIMITS=self.limits):
+            for path in ("/user/login/", "/user/async/login/"):
+                ratelimit._backends.clear()
+                self.assertEqual([self.login(path).status_code for _ in range(2)], [401, 401])
+                response = self.login(path)
+                self.assertEqual(response.status_code, 429)
+                self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+            # Buckets are per username: someone else is not affected
+            self.assertEqual(self.login(login="other").status_code, 401)
+
+    def test_full_scope_is_shed_with_503(self):
+        with override_settings(RATE_LIMITS=self.limits):
+            for _ in range(4):
+                ratelimit.in_flight.enter("login", 4)
+            try:
+                response = self.login()
+            finally:
+                for _ in range(4):
+                    ratelimit.in_flight.leave("login")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["Retry-After"], "1")
+            self.assertEqual(self.login().status_code, 401)
+
+    def test_slow_hashing_is_shed_with_503(self):
+        with override_settings(RATE_LIMITS=self.limits), \
+                mock.patch.object(ratelimit.registry, "recent_hash_latency", return_value=2.0):
+            self.assertEqual(self.login().status_code, 503)
+            self.assertEqual(self.login("/user/async/login/").status_code, 503)
+
+    def test_loadtest_flags_non_2xx_statuses(self):
+        stats = {"statuses": {"200": 5, "429": 3, "503": 1, "connection_error": 1}}
+        self.assertEqual(non_2xx(stats), {"429": 3, "503": 1, "connection_error": 1})
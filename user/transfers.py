@@ -0,0 +1,237 @@
+"""One pipeline for every transfer type.
+
+A transfer runs through the same stages whatever its type:
+
+    validate  -> clean(): precompiled field schema + amount parsing
+    authorize -> done by the caller (password or transfer grant)
+    reserve   -> lock the sender (and any local counterparty) and debit
+    record    -> insert the transfer row and its ledger legs
+    settle    -> credit locally, or leave pending for the settlement worker
+
+reserve/record/settle share one transaction. Each type only declares its
+model, fields and the stage hooks that differ, so a new type inherits the
+locking order and the query budget of the existing ones.
+"""
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from user import ledger, statement_cache
+from user.models import DomesticTransfer, InterBankTransfer, UserAccount, WireTransfer
+
+# One request field, compiled once from the model's own field definition
+FieldSpec = namedtuple("FieldSpec", ["name", "required", "default", "max_length"])
+
+OPTIONAL_FIELDS = {"description": "", "account_type": "savings"}
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class TransferError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise TransferError(400, "Invalid amount format")
+    if not amount.is_finite() or amount <= 0:
+        raise TransferError(400, "Amount must be greater than 0")
+    if amount.as_tuple().exponent < -2:
+        raise TransferError(400, "Amount must have at most 2 decimal places")
+    return amount
+
+
+class TransferType:
+    name = None
+    model = None
+    fields = ()  # required request fields, stored on the model field of the same name
+    initial_status = "completed"
+    http_status = 201
+    message = None
+
+    def __init__(self):
+        opts = self.model._meta
+        self.schema = tuple(
+            FieldSpec(name, True, None, opts.get_field(name).max_length) for name in self.fields
+        ) + tuple(
+            FieldSpec(name, False, default, opts.get_field(name).max_length)
+            for name, default in OPTIONAL_FIELDS.items()
+        )
+        self.required = [spec.name for spec in self.schema if spec.required] + ["amount"]
+
+    def clean(self, data, require_password=True):
+        """Validate a request body and return (fields, amount)."""
+        if not isinstance(data, dict):
+            raise TransferError(400, "Invalid request body")
+        required = self.required + ["password"] if require_password else self.required
+        missing = [name for name in required if not data.get(name)]
+        if missing:
+            raise TransferError(400, f"Missing fields: {', '.join(missing)}")
+
+        cleaned = {}
+        for spec in self.schema:
+            value = data.get(spec.name)
+            if value in (None, ""):
+                value = spec.default
+            else:
+                value = str(value)
+                if spec.max_length and len(value) > spec.max_length:
+                    raise TransferError(400, f"{spec.name} must be at most {spec.max_length} characters")
+            cleaned[spec.name] = value
+        return cleaned, parse_amount(data["amount"])
+
+    # Stages; all three run inside one transaction
+
+    def reserve(self, user, fields, amount):
+        """Lock and debit the sender. Returns (account, counterparty)."""
+        account = UserAccount.objects.select_for_update().filter(user=user).first()
+        if account is None:
+            raise ledger.InsufficientFunds("Insufficient funds")
+        ledger.debit(account, amount, locked=True)
+        return account, None
+
+    def record_fields(self, created_at):
+        return {}
+
+    def record(self, user, account, counterparty, fields, amount):
+        created_at = now()
+        transfer = self.model.objects.create(
+            user=user,
+            account=account,
+            amount=amount,
+            status=self.initial_status,
+            date=created_at,
+            **fields,
+            **self.record_fields(created_at),
+        )
+        ledger.record_entries(transfer, account, counterparty)
+        return transfer
+
+    def settle(self, transfer, account, counterparty):
+        statement_cache.invalidate(account.user_id)
+
+    def response_data(self, transfer, account, counterparty):
+        raise NotImplementedError
+
+    def execute(self, user, fields, amount):
+        """Run reserve -> record -> settle and return (status_code, body)."""
+        try:
+            with transaction.atomic():
+                account, counterparty = self.reserve(user, fields, amount)
+                transfer = self.record(user, account, counterparty, fields, amount)
+                self.settle(transfer, account, counterparty)
+        except ledger.InsufficientFunds:
+            return 400, {"status": "error", "message": "Insufficient funds"}
+        except TransferError as exc:
+            return exc.status, {"status": "error", "message": exc.message}
+
+        return self.http_status, {
+            "status": "success",
+            "message": self.message,
+            "data": self.response_data(transfer, account, counterparty),
+        }
+
+
+class DomesticTransferType(TransferType):
+    name = "domestic"
+    model = DomesticTransfer
+    fields = ("beneficiary_name", "beneficiary_account_number", "bank_name")
+    message = "Domestic transfer completed successfully"
+
+    def reserve(self, user, fields, amount):
+        # Sender and beneficiary are locked by one query, in primary-key order.
+        # Hot (sharded) beneficiaries are credited on a shard and never locked.
+        number = fields["beneficiary_account_number"]
+        account = receiver = None
+        for row in (
+            UserAccount.objects.select_for_update()
+            .filter(Q(user=user) | Q(account_number=number, balance_shards=0))
+            .order_by("pk")
+        ):
+            if row.user_id == user.pk:
+                account = row
+            if row.account_number == number:
+                receiver = row
+        if account is None:
+            raise ledger.InsufficientFunds("Insufficient funds")
+        if receiver is None:
+            receiver = UserAccount.objects.filter(account_number=number).first()
+        if receiver is None:
+            raise TransferError(404, "Beneficiary account does not exist in our system")
+        if receiver.pk == account.pk:
+            receiver = account
+        ledger.debit(account, amount, locked=True)
+        return account, receiver
+
+    def settle(self, transfer, account, counterparty):
+        ledger.credit(counterparty, transfer.amount, locked=True)
+        statement_cache.invalidate(account.user_id, counterparty.user_id)
+
+    def response_data(self, transfer, account, counterparty):
+        return {
+            "transfer_id": transfer.id,
+            "amount": float(transfer.amount),
+            "beneficiary_account": counterparty.account_number,
+            "account_balance": float(ledger.available_balance(account)),
+        }
+
+
+class ExternalTransferType(TransferType):
+    """Money leaving the platform: debited now, settled by the settlement worker."""
+    initial_status = "pending"
+    http_status = 202
+
+    def record_fields(self, created_at):
+        return {"next_attempt_at": created_at}
+
+
+class InterBankTransferType(ExternalTransferType):
+    name = "interbank"
+    model = InterBankTransfer
+    fields = ("beneficiary_name", "iban", "bank_name", "country")
+    message = "Inter-bank transfer accepted for settlement"
+
+    def response_data(self, transfer, account, counterparty):
+        return {
+            "transfer_id": transfer.id,
+            "transfer_status": transfer.status,
+            "beneficiary_name": transfer.beneficiary_name,
+            "iban": transfer.iban,
+            "amount": float(transfer.amount),
+            "bank_name": transfer.bank_name,
+            "country": transfer.country,
+            "date": transfer.date.strftime(DATE_FORMAT),
+            "account_balance": float(ledger.available_balance(account)),
+        }
+
+
+class WireTransferType(ExternalTransferType):
+    name = "wire"
+    model = WireTransfer
+    fields = ("beneficiary_name", "routing_number", "iban", "bank_name", "swift_code", "country")
+    message = "Wire transfer accepted for settlement"
+
+    def response_data(self, transfer, account, counterparty):
+        return {
+            "transfer_id": transfer.id,
+            "transfer_status": transfer.status,
+            "beneficiary_name": transfer.beneficiary_name,
+            "amount": float(transfer.amount),
+            "bank_name": transfer.bank_name,
+            "swift_code": transfer.swift_code,
+            "date": transfer.date.strftime(DATE_FORMAT),
+            "account_balance": float(ledger.available_balance(account)),
+        }
+
+
+TRANSFER_TYPES = {
+    transfer_type.name: transfer_type
+    for transfer_type in (DomesticTransferType(), InterBankTransferType(), WireTransferType())
+}
@@ -1,14 +1,27 @@
 # accounts/urls.py
 from django.urls import path
-from .views import create_account,login_account,account_statement,make_domestic_transfer,make_interbank_transfer,make_wire_transfer
+from . import async_views
+from .views import create_account,login_account,logout_account,account_statement,account_summary,export_account_statement,authorize_transfers,make_domestic_transfer,make_batch_domestic_transfer,make_interbank_transfer,make_wire_transfer
 
 urlpatterns = [
     path("register/", create_account, name="create_account"),
     path("login/", login_account, name="login_account"),
+    path("logout/", logout_account, name="logout_account"),
 
     path('account/statement/', account_statement, name='account-statement'),
+    path('account/summary/', account_summary, name='account-summary'),
+    path('account/statement/export/', export_account_statement, name='account-statement-export'),
+    path('transfer/authorize/', authorize_transfers, name='transfer-authorize'),
     path('domestic/transfer/',  make_domestic_transfer, name='wire-transfer'),
+    path('domestic/transfer/batch/', make_batch_domestic_transfer, name='domestic-transfer-batch'),
     path('interbank/transfer/', make_interbank_transfer, name='interbank-transfer'),
     path('wire/transfer/', make_wire_transfer, name='wire-transfer'),
+
+    # Async-native variants for ASGI deployments
+    path("async/login/", async_views.login_account, name="async-login"),
+    path('async/account/statement/', async_views.account_statement, name='async-account-statement'),
+    path('async/domestic/transfer/', async_views.make_domestic_transfer, name='async-domestic-transfer'),
+    path('async/interbank/transfer/', async_views.make_interbank_transfer, name='async-interbank-transfer'),
+    path('async/wire/transfer/', async_views.make_wire_transfer, name='async-wire-transfer'),
     
 ]
@@ -1,7 +1,107 @@
-import random
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+ACCOUNT_NUMBER_SEQUENCE = "account_number"
+ACCOUNT_NUMBER_PG_SEQUENCE = "user_account_number_seq"
+# 9-digit serials plus a Luhn check digit give 10-digit account numbers
+FIRST_ACCOUNT_SERIAL = 100000000
+
+
+def luhn_check_digit(digits):
+    total = 0
+    for i, char in enumerate(reversed(digits)):
+        value = int(char)
+        if i % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_account_number(number):
+    return number.isdigit() and len(number) > 1 and luhn_check_digit(number[:-1]) == number[-1]
+
+
+def format_account_number(serial):
+    digits = str(serial)
+    return digits + luhn_check_digit(digits)
+
+
+class AccountNumberAllocator:
+    """Hands out account numbers from blocks of serials reserved per process.
+
+    On PostgreSQL blocks come from a real sequence, which is never rolled back,
+    so numbers are unique across workers without any lookups. Other backends
+    reserve serials by bumping an AccountNumberSequence row. Outside a
+    transaction that bump commits on its own and a whole block is kept.
+    Inside one it could still be rolled back, after which another process
+    may reserve the same serials, so only the serials asked for are
+    reserved and nothing is kept past the caller's transaction.
+    """
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size
+        self._serials = []  # committed serials, highest first
+        self._lock = threading.Lock()
+
+    def _reserve(self, size):
+        from user.models import AccountNumberSequence
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(%s) FROM generate_series(1, %s)",
+                    [ACCOUNT_NUMBER_PG_SEQUENCE, size],
+                )
+                return sorted(row[0] for row in cursor.fetchall())
+
+        # No savepoint: an error here fails the caller's transaction either way
+        with transaction.atomic(savepoint=False):
+            updated = AccountNumberSequence.objects.filter(name=ACCOUNT_NUMBER_SEQUENCE).update(
+                next_value=F("next_value") + size
+            )
+            if not updated:
+                AccountNumberSequence.objects.create(
+                    name=ACCOUNT_NUMBER_SEQUENCE, next_value=FIRST_ACCOUNT_SERIAL + size
+                )
+            end = AccountNumberSequence.objects.get(name=ACCOUNT_NUMBER_SEQUENCE).next_value
+        return list(range(end - size, end))
+
+    def _can_keep_block(self):
+        return connection.vendor == "postgresql" or not connection.in_atomic_block
+
+    def allocate_many(self, count):
+        """Return ``count`` unused account numbers."""
+        with self._lock:
+            serials = [self._serials.pop() for _ in range(min(count, len(self._serials)))]
+            missing = count - len(serials)
+            if missing and self._can_keep_block():
+                block_size = self.block_size or getattr(settings, "ACCOUNT_NUMBER_BLOCK_SIZE", 100)
+                block = self._reserve(max(missing, block_size))
+                serials += block[:missing]
+                self._serials = block[missing:][::-1]
+            elif missing:
+                serials += self._reserve(missing)
+        return [format_account_number(serial) for serial in serials]
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def reset(self):
+        with self._lock:
+            self._serials = []
+
+
+account_numbers = AccountNumberAllocator()
+
 
 def generate_account_number():
-    # Example: 10-digit numeric account number
-    return str(random.randint(1000000000, 9999999999))
+    return account_numbers.allocate()
+
+
+def generate_account_numbers(count):
+    return account_numbers.allocate_many(count)
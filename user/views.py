@@ -8,11 +8,31 @@ from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny
 from rest_framework.decorators import permission_classes
 from django.contrib.auth import authenticate
-from django.utils.timezone import localtime,now
+from django.utils.timezone import localdate, localtime
 from rest_framework.permissions import IsAuthenticated
-from user.models import UserAccount, DomesticTransfer, InterBankTransfer, WireTransfer
-from decimal import Decimal
-from django.db import transaction
+from user.models import UserAccount
+from user import ledger
+from user.ledger import InsufficientFunds
+from user.grants import GRANT_HEADER, authorize_transfer, has_grant, issue_grant
+from django.conf import settings
+from user.idempotency import replay_response, respond_once
+from user.export import EXPORT_FORMATS, stream_statement
+from django.http import StreamingHttpResponse
+from user import rollups, statement_cache
+from user.batch import (
+    BATCH_ID_MAX_LENGTH, MAX_BATCH_ITEMS, BatchInProgress, BatchMismatch, InvalidBatchFile, find_batch, parse_csv,
+    replay_batch, run_batch,
+)
+from user.authentication import cache_token
+from user.backends import login_token
+from user.ratelimit import throttle
+from user.routers import read_replica
+from user.serializers import serialize_rows
+from user.signup import SignupConflict, signup
+from user.transfers import TRANSFER_TYPES, TransferError
+from user.statement import (
+    StatementQueryError, fetch_statement_page, parse_bound, parse_limit, parse_types
+)
 
 CustomUser = get_user_model()
 
@@ -39,33 +59,11 @@ def create_account(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Check if username or email already exists
-    if CustomUser.objects.filter(username=data["username"]).exists():
-        return Response({"status": "error", "message": "Username already exists"}, status=400)
-    if CustomUser.objects.filter(email=data["email"]).exists():
-        return Response({"status": "error", "message": "Email already exists"}, status=400)
-
-    # Create user
-    user = CustomUser(
-        first_name=data["first_name"],
-        middle_name=data.get("middle_name"),
-        last_name=data["last_name"],
-        username=data["username"],
-        email=data["email"],
-        occupation=data.get("occupation"),
-        phone_number=data.get("phone_number"),
-        date_of_birth=data.get("date_of_birth"),
-        marital_status=data.get("marital_status"),
-        gender=data.get("gender"),
-        address=data.get("address"),
-        account_type=data.get("account_type", "savings"),
-        account_currency=data.get("account_currency", "usd")
-    )
-    user.set_password(data["password"])
-    user.save()
-
-    # Generate token
-    token, _ = Token.objects.get_or_create(user=user)
+    # User, account and token in one transaction; duplicates hit the unique constraints
+    try:
+        user, token = signup(data)
+    except SignupConflict as exc:
+        return Response({"status": "error", "message": str(exc)}, status=400)
 
     return Response({
         "status": "success",
@@ -84,6 +82,7 @@ def create_account(request):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle("login")
 def login_account(request):
     data = request.data
     username_or_email = data.get("username_or_email")
@@ -95,22 +94,20 @@ def login_account(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Allow login via username or email
-    try:
-        user = CustomUser.objects.get(email=username_or_email)
-        username = user.username
-    except CustomUser.DoesNotExist:
-        username = username_or_email
-
-    user = authenticate(username=username, password=password)
+    # Username or email, resolved with the token in one query (user.backends)
+    with read_replica():
+        user = authenticate(username=username_or_email, password=password)
     if not user:
         return Response(
             {"status": "error", "message": "Invalid credentials"},
             status=status.HTTP_401_UNAUTHORIZED
         )
 
-    # Get or create token
-    token, _ = Token.objects.get_or_create(user=user)
+    # Users created before tokens were issued at signup get one now
+    token = login_token(user)
+    if token is None:
+        token, _ = Token.objects.get_or_create(user=user)
+        cache_token(user, token)
 
     return Response({
         "status": "success",
@@ -124,325 +121,333 @@ def login_account(request):
     }, status=status.HTTP_200_OK)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def logout_account(request):
+    # Deleting the token also evicts it from the token authentication cache
+    if isinstance(request.auth, Token):
+        request.auth.delete()
+
+    return Response({
+        "status": "success",
+        "message": "Logout successful"
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle("transfer")
+def authorize_transfers(request):
+    password = request.data.get("password")
+    if not password:
+        return Response(
+            {"status": "error", "message": "Password required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if not request.user.check_password(password):
+        return Response(
+            {"status": "error", "message": "Invalid password"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    return Response({
+        "status": "success",
+        "message": f"Send the grant in the {GRANT_HEADER} header to authorize transfers",
+        "data": {
+            "transfer_authorization": issue_grant(request),
+            "expires_in": settings.TRANSFER_GRANT_TTL,
+            "max_uses": settings.TRANSFER_GRANT_MAX_USES,
+        }
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def account_statement(request):
     user = request.user
+    params = request.query_params
+
+    # Unchanged since the client's copy: answer from the cache alone
+    version = statement_cache.get_version(user.pk)
+    etag = statement_cache.etag(user.pk, version, params)
+    if statement_cache.etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    # Only the first page is cached; it is what dashboards poll
+    first_page = not params.get("cursor")
+    data = statement_cache.get_page(user.pk, version, params) if first_page else None
+    if data is not None:
+        return Response({
+            "status": "success",
+            "message": "Account balance and statement retrieved successfully",
+            "data": data
+        }, headers={"ETag": etag})
+
+    # Parse pagination and filters
+    try:
+        limit = parse_limit(params.get("limit"))
+        types = parse_types(params.get("type"))
+        start = parse_bound(params.get("start_date"))
+        end = parse_bound(params.get("end_date"), end=True)
+        with read_replica(user.pk):
+            rows, next_cursor = fetch_statement_page(
+                user, limit=limit, cursor=params.get("cursor"), types=types, start=start, end=end
+            )
+    except StatementQueryError as exc:
+        return Response(
+            {"status": "error", "message": str(exc)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-    # Get or create the user's account
+    # Get or create the user's account (get_or_create always reads the primary)
     account, created = UserAccount.objects.get_or_create(
         user=user,
         defaults={"account_balance": 0}
     )
 
-    # Collect transactions
-    domestic = DomesticTransfer.objects.filter(user=user)
-    interbank = InterBankTransfer.objects.filter(user=user)
-    wire = WireTransfer.objects.filter(user=user)
-
-    # Format transactions
-    transactions = []
-
-    for tx in domestic:
-        transactions.append({
-            "id": tx.id,
-            "type": tx.transaction_type,
-            "amount": float(tx.amount),
-            "description": tx.description,
-            "beneficiary_name": tx.beneficiary_name,
-            "beneficiary_account": tx.beneficiary_account_number,
-            "bank_name": tx.bank_name,
-            "account_type": tx.account_type,
-            "date": localtime(tx.date).strftime("%Y-%m-%d %H:%M:%S"),
-            "status": tx.status
-        })
-
-    for tx in interbank:
-        transactions.append({
-            "id": tx.id,
-            "type": tx.transaction_type,
-            "amount": float(tx.amount),
-            "description": tx.description,
-            "beneficiary_name": tx.beneficiary_name,
-            "iban": tx.iban,
-            "bank_name": tx.bank_name,
-            "account_type": tx.account_type,
-            "country": tx.country,
-            "date": localtime(tx.date).strftime("%Y-%m-%d %H:%M:%S"),
-            "status": tx.status
-        })
-
-    for tx in wire:
-        transactions.append({
-            "id": tx.id,
-            "type": tx.transaction_type,
-            "amount": float(tx.amount),
-            "description": tx.description,
-            "beneficiary_name": tx.beneficiary_name,
-            "routing_number": tx.routing_number,
-            "iban": tx.iban,
-            "bank_name": tx.bank_name,
-            "swift_code": tx.swift_code,
-            "country": tx.country,
-            "account_type": tx.account_type,
-            "date": localtime(tx.date).strftime("%Y-%m-%d %H:%M:%S"),
-            "status": tx.status
-        })
-
-    # Sort transactions by date descending
-    transactions.sort(key=lambda x: x["date"], reverse=True)
+    data = {
+        "account_number": account.account_number if hasattr(account, "account_number") else None,
+        "account_balance": float(ledger.available_balance(account)),
+        "transactions": serialize_rows(rows),
+        "next_cursor": next_cursor,
+    }
+    if first_page:
+        statement_cache.set_page(user.pk, version, params, data)
 
     return Response({
         "status": "success",
         "message": "Account balance and statement retrieved successfully",
-        "data": {
-            "account_number": account.account_number if hasattr(account, "account_number") else None,
-            "account_balance": float(account.account_balance),
-            "transactions": transactions
-        }
-    })
+        "data": data
+    }, headers={"ETag": etag})
 
 
 
-@api_view(["POST"])
+@api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def make_domestic_transfer(request):
+def account_summary(request):
     user = request.user
-    data = request.data
-
-    # ✅ Require password confirmation
-    input_password = data.get("password")
-    if not input_password:
-        return Response({"status": "error", "message": "Password required"}, status=400)
+    params = request.query_params
 
-    user_auth = authenticate(username=user.username, password=input_password)
-    if user_auth is None:
-        return Response({"status": "error", "message": "Invalid password"}, status=403)
-
-    # ✅ Ensure user has an account
-    account, _ = UserAccount.objects.get_or_create(user=user, defaults={"account_balance": 0})
-
-    # ✅ Required fields
-    required_fields = ["beneficiary_name", "beneficiary_account_number", "bank_name", "amount"]
-    missing = [f for f in required_fields if not data.get(f)]
-    if missing:
-        return Response({"status": "error", "message": f"Missing fields: {', '.join(missing)}"}, status=400)
-
-    amount = Decimal(data["amount"])
-    if amount <= 0:
-        return Response({"status": "error", "message": "Amount must be > 0"}, status=400)
-
-    if account.account_balance < amount:
-        return Response({"status": "error", "message": "Insufficient funds"}, status=400)
-
-    # ✅ Ensure receiver exists inside platform
+    # Defaults to the current month
     try:
-        receiver_account = UserAccount.objects.get(account_number=data["beneficiary_account_number"])
-    except UserAccount.DoesNotExist:
+        today = localdate()
+        start = parse_bound(params.get("start_date")) if params.get("start_date") else None
+        end = parse_bound(params.get("end_date")) if params.get("end_date") else None
+    except StatementQueryError as exc:
         return Response(
-            {"status": "error", "message": "Beneficiary account does not exist in our system"},
-            status=404
+            {"status": "error", "message": str(exc)},
+            status=status.HTTP_400_BAD_REQUEST
         )
-
-    with transaction.atomic():
-        # ✅ Deduct sender balance
-        account.account_balance -= amount
-        account.save()
-
-        # ✅ Credit receiver balance
-        receiver_account.account_balance += amount
-        receiver_account.save()
-
-        # ✅ Record transfer
-        transfer = DomesticTransfer.objects.create(
-            user=user,
-            account=account,
-            amount=amount,
-            description=data.get("description", ""),
-            status="completed",
-            date=now(),
-            beneficiary_name=data["beneficiary_name"],
-            beneficiary_account_number=data["beneficiary_account_number"],
-            bank_name=data["bank_name"],
-            account_type=data.get("account_type", "savings"),
+    start_day = localtime(start).date() if start else today.replace(day=1)
+    end_day = localtime(end).date() if end else today
+    if start_day > end_day:
+        return Response(
+            {"status": "error", "message": "start_date must be before end_date"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
+    account, _ = UserAccount.objects.get_or_create(user=user, defaults={"account_balance": 0})
+
+    totals = rollups.summarize(account, start_day, end_day)
+    data = {
+        "start_date": start_day.isoformat(),
+        "end_date": end_day.isoformat(),
+        "totals": [
+            {
+                "type": row["transaction_type"],
+                "status": row["status"],
+                "count": row["count"],
+                "amount": float(row["total"]),
+            }
+            for row in totals
+        ],
+        "money_out": float(sum(row["total"] for row in totals if row["status"] != "failed")),
+    }
+    if params.get("group_by") == "day":
+        data["days"] = [
+            {
+                "date": row["day"].isoformat(),
+                "type": row["transaction_type"],
+                "status": row["status"],
+                "count": row["count"],
+                "amount": float(row["total"]),
+            }
+            for row in rollups.daily(account, start_day, end_day)
+        ]
+
     return Response({
         "status": "success",
-        "message": "Domestic transfer completed successfully",
-        "data": {
-            "transfer_id": transfer.id,
-            "amount": float(amount),
-            "beneficiary_account": receiver_account.account_number,
-            "account_balance": float(account.account_balance),
-        }
-    }, status=201)
+        "message": "Account summary retrieved successfully",
+        "data": data
+    })
 
 
-@api_view(["POST"])
+@api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def make_interbank_transfer(request):
+def export_account_statement(request):
     user = request.user
-    data = request.data
+    params = request.query_params
 
-    # Ensure the user has an account
-    account, created = UserAccount.objects.get_or_create(
-        user=user, defaults={"account_balance": 0}
-    )
-
-    # Required fields
-    required_fields = [
-        "beneficiary_name",
-        "iban",
-        "bank_name",
-        "country",
-        "amount",
-        "password"
-    ]
-    missing = [field for field in required_fields if not data.get(field)]
-    if missing:
+    # ?output= rather than ?format=, which DRF reserves for renderer selection
+    output = params.get("output", "csv")
+    if output not in EXPORT_FORMATS:
         return Response(
-            {"status": "error", "message": f"Missing fields: {', '.join(missing)}"},
+            {"status": "error", "message": f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
             status=status.HTTP_400_BAD_REQUEST
         )
+    gzip = params.get("compression") == "gzip"
 
-    # Confirm password
-    password = data.get("password")
-    if not user.check_password(password):
-        return Response(
-            {"status": "error", "message": "Invalid password"},
-            status=status.HTTP_403_FORBIDDEN
-        )
-
-    # Validate amount
     try:
-        amount = Decimal(data["amount"])
-    except:
+        types = parse_types(params.get("type"))
+        start = parse_bound(params.get("start_date"))
+        end = parse_bound(params.get("end_date"), end=True)
+    except StatementQueryError as exc:
         return Response(
-            {"status": "error", "message": "Invalid amount format"},
+            {"status": "error", "message": str(exc)},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    if amount <= 0:
-        return Response(
-            {"status": "error", "message": "Amount must be greater than 0"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    content_type, extension = EXPORT_FORMATS[output]
+    filename = f"statement-{user.username}.{extension}"
+    if gzip:
+        content_type, filename = "application/gzip", filename + ".gz"
 
-    # Check balance
-    if account.account_balance < amount:
-        return Response(
-            {"status": "error", "message": "Insufficient funds"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    response = StreamingHttpResponse(
+        stream_statement(user, output=output, gzip=gzip, types=types, start=start, end=end),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
-    # Deduct balance
-    account.account_balance -= amount
-    account.save()
 
-    # Create inter-bank transfer record
-    transfer = InterBankTransfer.objects.create(
-        user=user,
-        account=account,
-        amount=amount,
-        description=data.get("description", ""),
-        status="completed",  # or "pending"
-        date=now(),
-        beneficiary_name=data["beneficiary_name"],
-        iban=data["iban"],
-        bank_name=data["bank_name"],
-        country=data["country"],
-        account_type=data.get("account_type", "savings"),
-    )
+def _transfer_response(request, kind):
+    transfer_type = TRANSFER_TYPES[kind]
+    replayed = replay_response(request)
+    if replayed is not None:
+        return replayed
 
-    return Response({
-        "status": "success",
-        "message": "Inter-bank transfer completed successfully",
-        "data": {
-            "transfer_id": transfer.id,
-            "beneficiary_name": transfer.beneficiary_name,
-            "iban": transfer.iban,
-            "amount": float(transfer.amount),
-            "bank_name": transfer.bank_name,
-            "country": transfer.country,
-            "date": transfer.date.strftime("%Y-%m-%d %H:%M:%S"),
-            "account_balance": float(account.account_balance),
-        }
-    }, status=status.HTTP_201_CREATED)
+    try:
+        fields, amount = transfer_type.clean(request.data, require_password=not has_grant(request))
+    except TransferError as exc:
+        return Response({"status": "error", "message": exc.message}, status=exc.status)
+
+    # Confirm password or transfer authorization grant
+    authorized, error = authorize_transfer(request)
+    if not authorized:
+        return Response({"status": "error", "message": error}, status=status.HTTP_403_FORBIDDEN)
+
+    # Only the transfer itself is keyed, so a rejected attempt can be retried
+    return respond_once(request, lambda: transfer_type.execute(request.user, fields, amount))
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-def make_wire_transfer(request):
+@throttle("transfer")
+def make_domestic_transfer(request):
+    return _transfer_response(request, "domestic")
+
+
+def _batch_mismatch():
+    return Response(
+        {"status": "error", "message": "batch_id was already used with different transfers"},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle("transfer")
+def make_batch_domestic_transfer(request):
     user = request.user
     data = request.data
 
-    required_fields = [
-        "beneficiary_name", "routing_number", "iban", "bank_name",
-        "swift_code", "country", "amount", "password"
-    ]
-    missing = [field for field in required_fields if not data.get(field)]
-    if missing:
+    batch_id = data.get("batch_id")
+    if not batch_id or not (data.get("password") or has_grant(request)):
         return Response(
-            {"status": "error", "message": f"Missing fields: {', '.join(missing)}"},
+            {"status": "error", "message": "batch_id and password are required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    batch_id = str(batch_id)
+    if len(batch_id) > BATCH_ID_MAX_LENGTH:
+        return Response(
+            {"status": "error", "message": f"batch_id must be at most {BATCH_ID_MAX_LENGTH} characters"},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Check password
-    if not user.check_password(data["password"]):
+    # Transfers come either as a JSON list or an uploaded CSV file
+    if "file" in request.FILES:
+        try:
+            items = parse_csv(request.FILES["file"])
+        except InvalidBatchFile as exc:
+            return Response({"status": "error", "message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        items = data.get("transfers")
+    if not isinstance(items, list) or not items:
         return Response(
-            {"status": "error", "message": "Invalid password"},
+            {"status": "error", "message": "transfers must be a non-empty list or a CSV file"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(items) > MAX_BATCH_ITEMS:
+        return Response(
+            {"status": "error", "message": f"A batch can contain at most {MAX_BATCH_ITEMS} transfers"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Replay a batch that was already processed
+    existing = find_batch(user, batch_id)
+    if existing is not None and existing.status == "completed":
+        try:
+            result = replay_batch(existing, items)
+        except BatchMismatch:
+            return _batch_mismatch()
+        return Response({
+            "status": "success",
+            "message": "Batch already processed",
+            "data": result
+        }, status=status.HTTP_200_OK)
+
+    # Verify the password once for the whole batch
+    authorized, error = authorize_transfer(request)
+    if not authorized:
+        return Response(
+            {"status": "error", "message": error},
             status=status.HTTP_403_FORBIDDEN
         )
 
-    # Ensure account exists
     account, _ = UserAccount.objects.get_or_create(user=user, defaults={"account_balance": 0})
 
-    amount = Decimal(data["amount"])
-    if amount <= 0:
+    try:
+        result = run_batch(user, account, batch_id, items)
+    except InsufficientFunds:
         return Response(
-            {"status": "error", "message": "Amount must be greater than 0"},
+            {"status": "error", "message": "Insufficient funds"},
             status=status.HTTP_400_BAD_REQUEST
         )
-
-    # Check balance
-    if account.account_balance < amount:
+    except BatchInProgress:
         return Response(
-            {"status": "error", "message": "Insufficient funds"},
-            status=status.HTTP_400_BAD_REQUEST
+            {"status": "error", "message": "Batch is already being processed"},
+            status=status.HTTP_409_CONFLICT
         )
-
-    # Deduct balance
-    account.account_balance -= amount
-    account.save()
-
-    # Create wire transfer
-    transfer = WireTransfer.objects.create(
-        user=user,
-        account=account,
-        amount=amount,
-        description=data.get("description", ""),
-        status="completed",
-        date=now(),
-        beneficiary_name=data["beneficiary_name"],
-        routing_number=data["routing_number"],
-        iban=data["iban"],
-        bank_name=data["bank_name"],
-        swift_code=data["swift_code"],
-        country=data["country"],
-        account_type=data.get("account_type", "savings"),
-    )
+    except BatchMismatch:
+        return _batch_mismatch()
 
     return Response({
         "status": "success",
-        "message": "Wire transfer completed successfully",
-        "data": {
-            "transfer_id": transfer.id,
-            "beneficiary_name": transfer.beneficiary_name,
-            "amount": float(transfer.amount),
-            "bank_name": transfer.bank_name,
-            "swift_code": transfer.swift_code,
-            "date": transfer.date.strftime("%Y-%m-%d %H:%M:%S"),
-            "account_balance": float(account.account_balance),
-        }
-    }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        "message": "Batch transfer processed",
+        "data": result
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle("transfer")
+def make_interbank_transfer(request):
+    return _transfer_response(request, "interbank")
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle("transfer")
+def make_wire_transfer(request):
+    return _transfer_response(request, "wire")